@@ -56,7 +56,8 @@ export async function POST(req: Request) {
     }
 
     const analysis = (await nlpResponse.json()) as {
-      sentiment: { label: string; score: number };
+      // Null for crisis entries when the service skips or defers enrichment.
+      sentiment: { label: string; score: number } | null;
       keyphrases: string[];
       embedding: number[];
       safety: { crisis: boolean; reason?: string | null };
@@ -66,8 +67,9 @@ export async function POST(req: Request) {
     const { error: analysisError } = await supabase.from("entry_analysis").upsert({
       entry_id: entry.id,
       user_id: entry.user_id,
-      sentiment_label: analysis.sentiment.label,
-      sentiment_score: analysis.sentiment.score,
+      ...(analysis.sentiment
+        ? { sentiment_label: analysis.sentiment.label, sentiment_score: analysis.sentiment.score }
+        : {}),
       mood_numeric: moodToNumeric(entry.mood),
       keyphrases,
       safety_flags: analysis.safety ?? {},
@@ -111,12 +113,27 @@ export async function POST(req: Request) {
       .filter((item) => item.text && item.embedding.length > 0);
 
     if (recomputeEntries.length >= 2) {
+      const [{ data: storedThemes }, { data: storedMembers }] = await Promise.all([
+        supabase.from("themes").select("id, label, keywords, strength").eq("user_id", entry.user_id),
+        supabase.from("theme_membership").select("theme_id, entry_id").eq("user_id", entry.user_id),
+      ]);
+      const previousThemes = (storedThemes ?? []).map((theme) => ({
+        theme_id: theme.id,
+        entry_ids: (storedMembers ?? [])
+          .filter((member) => member.theme_id === theme.id)
+          .map((member) => member.entry_id),
+        label: theme.label,
+        keywords: theme.keywords ?? [],
+        strength: theme.strength,
+      }));
+
       const themeResponse = await fetch(`${getNlpUrl()}/recompute-themes`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
           user_id: entry.user_id,
           entries: recomputeEntries,
+          previous_themes: previousThemes,
         }),
       });
 
@@ -129,12 +146,37 @@ export async function POST(req: Request) {
             strength: number;
             members: Array<{ entry_id: string; score: number }>;
           }>;
+          diff?: { baseline: string; added: string[]; removed: string[]; changed: string[] };
         };
 
-        await supabase.from("theme_membership").delete().eq("user_id", entry.user_id);
-        await supabase.from("themes").delete().eq("user_id", entry.user_id);
+        // Theme ids are stable across recomputes, so only themes that were
+        // added, changed or removed are rewritten.
+        const diff = themePayload.diff;
+        const stale = diff ? [...diff.removed, ...diff.changed] : [];
+        const written = diff
+          ? themePayload.themes.filter(
+              (theme) =>
+                diff.added.includes(theme.temp_theme_id) || diff.changed.includes(theme.temp_theme_id)
+            )
+          : themePayload.themes;
+
+        if (!diff || diff.baseline === "none") {
+          await supabase.from("theme_membership").delete().eq("user_id", entry.user_id);
+          await supabase.from("themes").delete().eq("user_id", entry.user_id);
+        } else {
+          if (stale.length > 0) {
+            await supabase
+              .from("theme_membership")
+              .delete()
+              .eq("user_id", entry.user_id)
+              .in("theme_id", stale);
+          }
+          if (diff.removed.length > 0) {
+            await supabase.from("themes").delete().eq("user_id", entry.user_id).in("id", diff.removed);
+          }
+        }
 
-        const themeRows = themePayload.themes.map((theme) => ({
+        const themeRows = written.map((theme) => ({
           id: theme.temp_theme_id,
           user_id: entry.user_id,
           label: theme.label,
@@ -143,10 +185,10 @@ export async function POST(req: Request) {
         }));
 
         if (themeRows.length > 0) {
-          await supabase.from("themes").insert(themeRows);
+          await supabase.from("themes").upsert(themeRows);
         }
 
-        const membershipRows = themePayload.themes.flatMap((theme) =>
+        const membershipRows = written.flatMap((theme) =>
           theme.members.map((member) => ({
             user_id: entry.user_id,
             theme_id: theme.temp_theme_id,
@@ -3,6 +3,9 @@ import { NextResponse } from "next/server";
 import { getSupabaseServerClient } from "@/lib/supabase/server";
 
 const getNlpUrl = () => process.env.NLP_SERVICE_URL || "http://localhost:8000";
+// When the NLP service's vector index holds the user's entries, it retrieves
+// similar entries itself and the match RPC plus its payload are skipped.
+const useSelfRetrieval = () => process.env.NLP_SELF_RETRIEVAL === "true";
 
 const serializeEmbedding = (embedding: unknown): string => {
   if (Array.isArray(embedding)) {
@@ -58,6 +61,7 @@ export async function POST(req: Request) {
         entry_id: sessionId,
         text: latestUserMessage,
         mood,
+        index: false,
       }),
     });
 
@@ -65,7 +69,8 @@ export async function POST(req: Request) {
     const embedding = analysis?.embedding ?? [];
 
     let retrievedEntries: Array<{ entry_id: string; text: string; created_at?: string; mood?: string | null }> = [];
-    if (embedding.length > 0) {
+    const selfRetrieve = useSelfRetrieval();
+    if (!selfRetrieve && embedding.length > 0) {
       const { data: matches, error: matchError } = await supabase.rpc("match_journal_entries", {
         target_user_id: userId,
         query_embedding: serializeEmbedding(embedding),
@@ -117,7 +122,11 @@ export async function POST(req: Request) {
         history,
         recent_entries: recentFormatted,
         retrieved_entries: retrievedEntries,
+        self_retrieve: selfRetrieve,
         enhanced_language: enhancedLanguageEnabled ?? false,
+        message_analysis: analysis
+          ? { sentiment: analysis.sentiment ?? null, keyphrases: analysis.keyphrases ?? null }
+          : null,
       }),
     });
 
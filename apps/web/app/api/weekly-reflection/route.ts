@@ -60,7 +60,7 @@ export async function POST(req: Request) {
         text: entry.content,
         created_at: entry.created_at,
         mood: entry.mood,
-        sentiment: analysis
+        sentiment: analysis?.sentiment_label
           ? { label: analysis.sentiment_label, score: analysis.sentiment_score }
           : undefined,
         keyphrases: Array.isArray(analysis?.keyphrases) ? analysis.keyphrases : [],
@@ -8,6 +8,7 @@ export const sentimentResultSchema = z.object({
 export const safetyResultSchema = z.object({
   crisis: z.boolean(),
   reason: z.string().nullable().optional(),
+  categories: z.array(z.string()).optional(),
 });
 
 export const analyzeEntryRequestSchema = z.object({
@@ -16,13 +17,30 @@ export const analyzeEntryRequestSchema = z.object({
   text: z.string().min(1).max(10000),
   mood: z.string().nullable().optional(),
   created_at: z.string().nullable().optional(),
+  pipeline_mode: z.enum(["sequential", "staged"]).optional(),
+  crisis_policy: z.enum(["full", "skip", "defer"]).optional(),
+  chunking: z
+    .object({
+      enabled: z.boolean().optional(),
+      max_chars: z.number().int().min(100).max(4000).optional(),
+      overlap_sentences: z.number().int().min(0).max(5).optional(),
+      pooling: z.enum(["mean", "attention"]).optional(),
+    })
+    .nullable()
+    .optional(),
+  index: z.boolean().nullable().optional(),
 });
 
 export const analyzeEntryResponseSchema = z.object({
-  sentiment: sentimentResultSchema,
+  sentiment: sentimentResultSchema.nullable(),
   keyphrases: z.array(z.string()),
   embedding: z.array(z.number()),
+  embedding_b64: z.string().nullable().optional(),
+  embedding_encoding: z.enum(["json", "b64-f32", "b64-f16"]).optional(),
   safety: safetyResultSchema,
+  enrichment: z.enum(["complete", "skipped", "deferred"]).optional(),
+  chunk_count: z.number().int().optional(),
+  timings_ms: z.record(z.number()).optional(),
 });
 
 export const recomputeThemesRequestSchema = z.object({
@@ -31,9 +49,22 @@ export const recomputeThemesRequestSchema = z.object({
     z.object({
       entry_id: z.string().min(1),
       text: z.string().min(1),
-      embedding: z.array(z.number()),
+      embedding: z.array(z.number()).optional(),
+      embedding_b64: z.string().nullable().optional(),
     })
   ),
+  previous_themes: z
+    .array(
+      z.object({
+        theme_id: z.string().min(1),
+        entry_ids: z.array(z.string()),
+        label: z.string().nullable().optional(),
+        keywords: z.array(z.string()).optional(),
+        strength: z.number().nullable().optional(),
+      })
+    )
+    .nullable()
+    .optional(),
 });
 
 export const themeMemberSchema = z.object({
@@ -51,8 +82,17 @@ export const themeResultSchema = z.object({
   members: z.array(themeMemberSchema),
 });
 
+export const themeDiffSchema = z.object({
+  baseline: z.enum(["request", "cache", "none"]),
+  added: z.array(z.string()),
+  removed: z.array(z.string()),
+  changed: z.array(z.string()),
+  unchanged: z.array(z.string()),
+});
+
 export const recomputeThemesResponseSchema = z.object({
   themes: z.array(themeResultSchema),
+  diff: themeDiffSchema.nullable().optional(),
 });
 
 export const weeklyEntrySchema = z.object({
@@ -163,6 +203,7 @@ export const chatTurnRequestSchema = z.object({
         created_at: z.string().optional(),
         mood: z.string().nullable().optional(),
         source: z.string().optional(),
+        embedding: z.array(z.number()).optional(),
       })
     )
     .optional(),
@@ -202,3 +243,27 @@ export const chatTurnResponseSchema = z.object({
   }),
   safety: safetyResultSchema,
 });
+
+export const similarRequestSchema = z.object({
+  user_id: z.string().min(1),
+  text: z.string().min(1).max(10000).nullable().optional(),
+  entry_id: z.string().nullable().optional(),
+  k: z.number().int().min(1).max(50).optional(),
+  nprobe: z.number().int().min(1).max(1024).nullable().optional(),
+  strategy: z.enum(["auto", "exact", "ivf"]).nullable().optional(),
+  exclude_entry_ids: z.array(z.string()).optional(),
+});
+
+export const similarResponseSchema = z.object({
+  results: z.array(
+    z.object({
+      entry_id: z.string(),
+      score: z.number(),
+      text: z.string().nullable().optional(),
+      created_at: z.string().nullable().optional(),
+      mood: z.string().nullable().optional(),
+    })
+  ),
+  strategy: z.enum(["exact", "ivf"]),
+  indexed: z.number().int(),
+});
@@ -8,6 +8,7 @@ export interface SentimentResult {
 export interface SafetyResult {
   crisis: boolean;
   reason?: string | null;
+  categories?: string[];
 }
 
 export interface AnalyzeEntryRequest {
@@ -16,18 +17,46 @@ export interface AnalyzeEntryRequest {
   text: string;
   mood?: string | null;
   created_at?: string | null;
+  pipeline_mode?: "sequential" | "staged";
+  crisis_policy?: "full" | "skip" | "defer";
+  chunking?: {
+    enabled?: boolean;
+    max_chars?: number;
+    overlap_sentences?: number;
+    pooling?: "mean" | "attention";
+  } | null;
+  index?: boolean | null;
 }
 
+export type EmbeddingEncoding = "json" | "b64-f32" | "b64-f16";
+
 export interface AnalyzeEntryResponse {
-  sentiment: SentimentResult;
+  sentiment: SentimentResult | null;
   keyphrases: string[];
   embedding: number[];
+  embedding_b64?: string | null;
+  embedding_encoding?: EmbeddingEncoding;
   safety: SafetyResult;
+  enrichment?: "complete" | "skipped" | "deferred";
+  chunk_count?: number;
+  timings_ms?: Record<string, number>;
 }
 
 export interface RecomputeThemesRequest {
   user_id: string;
-  entries: Array<{ entry_id: string; text: string; embedding: number[] }>;
+  entries: Array<{
+    entry_id: string;
+    text: string;
+    embedding?: number[];
+    embedding_b64?: string | null;
+  }>;
+  previous_themes?: Array<{
+    theme_id: string;
+    entry_ids: string[];
+    label?: string | null;
+    keywords?: string[];
+    strength?: number | null;
+  }> | null;
 }
 
 export interface ThemeMember {
@@ -45,8 +74,17 @@ export interface ThemeResult {
   members: ThemeMember[];
 }
 
+export interface ThemeDiff {
+  baseline: "request" | "cache" | "none";
+  added: string[];
+  removed: string[];
+  changed: string[];
+  unchanged: string[];
+}
+
 export interface RecomputeThemesResponse {
   themes: ThemeResult[];
+  diff?: ThemeDiff | null;
 }
 
 export interface WeeklyEntry {
@@ -116,6 +154,7 @@ export interface ChatTurnRequest {
     created_at?: string;
     mood?: string | null;
     source?: string;
+    embedding?: number[];
   }>;
 }
 
@@ -154,3 +193,50 @@ export interface ChatTurnResponse {
   assistant_message: AssistantMessage;
   safety: SafetyResult;
 }
+
+export interface SimilarRequest {
+  user_id: string;
+  text?: string | null;
+  entry_id?: string | null;
+  k?: number;
+  nprobe?: number | null;
+  strategy?: "auto" | "exact" | "ivf" | null;
+  exclude_entry_ids?: string[];
+}
+
+export interface SimilarEntry {
+  entry_id: string;
+  score: number;
+  text?: string | null;
+  created_at?: string | null;
+  mood?: string | null;
+}
+
+export interface SimilarResponse {
+  results: SimilarEntry[];
+  strategy: "exact" | "ivf";
+  indexed: number;
+}
+
+export type JobStatus = "queued" | "running" | "succeeded" | "failed";
+
+export interface JobSubmitResponse {
+  job_id: string;
+  status: JobStatus;
+  coalesced: boolean;
+}
+
+export interface JobStatusResponse {
+  job_id: string;
+  kind: "recompute_themes" | "weekly_reflection";
+  user_id: string;
+  status: JobStatus;
+  result?: RecomputeThemesResponse | WeeklyReflectionResponse | null;
+  error?: string | null;
+  submissions: number;
+  attempts: number;
+  created_at: string;
+  started_at?: string | null;
+  finished_at?: string | null;
+  callback_status?: "delivered" | "failed" | null;
+}
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .lazy import optional_import
+
+logger = logging.getLogger("nlp-service")
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "models", "onnx"
+)
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Sub-directories written by scripts/export_onnx.py.
+EMBEDDING_TASK = "embedding"
+SENTIMENT_TASK = "sentiment"
+EMOTION_TASK = "emotion"
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class _OnnxModel:
+    def __init__(self, session: Any, tokenizer: Any, max_length: int, model_bytes: int = 0) -> None:
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.model_bytes = model_bytes
+        self._input_names = {model_input.name for model_input in session.get_inputs()}
+
+    def _run(self, texts: Sequence[str]) -> tuple:
+        encodings = self.tokenizer.encode_batch(list(texts))
+        width = min(max(len(encoding.ids) for encoding in encodings), self.max_length)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for row, encoding in enumerate(encodings):
+            length = min(len(encoding.ids), width)
+            ids[row, :length] = encoding.ids[:length]
+            mask[row, :length] = 1
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        outputs = self.session.run(None, {name: feeds[name] for name in self._input_names})
+        return outputs[0], mask
+
+    def _batches(self, texts: Sequence[str], batch_size: int):
+        for start in range(0, len(texts), max(batch_size, 1)):
+            yield texts[start : start + batch_size]
+
+
+class OnnxTextClassifier(_OnnxModel):
+    """ONNX Runtime stand-in for a transformers text-classification pipeline.
+
+    Called like the pipeline and returns the same shapes: one
+    ``{"label", "score"}`` dict per text, or a best-first list of ``top_k``
+    dicts when ``top_k`` is set. A single string is treated as a batch of one.
+    """
+
+    def __init__(
+        self,
+        session: Any,
+        tokenizer: Any,
+        labels: Dict[int, str],
+        max_length: int = 512,
+        top_k: Optional[int] = None,
+        model_bytes: int = 0,
+    ) -> None:
+        super().__init__(session, tokenizer, max_length, model_bytes)
+        self.labels = labels
+        self.top_k = top_k
+
+    def __call__(
+        self,
+        texts: Union[str, Sequence[str]],
+        truncation: bool = True,
+        batch_size: int = 32,
+    ) -> List[Any]:
+        if isinstance(texts, str):
+            texts = [texts]
+        results: List[Any] = []
+        for batch in self._batches(list(texts), batch_size):
+            logits, _ = self._run(batch)
+            for probabilities in _softmax(np.asarray(logits, dtype=np.float32)):
+                order = np.argsort(-probabilities)
+                ranked = [
+                    {"label": self.labels[int(index)], "score": float(probabilities[index])}
+                    for index in order[: self.top_k or 1]
+                ]
+                results.append(ranked if self.top_k else ranked[0])
+        return results
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    """ONNX Runtime stand-in for ``SentenceTransformer.encode``.
+
+    Mean-pools token states over the attention mask, as the exported
+    sentence-transformers models do.
+    """
+
+    def encode(
+        self,
+        sentences: Union[str, Sequence[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        **_: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        rows: List[np.ndarray] = []
+        for batch in self._batches(texts, batch_size):
+            states, mask = self._run(batch)
+            weights = mask[..., None].astype(np.float32)
+            pooled = (np.asarray(states, dtype=np.float32) * weights).sum(axis=1)
+            pooled /= np.maximum(weights.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            rows.append(pooled)
+        embeddings = np.concatenate(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def backend_name(model: Any) -> str:
+    """Metrics label for the runtime behind a loaded model."""
+    return "onnx" if isinstance(model, _OnnxModel) else "torch"
+
+
+def onnx_enabled() -> bool:
+    return INFERENCE_BACKEND in ONNX_FILES
+
+
+def _task_dir(task: str) -> str:
+    return os.path.join(ONNX_MODEL_DIR, task)
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _load_parts(task: str, backend: str):
+    ort = optional_import("onnxruntime")
+    Tokenizer = optional_import("tokenizers", "Tokenizer")
+    if ort is None or Tokenizer is None:
+        logger.warning("onnx backend unavailable: onnxruntime or tokenizers missing")
+        return None
+    directory = _task_dir(task)
+    model_path = os.path.join(directory, ONNX_FILES[backend])
+    tokenizer_path = os.path.join(directory, "tokenizer.json")
+    if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+        logger.warning("onnx model missing task=%s path=%s", task, model_path)
+        return None
+    options = ort.SessionOptions()
+    if ONNX_NUM_THREADS:
+        options.intra_op_num_threads = ONNX_NUM_THREADS
+    session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+    meta = _read_json(os.path.join(directory, "backend.json"))
+    max_length = int(meta.get("max_length", 512))
+    tokenizer = Tokenizer.from_file(tokenizer_path)
+    tokenizer.enable_truncation(max_length)
+    tokenizer.no_padding()
+    return session, tokenizer, max_length, directory, os.path.getsize(model_path)
+
+
+def load_classifier(
+    task: str, top_k: Optional[int] = None, backend: Optional[str] = None
+) -> Optional[OnnxTextClassifier]:
+    parts = _load_parts(task, backend or INFERENCE_BACKEND)
+    if parts is None:
+        return None
+    session, tokenizer, max_length, directory, model_bytes = parts
+    config = _read_json(os.path.join(directory, "config.json"))
+    labels = {int(index): label for index, label in config.get("id2label", {}).items()}
+    return OnnxTextClassifier(
+        session, tokenizer, labels, max_length=max_length, top_k=top_k, model_bytes=model_bytes
+    )
+
+
+def load_encoder(backend: Optional[str] = None) -> Optional[OnnxSentenceEncoder]:
+    parts = _load_parts(EMBEDDING_TASK, backend or INFERENCE_BACKEND)
+    if parts is None:
+        return None
+    session, tokenizer, max_length, _, model_bytes = parts
+    return OnnxSentenceEncoder(session, tokenizer, max_length, model_bytes)
+
+
+@lru_cache(maxsize=1)
+def _keybert_embedder_class():
+    from keybert.backend import BaseEmbedder
+
+    class EncoderBackend(BaseEmbedder):
+        def __init__(self, encoder: OnnxSentenceEncoder) -> None:
+            super().__init__()
+            self.encoder = encoder
+
+        def embed(self, documents, verbose: bool = False) -> np.ndarray:
+            return self.encoder.encode(list(documents))
+
+    return EncoderBackend
+
+
+def keybert_backend(model: Any) -> Any:
+    """Wrap an ONNX encoder so KeyBERT embeds with it instead of loading its own."""
+    if isinstance(model, OnnxSentenceEncoder):
+        return _keybert_embedder_class()(model)
+    return model
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _Pending(Generic[T]):
+    item: T
+    future: Future = field(default_factory=Future)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent single-item calls into one batched call.
+
+    Callers block in ``submit`` while a background worker collects items for
+    up to ``max_wait_ms`` (or until ``max_batch_size`` is reached), runs
+    ``batch_fn`` once and hands each caller its own result.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[Sequence[T]], List[R]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.name = name
+        self._batch_fn = batch_fn
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_Pending[T]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+
+    def submit(self, item: T) -> R:
+        pending: _Pending[T] = _Pending(item)
+        self._ensure_worker()
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "largest_batch": self._largest_batch,
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=f"microbatch-{self.name}", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> List[_Pending[T]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._max_wait_s
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+            try:
+                results = self._batch_fn([pending.item for pending in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results")
+            except Exception as exc:
+                for pending in batch:
+                    pending.future.set_exception(exc)
+                continue
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def content_key(*parts: object) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def json_sizeof(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+class SqliteStore:
+    """Small key/value table used to persist cache entries across restarts."""
+
+    def __init__(self, path: str, table: str = "cache", max_rows: int = 100_000) -> None:
+        self._table = table
+        self._max_rows = max_rows
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, separators=(",", ":")), time.time()),
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._prune()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table}")
+
+    def _prune(self) -> None:
+        self._conn.execute(
+            f"DELETE FROM {self._table} WHERE key IN ("
+            f"SELECT key FROM {self._table} ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_rows,),
+        )
+
+
+class ByteLRUCache:
+    """Thread-safe LRU bounded by the estimated byte size of its values.
+
+    An optional ``store`` (e.g. ``SqliteStore``) is consulted on memory misses
+    and written through on every ``set`` so entries survive restarts. With
+    ``ttl_s`` set, in-memory entries also expire that many seconds after
+    they were written.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[Any], int] = json_sizeof,
+        store: Optional[SqliteStore] = None,
+        ttl_s: Optional[float] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._sizeof = sizeof
+        self._store = store
+        self._items: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[2] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                item = None
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[0]
+        value = self._store.get(key) if self._store is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._insert(key, value)
+        if self._store is not None:
+            self._store.set(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+        if self._store is not None:
+            self._store.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _insert(self, key: str, value: Any) -> None:
+        size = self._sizeof(value) + len(key)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        expires_at = time.monotonic() + self.ttl_s if self.ttl_s is not None else float("inf")
+        self._items[key] = (value, size, expires_at)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._items:
+            _, (_, evicted_size, _) = self._items.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
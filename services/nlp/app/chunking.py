@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+CHUNKING_ENABLED = os.getenv("CHUNKING_ENABLED", "false").lower() in {"true", "1", "yes"}
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "800"))
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "1"))
+CHUNK_POOLING = os.getenv("CHUNK_POOLING", "mean")
+POOLING_METHODS = ("mean", "attention")
+
+# Same band VADER uses to call a compound score neutral.
+SENTIMENT_NEUTRAL_BAND = 0.2
+_ATTENTION_TEMPERATURE = 0.1
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?…])\s+|\n\s*\n")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    pieces: List[str] = []
+    current = ""
+    for word in sentence.split():
+        while len(word) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(
+    text: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+) -> List[str]:
+    """Pack whole sentences into windows of at most ``max_chars``.
+
+    Consecutive windows repeat the last ``overlap_sentences`` sentences so
+    context carries across a boundary. Sentences longer than a window are
+    split on whitespace. Text that already fits comes back as one chunk.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces: List[str] = []
+    for sentence in split_sentences(text):
+        pieces.extend(_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+
+    chunks: List[str] = []
+    window: List[str] = []
+    for piece in pieces:
+        if window and len(" ".join(window + [piece])) > max_chars:
+            chunks.append(" ".join(window))
+            window = window[-overlap_sentences:] if overlap_sentences else []
+            while window and len(" ".join(window + [piece])) > max_chars:
+                window.pop(0)
+        window.append(piece)
+    if window:
+        chunks.append(" ".join(window))
+    return chunks
+
+
+def pool_embeddings(
+    vectors: Sequence[Sequence[float]],
+    weights: Sequence[float],
+    method: str = "mean",
+) -> List[float]:
+    """Combine chunk embeddings into one unit vector.
+
+    ``mean`` weights each chunk by ``weights`` (its length). ``attention``
+    additionally softmaxes each chunk's similarity to that mean, so chunks
+    on the entry's main thread outweigh passing tangents.
+    """
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unsupported pooling method: {method}")
+    matrix = np.asarray(vectors, dtype=np.float32)
+    mix = np.asarray(weights, dtype=np.float32)
+    mix = mix / (mix.sum() or 1.0)
+    pooled = mix @ matrix
+    if method == "attention" and len(matrix) > 1:
+        centre = pooled / (np.linalg.norm(pooled) or 1.0)
+        logits = matrix @ centre / _ATTENTION_TEMPERATURE + np.log(np.maximum(mix, 1e-12))
+        attention = np.exp(logits - logits.max())
+        pooled = (attention / attention.sum()) @ matrix
+    norm = np.linalg.norm(pooled) or 1.0
+    return (pooled / norm).astype(float).tolist()
+
+
+def aggregate_sentiment(
+    results: Sequence[Tuple[str, float]],
+    weights: Sequence[float],
+) -> Tuple[str, float]:
+    """Length-weighted mean of signed chunk scores.
+
+    Scores keep the pipeline's sign convention (negative results are below
+    zero), so mixed chunks pull the total toward neutral.
+    """
+    if len(results) == 1:
+        return results[0]
+    mix = np.asarray(weights, dtype=np.float64)
+    scores = np.asarray([score for _, score in results], dtype=np.float64)
+    score = float(mix @ scores / (mix.sum() or 1.0))
+    if score >= SENTIMENT_NEUTRAL_BAND:
+        return "positive", score
+    if score <= -SENTIMENT_NEUTRAL_BAND:
+        return "negative", score
+    return "neutral", score
@@ -0,0 +1,245 @@
+"""Clustering engine behind theme recompute.
+
+HDBSCAN finds themes of any number and shape and leaves outliers
+unassigned, but its cost grows with the square of the entry count, so it is
+used only while its estimated run time fits ``CLUSTER_HDBSCAN_BUDGET_MS``.
+The estimate is ``CLUSTER_HDBSCAN_NS_PER_PAIR_DIM * rows**2 * dim``; the
+default coefficient was measured with ``benchmarks/bench_clustering.py``,
+which prints the value for the machine it runs on. Below
+``CLUSTER_HDBSCAN_MIN_ROWS`` there is too little density for HDBSCAN to
+find anything, and KMeans is used instead.
+
+With ``CLUSTER_REDUCTION`` set to ``pca`` or ``random`` (projection),
+HDBSCAN runs on embeddings reduced to ``CLUSTER_REDUCED_DIM`` dimensions,
+which both cuts its cost and lets it find density that 384 dimensions
+hide. It defaults to ``none``: reducing changes which entries HDBSCAN
+groups, so existing theme assignments shift when it is turned on. The
+projection is fitted once per user and reused until the user's entry count
+has grown ``CLUSTER_REDUCER_REFIT_GROWTH`` times.
+
+KMeans picks ``k`` by silhouette score on a subsample of at most
+``CLUSTER_SELECTION_SAMPLE`` rows, restarts ``CLUSTER_KMEANS_N_INIT`` times,
+and switches to MiniBatchKMeans from ``CLUSTER_MINIBATCH_MIN_ROWS`` rows.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .lazy import optional_import
+
+KMEANS = "kmeans"
+MINIBATCH_KMEANS = "minibatch_kmeans"
+HDBSCAN = "hdbscan"
+PCA = "pca"
+RANDOM_PROJECTION = "random"
+NO_REDUCTION = "none"
+
+CLUSTER_HDBSCAN_MIN_ROWS = int(os.getenv("CLUSTER_HDBSCAN_MIN_ROWS", "20"))
+CLUSTER_HDBSCAN_BUDGET_MS = float(os.getenv("CLUSTER_HDBSCAN_BUDGET_MS", "500"))
+CLUSTER_HDBSCAN_NS_PER_PAIR_DIM = float(os.getenv("CLUSTER_HDBSCAN_NS_PER_PAIR_DIM", "1.5"))
+CLUSTER_MINIBATCH_MIN_ROWS = int(os.getenv("CLUSTER_MINIBATCH_MIN_ROWS", "5000"))
+CLUSTER_KMEANS_N_INIT = int(os.getenv("CLUSTER_KMEANS_N_INIT", "3"))
+CLUSTER_K_MAX = int(os.getenv("CLUSTER_K_MAX", "8"))
+CLUSTER_SELECTION_SAMPLE = int(os.getenv("CLUSTER_SELECTION_SAMPLE", "1000"))
+CLUSTER_REDUCTION = os.getenv("CLUSTER_REDUCTION", NO_REDUCTION).lower()
+CLUSTER_REDUCED_DIM = int(os.getenv("CLUSTER_REDUCED_DIM", "32"))
+CLUSTER_REDUCER_CACHE_USERS = int(os.getenv("CLUSTER_REDUCER_CACHE_USERS", "1000"))
+CLUSTER_REDUCER_REFIT_GROWTH = float(os.getenv("CLUSTER_REDUCER_REFIT_GROWTH", "2"))
+# Sentence-transformer width, for callers that only know the row count.
+DEFAULT_DIM = 384
+_RANDOM_STATE = 42
+
+
+def hdbscan_cost_ms(rows: int, dim: int = DEFAULT_DIM) -> float:
+    return CLUSTER_HDBSCAN_NS_PER_PAIR_DIM * rows * rows * dim / 1e6
+
+
+def choose_cluster_method(count: int, dim: int = DEFAULT_DIM) -> str:
+    if count >= CLUSTER_HDBSCAN_MIN_ROWS and hdbscan_cost_ms(count, dim) <= CLUSTER_HDBSCAN_BUDGET_MS:
+        return HDBSCAN
+    return MINIBATCH_KMEANS if count >= CLUSTER_MINIBATCH_MIN_ROWS else KMEANS
+
+
+def k_candidates(count: int) -> Sequence[int]:
+    """Cluster counts worth trying: 2 up to one per five entries, capped."""
+    upper = min(CLUSTER_K_MAX, max(2, count // 5), max(count - 1, 2))
+    return range(2, upper + 1)
+
+
+def _kmeans_model(k: int, minibatch: bool, n_init: int):
+    if minibatch:
+        MiniBatchKMeans = optional_import("sklearn.cluster", "MiniBatchKMeans")
+        if MiniBatchKMeans is None:
+            raise RuntimeError("MiniBatchKMeans unavailable")
+        return MiniBatchKMeans(n_clusters=k, n_init=n_init, batch_size=1024, random_state=_RANDOM_STATE)
+    KMeans = optional_import("sklearn.cluster", "KMeans")
+    if KMeans is None:
+        raise RuntimeError("KMeans unavailable")
+    return KMeans(n_clusters=k, n_init=n_init, random_state=_RANDOM_STATE)
+
+
+def select_k(embeddings: np.ndarray, sample_size: int = CLUSTER_SELECTION_SAMPLE) -> int:
+    """The candidate ``k`` with the best silhouette score on a subsample."""
+    candidates = list(k_candidates(embeddings.shape[0]))
+    if len(candidates) == 1:
+        return candidates[0]
+    silhouette_score = optional_import("sklearn.metrics", "silhouette_score")
+    pairwise_distances = optional_import("sklearn.metrics", "pairwise_distances")
+    if silhouette_score is None or pairwise_distances is None:
+        return candidates[0]
+    sample = embeddings
+    if embeddings.shape[0] > sample_size:
+        rows = np.random.default_rng(_RANDOM_STATE).choice(embeddings.shape[0], sample_size, replace=False)
+        sample = embeddings[rows]
+    candidates = [k for k in candidates if k < sample.shape[0]]
+    # One distance matrix serves every candidate's score.
+    distances = pairwise_distances(sample, metric="cosine")
+    best_k, best_score = candidates[0], -np.inf
+    for k in candidates:
+        labels = _kmeans_model(k, minibatch=False, n_init=1).fit_predict(sample)
+        if len(set(labels.tolist())) < 2:
+            continue
+        score = float(silhouette_score(distances, labels, metric="precomputed"))
+        if score > best_score:
+            best_k, best_score = k, score
+    return best_k
+
+
+def cluster_kmeans(
+    embeddings: np.ndarray, k: Optional[int] = None, minibatch: Optional[bool] = None
+) -> np.ndarray:
+    if k is None:
+        k = select_k(embeddings)
+    if minibatch is None:
+        minibatch = embeddings.shape[0] >= CLUSTER_MINIBATCH_MIN_ROWS
+    k = max(1, min(k, embeddings.shape[0]))
+    return _kmeans_model(k, minibatch, CLUSTER_KMEANS_N_INIT).fit_predict(embeddings)
+
+
+@dataclass
+class Reducer:
+    """Linear map ``(x - mean) @ components`` into fewer dimensions."""
+
+    method: str
+    mean: np.ndarray
+    components: np.ndarray
+    fitted_rows: int
+
+    def transform(self, embeddings: np.ndarray) -> np.ndarray:
+        return (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components
+
+
+def reduced_dim(dim: int) -> int:
+    if CLUSTER_REDUCTION == NO_REDUCTION or CLUSTER_REDUCED_DIM <= 0:
+        return dim
+    return min(dim, CLUSTER_REDUCED_DIM)
+
+
+def fit_reducer(
+    embeddings: np.ndarray, method: str = CLUSTER_REDUCTION, dim: int = CLUSTER_REDUCED_DIM
+) -> Optional[Reducer]:
+    """A projection to ``dim`` dimensions, or ``None`` when it would not shrink anything."""
+    rows, width = embeddings.shape
+    if method == NO_REDUCTION or dim <= 0 or width <= dim:
+        return None
+    if method == RANDOM_PROJECTION:
+        components = np.random.default_rng(_RANDOM_STATE).standard_normal((width, dim)) / np.sqrt(dim)
+        return Reducer(method, np.zeros(width, dtype=np.float32), components.astype(np.float32), rows)
+    if method != PCA:
+        raise ValueError(f"Unknown cluster reduction: {method}")
+    data = np.asarray(embeddings, dtype=np.float64)
+    mean = data.mean(axis=0)
+    centred = data - mean
+    keep = min(dim, max(rows - 1, 1))
+    if rows < width:
+        components = np.linalg.svd(centred, full_matrices=False)[2][:keep].T
+    else:
+        # Eigenvectors of the width x width covariance, so the cost stays
+        # O(rows * width^2) however long the history.
+        components = np.linalg.eigh(centred.T @ centred)[1][:, ::-1][:, :keep]
+    return Reducer(method, mean.astype(np.float32), components.astype(np.float32), rows)
+
+
+class ReducerCache:
+    """Per-user fitted projections, least recently used evicted first."""
+
+    def __init__(
+        self,
+        max_users: int = CLUSTER_REDUCER_CACHE_USERS,
+        method: str = CLUSTER_REDUCTION,
+        dim: int = CLUSTER_REDUCED_DIM,
+    ) -> None:
+        self.max_users = max_users
+        self.method = method
+        self.dim = dim
+        self._reducers: "OrderedDict[str, Reducer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fits = 0
+        self.reuses = 0
+
+    def get(self, user_id: str, embeddings: np.ndarray) -> Optional[Reducer]:
+        with self._lock:
+            reducer = self._reducers.get(user_id)
+            if (
+                reducer is not None
+                and reducer.mean.shape[0] == embeddings.shape[1]
+                and embeddings.shape[0] < reducer.fitted_rows * CLUSTER_REDUCER_REFIT_GROWTH
+            ):
+                self._reducers.move_to_end(user_id)
+                self.reuses += 1
+                return reducer
+        reducer = fit_reducer(embeddings, self.method, self.dim)
+        if reducer is None:
+            return None
+        with self._lock:
+            self.fits += 1
+            self._reducers[user_id] = reducer
+            self._reducers.move_to_end(user_id)
+            while len(self._reducers) > self.max_users:
+                self._reducers.popitem(last=False)
+        return reducer
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"users": len(self._reducers), "fits": self.fits, "reuses": self.reuses}
+
+
+@lru_cache(maxsize=1)
+def get_reducer_cache() -> ReducerCache:
+    return ReducerCache()
+
+
+def reduce_for_clustering(embeddings: np.ndarray, user_id: Optional[str] = None) -> np.ndarray:
+    if reduced_dim(embeddings.shape[1]) >= embeddings.shape[1]:
+        return embeddings
+    reducer = get_reducer_cache().get(user_id, embeddings) if user_id else fit_reducer(embeddings)
+    return reducer.transform(embeddings) if reducer is not None else embeddings
+
+
+def cluster_hdbscan(embeddings: np.ndarray) -> np.ndarray:
+    hdbscan = optional_import("hdbscan")
+    if hdbscan is None:
+        raise RuntimeError("HDBSCAN unavailable")
+    model = hdbscan.HDBSCAN(min_cluster_size=3, min_samples=2)
+    return model.fit_predict(embeddings)
+
+
+def cluster_embeddings(embeddings: np.ndarray, user_id: Optional[str] = None) -> Tuple[np.ndarray, str]:
+    """``(labels, method)``; -1 marks entries left out of every cluster.
+
+    ``user_id`` lets the HDBSCAN path reuse that user's fitted projection.
+    """
+    method = choose_cluster_method(embeddings.shape[0], reduced_dim(embeddings.shape[1]))
+    if method == HDBSCAN:
+        try:
+            return cluster_hdbscan(reduce_for_clustering(embeddings, user_id)), HDBSCAN
+        except Exception:
+            return cluster_kmeans(embeddings), "kmeans_fallback"
+    return cluster_kmeans(embeddings, minibatch=method == MINIBATCH_KMEANS), method
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import hashlib
 import random
-from typing import List, Optional, Sequence
+from typing import List, Optional
 
 from .models import (
     ChatMessage,
@@ -15,7 +15,9 @@ from .models import (
     ReflectionPlan,
     RenderedMessage,
 )
-from .pipeline import extract_keyphrases, get_emotion
+from .evidence import select_evidence
+from .features import AnalysisContext
+from .metrics import timed
 
 
 def _seeded_random(seed_text: str) -> random.Random:
@@ -30,10 +32,6 @@ def _snippet(text: str, limit: int = 140) -> str:
     return f"{cleaned[:limit].rstrip()}..."
 
 
-def _pick_entries(entries: Sequence[ContextEntry], count: int = 2) -> List[ContextEntry]:
-    return list(entries[:count])
-
-
 def _emotion_phrase(emotion: str) -> str:
     mapping = {
         "sadness": "heavy",
@@ -65,6 +63,7 @@ def _starter_prompts(mood: Optional[str], time_budget: int) -> List[PromptItem]:
     ]
 
 
+@timed("companion.prompts")
 def build_prompts(
     user_id: str,
     recent_entries: List[ContextEntry],
@@ -72,7 +71,9 @@ def build_prompts(
     themes: List[str],
     mood: Optional[str],
     time_budget: int,
+    context: Optional[AnalysisContext] = None,
 ) -> List[PromptItem]:
+    context = context or AnalysisContext()
     combined = {entry.entry_id: entry for entry in recent_entries + similar_entries}
     combined_entries = list(combined.values())
 
@@ -81,7 +82,7 @@ def build_prompts(
 
     keyphrases: List[str] = []
     for entry in combined_entries:
-        keyphrases.extend(extract_keyphrases(entry.text, top_n=3))
+        keyphrases.extend(context.keyphrases(entry.text, top_n=3))
 
     topics = list(dict.fromkeys([*themes, *keyphrases]))[:6]
     if not topics:
@@ -102,6 +103,8 @@ def build_prompts(
 
     rng.shuffle(templates)
     prompts: List[PromptItem] = []
+    # One batched MMR pass picks each prompt's evidence for its own topic.
+    evidence_sets = select_evidence(user_id, topics[:4], combined_entries, 2)
 
     for index, topic in enumerate(topics):
         if len(prompts) >= 4:
@@ -109,14 +112,13 @@ def build_prompts(
         template = templates[index % len(templates)]
         text = template.format(topic=topic, minutes=time_budget, mood_hint=mood_hint)
         reason = f"Based on recent patterns around {topic}."
-        evidence_entries = _pick_entries(combined_entries, 2)
         evidence = [
             PromptEvidence(
                 entry_id=entry.entry_id,
                 snippet=_snippet(entry.text),
                 reason="Related to a recent entry.",
             )
-            for entry in evidence_entries
+            for entry in evidence_sets[index]
         ]
         prompts.append(
             PromptItem(
@@ -133,6 +135,7 @@ def build_prompts(
     return prompts[:4]
 
 
+@timed("companion.plan")
 def build_reflection_plan(
     user_id: str,
     selected_prompt: str,
@@ -142,6 +145,7 @@ def build_reflection_plan(
     mood: Optional[str],
     safety: dict,
     history: Optional[List[ChatMessage]] = None,
+    context: Optional[AnalysisContext] = None,
 ) -> ReflectionPlan:
     if safety.get("crisis"):
         return ReflectionPlan(
@@ -165,15 +169,16 @@ def build_reflection_plan(
         for message in (history or [])
         if message.role == "user" and message.content.strip()
     ]
+    context = context or AnalysisContext()
     context_text = " ".join(recent_history[-2:] + [latest_user_message])
-    emotion = get_emotion(context_text)
+    emotion = context.emotion(context_text)
     emotion_phrase = _emotion_phrase(emotion)
-    keyphrases = extract_keyphrases(context_text, top_n=3)
+    keyphrases = context.keyphrases(context_text, top_n=3)
     fallback_topic = selected_prompt.replace("?", "").strip() if selected_prompt else ""
     topic = keyphrases[0] if keyphrases else (fallback_topic or "what feels most important")
     mood_hint = f"while feeling {mood.lower()}" if mood else "right now"
 
-    evidence_entries = _pick_entries(retrieved_entries, 2)
+    (evidence_entries,) = select_evidence(user_id, [context_text], retrieved_entries, 2)
     evidence_cards = [
         EvidenceCard(
             entry_id=entry.entry_id,
@@ -219,6 +224,7 @@ def build_reflection_plan(
     )
 
 
+@timed("companion.render")
 def render_plan_to_message(plan: ReflectionPlan) -> RenderedMessage:
     return RenderedMessage(
         validation=plan.validation.text,
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """Persistent float32 embedding matrix shared by every worker process.
+
+    Vectors live in a raw memory-mapped file (``embeddings.f32``) of
+    ``capacity`` rows, so the OS page cache holds a single copy no matter how
+    many uvicorn workers open it. A SQLite index maps content hashes to rows
+    and tracks last use for LRU eviction. The index records the model name
+    and dimension; opening the store with a different model discards every
+    row.
+    """
+
+    def __init__(self, directory: str, model_name: str, capacity: int = 50_000) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.model_name = model_name
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._matrix_path = os.path.join(directory, "embeddings.f32")
+        self._matrix: Optional[np.memmap] = None
+        self._dim = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "hash TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, "
+            "checksum INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS rows_last_used ON rows (last_used)")
+        self._load_meta()
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        if not hashes:
+            return {}
+        with self._lock:
+            if self._matrix is None and not self._attach(int(self._read_meta().get("dim", "0"))):
+                self.misses += len(hashes)
+                return {}
+            found: Dict[str, np.ndarray] = {}
+            placeholders = ",".join("?" for _ in hashes)
+            rows = self._conn.execute(
+                f"SELECT hash, row, checksum FROM rows WHERE hash IN ({placeholders})",
+                list(hashes),
+            ).fetchall()
+            for content_hash, row, checksum in rows:
+                vector = np.array(self._matrix[row], dtype=np.float32)
+                if zlib.crc32(vector.tobytes()) == checksum:
+                    found[content_hash] = vector
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE rows SET last_used = ? WHERE hash = ?",
+                    [(now, content_hash) for content_hash in found],
+                )
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+            return found
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]) -> None:
+        if not vectors:
+            return
+        with self._lock:
+            first = np.asarray(next(iter(vectors.values())), dtype=np.float32)
+            self._ensure_matrix(int(first.shape[0]))
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for content_hash, values in vectors.items():
+                    vector = np.asarray(values, dtype=np.float32)
+                    if vector.shape[0] != self._dim:
+                        continue
+                    row = self._allocate_row(content_hash)
+                    self._matrix[row] = vector
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO rows (hash, row, checksum, last_used) VALUES (?, ?, ?, ?)",
+                        (content_hash, row, zlib.crc32(vector.tobytes()), time.time()),
+                    )
+                self._matrix.flush()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (rows,) = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": int(rows),
+                "capacity": self.capacity,
+                "dim": self._dim,
+            }
+
+    def _load_meta(self) -> None:
+        meta = self._read_meta()
+        expected = {"model_name": self.model_name, "capacity": str(self.capacity)}
+        if any(meta.get(key) != value for key, value in expected.items()):
+            self._reset(dim=0)
+            return
+        self._attach(int(meta.get("dim", "0")))
+
+    def _read_meta(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def _attach(self, dim: int) -> bool:
+        if dim and os.path.exists(self._matrix_path):
+            self._open_matrix(dim, mode="r+")
+            return True
+        return False
+
+    def _reset(self, dim: int) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute("DELETE FROM rows")
+        self._conn.execute("DELETE FROM meta")
+        self._conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("model_name", self.model_name),
+                ("capacity", str(self.capacity)),
+                ("dim", str(dim)),
+            ],
+        )
+        self._conn.execute("COMMIT")
+        self._matrix = None
+        self._dim = 0
+        if dim:
+            self._open_matrix(dim, mode="w+")
+
+    def _ensure_matrix(self, dim: int) -> None:
+        if self._matrix is not None and self._dim == dim:
+            return
+        # Another worker may have created the matrix since this one opened.
+        if int(self._read_meta().get("dim", "0")) == dim and self._attach(dim):
+            return
+        self._reset(dim)
+
+    def _open_matrix(self, dim: int, mode: str) -> None:
+        self._matrix = np.memmap(
+            self._matrix_path, dtype=np.float32, mode=mode, shape=(self.capacity, dim)
+        )
+        self._dim = dim
+
+    def _allocate_row(self, content_hash: str) -> int:
+        existing = self._conn.execute(
+            "SELECT row FROM rows WHERE hash = ?", (content_hash,)
+        ).fetchone()
+        if existing:
+            return int(existing[0])
+        # Rows are only freed by eviction (and reused at once) or by a reset,
+        # so occupied rows are always 0..count-1.
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()
+        if count < self.capacity:
+            return int(count)
+        victim_hash, victim_row = self._conn.execute(
+            "SELECT hash, row FROM rows ORDER BY last_used ASC LIMIT 1"
+        ).fetchone()
+        self._conn.execute("DELETE FROM rows WHERE hash = ?", (victim_hash,))
+        self.evictions += 1
+        return int(victim_row)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import base64
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_HEADER = "X-Embedding-Encoding"
+DEFAULT_EMBEDDING_ENCODING = "json"
+EMBEDDING_DTYPES: Dict[str, str] = {
+    "b64-f32": "<f4",
+    "b64-f16": "<f2",
+}
+
+
+def parse_embedding_encoding(value: Optional[str]) -> str:
+    encoding = (value or DEFAULT_EMBEDDING_ENCODING).strip().lower()
+    if encoding != DEFAULT_EMBEDDING_ENCODING and encoding not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding encoding: {value}")
+    return encoding
+
+
+def pack_array(values: np.ndarray, dtype: str) -> str:
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode("ascii")
+
+
+def unpack_array(data: str, dtype: str, dim: int = 0) -> np.ndarray:
+    values = np.frombuffer(base64.b64decode(data, validate=True), dtype=dtype).astype(np.float32)
+    if dim:
+        return values.reshape(-1, dim)
+    return values
+
+
+def encode_embedding(vector: Sequence[float], encoding: str) -> str:
+    return pack_array(np.asarray(vector), EMBEDDING_DTYPES[encoding])
+
+
+def decode_embedding(data: str, encoding: str) -> np.ndarray:
+    if encoding not in EMBEDDING_DTYPES:
+        raise ValueError(f"Embedding encoding {encoding!r} is not a binary encoding")
+    return unpack_array(data, EMBEDDING_DTYPES[encoding])
+
+
+def embedding_fields(vector: Sequence[float], encoding: str) -> Dict[str, object]:
+    """Response fields for one embedding in the negotiated encoding."""
+    if encoding == DEFAULT_EMBEDDING_ENCODING:
+        return {"embedding": vector}
+    return {
+        "embedding": [],
+        "embedding_b64": encode_embedding(vector, encoding),
+        "embedding_encoding": encoding,
+    }
@@ -0,0 +1,105 @@
+"""Evidence selection by maximal marginal relevance (MMR).
+
+Given the candidate entries for a request and one query per prompt (a
+prompt's topic, or the user's message), each query gets the entries most
+similar to it that are also least similar to the evidence already picked
+for it. All queries are scored together: relevance is one
+``queries x candidates`` product, redundancy one ``candidates x
+candidates`` product, and each greedy MMR step picks for every query at
+once, so the Python loop runs ``k`` times, not ``k`` times per prompt.
+
+Candidate vectors come from the request (``ContextEntry.embedding``), then
+the user's vector index, then the embedding store or model. When any vector
+cannot be had without the hash fallback, selection keeps the caller's
+order, which is the ranking the database already returned.
+"""
+from __future__ import annotations
+
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .models import ContextEntry
+from .pipeline import embed_texts_or_none
+from .vector_index import get_vector_index
+
+EVIDENCE_SELECTION = os.getenv("EVIDENCE_SELECTION", "mmr").lower()
+EVIDENCE_MMR_LAMBDA = float(os.getenv("EVIDENCE_MMR_LAMBDA", "0.7"))
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def mmr_select(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    diversity_lambda: float = EVIDENCE_MMR_LAMBDA,
+) -> np.ndarray:
+    """``(queries, min(k, candidates))`` candidate indices, in pick order per query.
+
+    ``diversity_lambda`` of 1 ranks by relevance alone; lower values trade
+    relevance for distance from what was already picked.
+    """
+    queries = _unit_rows(np.asarray(queries, dtype=np.float32))
+    candidates = _unit_rows(np.asarray(candidates, dtype=np.float32))
+    count = min(k, candidates.shape[0])
+    picks = np.zeros((queries.shape[0], count), dtype=np.int64)
+    if count == 0:
+        return picks
+    relevance = queries @ candidates.T
+    redundancy = candidates @ candidates.T
+    closest = np.zeros_like(relevance)
+    taken = np.zeros(relevance.shape, dtype=bool)
+    rows = np.arange(queries.shape[0])
+    for step in range(count):
+        scores = diversity_lambda * relevance - (1.0 - diversity_lambda) * closest
+        scores[taken] = -np.inf
+        chosen = np.argmax(scores, axis=1)
+        picks[:, step] = chosen
+        taken[rows, chosen] = True
+        np.maximum(closest, redundancy[chosen], out=closest)
+    return picks
+
+
+def candidate_vectors(user_id: str, entries: Sequence[ContextEntry]) -> Optional[np.ndarray]:
+    """One row per entry, or ``None`` when some entry has no trustworthy vector."""
+    vectors: List[Optional[Sequence[float]]] = [entry.embedding or None for entry in entries]
+    index = get_vector_index()
+    if index is not None:
+        for position, entry in enumerate(entries):
+            if vectors[position] is None:
+                vectors[position] = index.vector(user_id, entry.entry_id)
+    missing = [position for position, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = embed_texts_or_none([entries[position].text for position in missing])
+        if computed is None:
+            return None
+        for position, vector in zip(missing, computed):
+            vectors[position] = vector
+    if len({len(vector) for vector in vectors}) != 1:
+        return None
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def select_evidence(
+    user_id: str,
+    queries: Sequence[str],
+    entries: Sequence[ContextEntry],
+    k: int = 2,
+) -> List[List[ContextEntry]]:
+    """``k`` evidence entries for each query, most relevant first."""
+    leading = [list(entries[:k]) for _ in queries]
+    if not queries or len(entries) <= 1 or EVIDENCE_SELECTION != "mmr":
+        return leading
+    query_vectors = embed_texts_or_none(list(queries))
+    if query_vectors is None:
+        return leading
+    candidates = candidate_vectors(user_id, entries)
+    if candidates is None or candidates.shape[1] != len(query_vectors[0]):
+        return leading
+    picks = mmr_select(np.asarray(query_vectors, dtype=np.float32), candidates, k)
+    return [[entries[index] for index in row] for row in picks.tolist()]
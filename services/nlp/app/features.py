@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import normalize_text
+from .pipeline import embed_text, extract_keyphrases, get_emotion, get_sentiment
+
+# Keyphrases are always extracted at least this deep so later, shallower
+# requests for the same text (top 3 for the plan, top 5 for the response)
+# are served by slicing the memoized list.
+MIN_KEYPHRASE_TOP_N = 5
+
+
+class AnalysisContext:
+    """Per-request memo of model outputs keyed by normalized text.
+
+    Each model runs at most once per distinct text for the lifetime of the
+    context. Values can also be seeded from analysis the caller already has
+    (for example an earlier ``/analyze-entry`` response). Every lookup is
+    recorded as computed or reused so handlers can report it.
+    """
+
+    def __init__(self) -> None:
+        self._features: Dict[str, Dict[str, Any]] = {}
+        self.computed: List[str] = []
+        self.reused: List[str] = []
+
+    def seed(
+        self,
+        text: str,
+        sentiment: Optional[Tuple[str, float]] = None,
+        emotion: Optional[str] = None,
+        keyphrases: Optional[List[str]] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        features = self._features.setdefault(normalize_text(text), {})
+        if sentiment is not None:
+            features["sentiment"] = sentiment
+        if emotion is not None:
+            features["emotion"] = emotion
+        if keyphrases is not None:
+            features["keyphrases"] = (max(len(keyphrases), MIN_KEYPHRASE_TOP_N), list(keyphrases))
+        if embedding is not None:
+            features["embedding"] = list(embedding)
+
+    def sentiment(self, text: str) -> Tuple[str, float]:
+        return self._get(text, "sentiment", lambda: get_sentiment(text))
+
+    def emotion(self, text: str) -> str:
+        return self._get(text, "emotion", lambda: get_emotion(text))
+
+    def embedding(self, text: str) -> List[float]:
+        return self._get(text, "embedding", lambda: embed_text(text))
+
+    def keyphrases(self, text: str, top_n: int = 8) -> List[str]:
+        features = self._features.setdefault(normalize_text(text), {})
+        cached = features.get("keyphrases")
+        if cached is not None and cached[0] >= top_n:
+            self.reused.append("keyphrases")
+            return list(cached[1][:top_n])
+        depth = max(top_n, MIN_KEYPHRASE_TOP_N)
+        phrases = extract_keyphrases(text, top_n=depth)
+        features["keyphrases"] = (depth, phrases)
+        self.computed.append("keyphrases")
+        return list(phrases[:top_n])
+
+    def usage(self) -> Dict[str, List[str]]:
+        return {"computed": list(self.computed), "reused": list(self.reused)}
+
+    def _get(self, text: str, name: str, compute) -> Any:
+        features = self._features.setdefault(normalize_text(text), {})
+        if name in features:
+            self.reused.append(name)
+            return features[name]
+        value = compute()
+        features[name] = value
+        self.computed.append(name)
+        return value
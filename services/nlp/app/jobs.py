@@ -0,0 +1,386 @@
+"""SQLite-backed job queue for slow per-user work (theme recompute, weekly reflection).
+
+``submit`` returns a job id at once. A bounded pool of worker threads claims
+due jobs and runs the handler registered for their kind; results are kept
+for polling and optionally POSTed to the job's callback URLs.
+
+Submissions for a user coalesce: while a job of the same kind is still
+queued, a new submission returns the same id. For kinds registered with
+``replace_payload`` (theme recompute, where only the newest data matters)
+it also replaces the queued payload; other kinds (weekly reflection) only
+coalesce with a queued job whose payload is identical, so no caller polls
+a result built from data it never sent. Jobs only become due ``JOBS_COALESCE_WINDOW_MS`` after
+their first submission, so a burst of saves runs one recompute. A job that
+is already running is left alone and the next submission queues a new one.
+
+SQLite stands in for a broker: with ``JOBS_DB_PATH`` on a shared disk,
+every uvicorn worker can submit, claim and report jobs. A claimed job whose
+lease (``JOBS_LEASE_S``) runs out, e.g. because its process died, is
+claimed again up to ``JOBS_MAX_ATTEMPTS`` times.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from .metrics import timed
+
+logger = logging.getLogger("nlp-service")
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH") or ":memory:"
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "1000"))
+JOBS_COALESCE_WINDOW_MS = float(os.getenv("JOBS_COALESCE_WINDOW_MS", "500"))
+JOBS_LEASE_S = float(os.getenv("JOBS_LEASE_S", "300"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETENTION_S = float(os.getenv("JOBS_RETENTION_S", "86400"))
+JOBS_POLL_MS = float(os.getenv("JOBS_POLL_MS", "250"))
+JOBS_CALLBACK_ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.getenv("JOBS_CALLBACK_ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
+    if host.strip()
+}
+JOBS_CALLBACK_SECRET = os.getenv("JOBS_CALLBACK_SECRET", "")
+JOBS_CALLBACK_TIMEOUT_S = float(os.getenv("JOBS_CALLBACK_TIMEOUT_MS", "5000")) / 1000.0
+JOBS_CALLBACK_RETRIES = int(os.getenv("JOBS_CALLBACK_RETRIES", "3"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+SIGNATURE_HEADER = "X-Job-Signature"
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+def callback_allowed(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.scheme in {"http", "https"} and (parsed.hostname or "").lower() in JOBS_CALLBACK_ALLOWED_HOSTS
+
+
+def sign_callback(body: bytes, secret: str = JOBS_CALLBACK_SECRET) -> str:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def _post_callback(url: str, body: bytes) -> None:
+    headers = {"Content-Type": "application/json"}
+    if JOBS_CALLBACK_SECRET:
+        headers[SIGNATURE_HEADER] = sign_callback(body)
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(request, timeout=JOBS_CALLBACK_TIMEOUT_S) as response:
+        response.read()
+
+
+class JobQueue:
+    """Persistent queue plus an in-process pool of worker threads.
+
+    ``handler(kind, replace_payload)`` registers the function that turns a job's JSON
+    payload into its JSON result. Workers start on the first submission (or
+    ``start()``); jobs submitted by other processes sharing the database
+    are picked up by polling every ``JOBS_POLL_MS``. With ``workers=0`` the
+    process only submits and reports, leaving the running to other
+    processes (or to ``run_pending``).
+    """
+
+    def __init__(
+        self,
+        path: str = JOBS_DB_PATH,
+        workers: int = JOBS_WORKERS,
+        coalesce_window_ms: float = JOBS_COALESCE_WINDOW_MS,
+        max_pending: int = JOBS_MAX_PENDING,
+        deliver: Callable[[str, bytes], None] = _post_callback,
+    ) -> None:
+        self.path = path
+        self.workers = max(workers, 0)
+        self.coalesce_window_s = coalesce_window_ms / 1000.0
+        self.max_pending = max_pending
+        self._deliver = deliver
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._replacing_kinds: Set[str] = set()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def handler(
+        self, kind: str, replace_payload: bool = False
+    ) -> Callable[[Callable[[Dict[str, Any]], Any]], Callable[[Dict[str, Any]], Any]]:
+        def decorator(function: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+            self._handlers[kind] = function
+            if replace_payload:
+                self._replacing_kinds.add(kind)
+            else:
+                self._replacing_kinds.discard(kind)
+            return function
+
+        return decorator
+
+    def submit(
+        self, kind: str, user_id: str, payload: Dict[str, Any], callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queue a job, or fold it into the user's queued job of the same kind (see the module docstring)."""
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        now = time.time()
+        # Canonical, so equal payloads compare equal as stored text.
+        body = json.dumps(payload, separators=(",", ":"), sort_keys=True)
+        query = "SELECT id, callback_urls FROM jobs WHERE kind = ? AND user_id = ? AND status = ?"
+        params: Tuple[Any, ...] = (kind, user_id, QUEUED)
+        if kind not in self._replacing_kinds:
+            query += " AND payload = ?"
+            params += (body,)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+                if row is not None:
+                    job_id, coalesced = row[0], True
+                    urls = json.loads(row[1])
+                    if callback_url and callback_url not in urls:
+                        urls.append(callback_url)
+                    conn.execute(
+                        "UPDATE jobs SET payload = ?, callback_urls = ?, submissions = submissions + 1, "
+                        "updated_at = ? WHERE id = ?",
+                        (body, json.dumps(urls), now, job_id),
+                    )
+                else:
+                    (pending,) = conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+                    ).fetchone()
+                    if pending >= self.max_pending:
+                        raise JobQueueFull(f"{pending} jobs pending")
+                    job_id, coalesced = uuid.uuid4().hex, False
+                    conn.execute(
+                        "INSERT INTO jobs (id, kind, user_id, status, payload, callback_urls, submissions, "
+                        "attempts, created_at, updated_at, run_after) VALUES (?, ?, ?, ?, ?, ?, 1, 0, ?, ?, ?)",
+                        (
+                            job_id,
+                            kind,
+                            user_id,
+                            QUEUED,
+                            body,
+                            json.dumps([callback_url] if callback_url else []),
+                            now,
+                            now,
+                            now + self.coalesce_window_s,
+                        ),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.start()
+        self._wake.set()
+        logger.info("job_submitted job_id=%s kind=%s user_id=%s coalesced=%s", job_id, kind, user_id, coalesced)
+        return {"job_id": job_id, "status": QUEUED, "coalesced": coalesced}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT id, kind, user_id, status, result, error, submissions, attempts, created_at, "
+                "started_at, finished_at, callback_status FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "user_id": row[2],
+            "status": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "submissions": row[6],
+            "attempts": row[7],
+            "created_at": _iso(row[8]),
+            "started_at": _iso(row[9]),
+            "finished_at": _iso(row[10]),
+            "callback_status": row[11],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(
+                self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            )
+        return {status: int(counts.get(status, 0)) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads or not self.workers:
+                return
+            self._stopped.clear()
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_pending(self) -> int:
+        """Run every due job in the calling thread; returns how many ran."""
+        ran = 0
+        while self._run_one():
+            ran += 1
+        return ran
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            if self.path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT NOT NULL, status TEXT NOT NULL, "
+                "payload TEXT NOT NULL, result TEXT, error TEXT, callback_urls TEXT NOT NULL, "
+                "callback_status TEXT, submissions INTEGER NOT NULL, attempts INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, run_after REAL NOT NULL, "
+                "started_at REAL, finished_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, run_after)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (kind, user_id, status)")
+        return self._conn
+
+    def _work(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                ran = self._run_one()
+            except Exception:
+                logger.exception("job_worker_error")
+                ran = False
+            if not ran:
+                self._wake.wait(JOBS_POLL_MS / 1000.0)
+                self._wake.clear()
+
+    def _claim(self) -> Optional[tuple]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT id, kind, payload, attempts, status FROM jobs "
+                        "WHERE (status = ? AND run_after <= ?) OR (status = ? AND started_at < ?) "
+                        "ORDER BY run_after LIMIT 1",
+                        (QUEUED, now, RUNNING, now - JOBS_LEASE_S),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    job_id, kind, payload, attempts, status = row
+                    if status == RUNNING and attempts >= JOBS_MAX_ATTEMPTS:
+                        conn.execute(
+                            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                            (FAILED, "lease expired", now, now, job_id),
+                        )
+                        continue
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, updated_at = ? "
+                        "WHERE id = ?",
+                        (RUNNING, now, now, job_id),
+                    )
+                    conn.execute(
+                        "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                        (SUCCEEDED, FAILED, now - JOBS_RETENTION_S),
+                    )
+                    conn.execute("COMMIT")
+                    return job_id, kind, json.loads(payload), now
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _run_one(self) -> bool:
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        job_id, kind, payload, started_at = claimed
+        result: Any = None
+        error: Optional[str] = None
+        try:
+            with timed(f"jobs.{kind}"):
+                result = self._handlers[kind](payload)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            logger.warning("job_failed job_id=%s kind=%s error=%s", job_id, kind, error)
+        status = FAILED if error else SUCCEEDED
+        finished_at = time.time()
+        with self._lock:
+            # A job whose lease ran out may have been claimed again; only the
+            # current claim records its outcome.
+            cursor = self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE id = ? AND started_at = ?",
+                (
+                    status,
+                    json.dumps(result, separators=(",", ":")) if error is None else None,
+                    error,
+                    finished_at,
+                    finished_at,
+                    job_id,
+                    started_at,
+                ),
+            )
+            owned = cursor.rowcount == 1
+        logger.info(
+            "job_finished job_id=%s kind=%s status=%s ms=%.1f",
+            job_id,
+            kind,
+            status,
+            (finished_at - started_at) * 1000,
+        )
+        if owned:
+            self._notify(job_id)
+        return True
+
+    def _notify(self, job_id: str) -> None:
+        with self._lock:
+            row = self._connection().execute("SELECT callback_urls FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        urls = json.loads(row[0]) if row else []
+        if not urls:
+            return
+        body = json.dumps(self.get(job_id), separators=(",", ":")).encode("utf-8")
+        delivered = 0
+        for url in urls:
+            for attempt in range(max(JOBS_CALLBACK_RETRIES, 1)):
+                try:
+                    self._deliver(url, body)
+                    delivered += 1
+                    break
+                except Exception as exc:
+                    logger.warning("job_callback_failed job_id=%s attempt=%s error=%s", job_id, attempt + 1, exc)
+                    if attempt + 1 < JOBS_CALLBACK_RETRIES:
+                        time.sleep(0.5 * 2**attempt)
+        status = "delivered" if delivered == len(urls) else "failed"
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+
+job_queue = JobQueue()
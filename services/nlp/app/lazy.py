@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import importlib
+from functools import lru_cache
+from typing import Any, Optional
+
+# Optional backends that take seconds and hundreds of MB to import. They are
+# only imported through ``optional_import`` so ``import app.main`` stays fast;
+# tests/test_import_time.py keeps it that way.
+HEAVY_MODULES = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "keybert",
+    "yake",
+    "vaderSentiment",
+    "sklearn",
+    "hdbscan",
+    "scipy",
+    "openai",
+    "onnxruntime",
+    "tokenizers",
+)
+
+
+@lru_cache(maxsize=None)
+def optional_import(module: str, attribute: Optional[str] = None) -> Any:
+    """Import an optional dependency on first use; ``None`` when unavailable."""
+    try:
+        imported = importlib.import_module(module)
+        return getattr(imported, attribute) if attribute else imported
+    except Exception:
+        return None
@@ -1,44 +1,92 @@
 import logging
 import os
+import time
 import uuid
-from typing import Dict
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Annotated, Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from .models import (
+    AnalyzeBatchItem,
+    AnalyzeBatchRequest,
+    AnalyzeBatchResponse,
     AnalyzeEntryRequest,
     AnalyzeEntryResponse,
     ChatTurnRequest,
     ChatTurnResponse,
     ChatTurnRequestV1,
     ChatTurnResponseV1,
+    ChunkingOptions,
+    ContextEntry,
     ExtractedData,
+    FeatureUsage,
     GeneratePromptsRequest,
     GeneratePromptsResponse,
+    IncrementalThemesRequest,
+    IncrementalThemesResponse,
+    JobStatusResponse,
+    JobSubmitResponse,
+    PreviousTheme,
     PromptsRequestV1,
     PromptsResponseV1,
     PromptRationale,
+    ReflectionPlan,
+    RecomputeThemesJobRequest,
     RecomputeThemesRequest,
     RecomputeThemesResponse,
+    RenderedMessage,
+    SimilarEntry,
+    SimilarRequest,
+    SimilarResponse,
+    ThemeDiff,
+    WeeklyReflectionJobRequest,
     WeeklyReflectionRequest,
     WeeklyReflectionResponse,
 )
 from .pipeline import (
+    cache_stats,
+    embed_entry,
     embed_text,
+    embed_texts,
+    embed_texts_or_none,
     extract_keyphrases,
-    get_keybert,
+    extract_keyphrases_batch,
     get_sentiment,
-    get_sentiment_pipeline,
-    get_embedding_model,
-    get_emotion,
-    get_emotion_pipeline,
+    get_sentiments,
+    is_fallback_embedding,
+    sentiment_of_chunks,
 )
+from .chunking import (
+    CHUNK_MAX_CHARS,
+    CHUNK_OVERLAP_SENTENCES,
+    CHUNK_POOLING,
+    CHUNKING_ENABLED,
+    chunk_text,
+)
+from .encoding import (
+    EMBEDDING_DTYPES,
+    EMBEDDING_HEADER,
+    decode_embedding,
+    embedding_fields,
+    parse_embedding_encoding,
+)
+from .clustering import get_reducer_cache
+from .features import AnalysisContext
+from .jobs import JobQueueFull, callback_allowed, job_queue
 from .companion import build_prompts, build_reflection_plan, render_plan_to_message
-from .openai_rewriter import rewrite_plan
-from .safety import detect_crisis
-from .themes import recompute_themes
+from .openai_rewriter import rewrite_cache_stats, rewrite_plan_async
+from .metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, observe_stage, render_metrics, timed
+from .model_server import ModelServerError, get_model_client
+from .registry import model_registry
+from .safety import detect_crisis, screen_crisis
+from .themes import recompute_themes_shared, theme_cache_stats, update_themes_incremental
+from .vector_index import SIMILAR_STRATEGY, get_vector_index
 from .weekly import build_weekly_reflection
 
 load_dotenv()
@@ -48,8 +96,11 @@ logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 MAX_TEXT_LENGTH = int(os.getenv("MAX_TEXT_LENGTH", "400"))
 MAX_ENTRIES_PER_REQUEST = int(os.getenv("MAX_ENTRIES_PER_REQUEST", "12"))
+ANALYZE_PIPELINE_MODE = os.getenv("ANALYZE_PIPELINE_MODE", "sequential")
+CRISIS_ENRICHMENT_POLICY = os.getenv("CRISIS_ENRICHMENT_POLICY", "full")
 
 app = FastAPI(title="DearMe NLP Service", version="0.3.0")
+app.add_middleware(MetricsMiddleware)
 
 cors_origins = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin]
 if cors_origins:
@@ -64,14 +115,16 @@ if cors_origins:
 
 @app.on_event("startup")
 def warm_models() -> None:
-    try:
-        get_embedding_model()
-        get_sentiment_pipeline()
-        get_emotion_pipeline()
-        get_keybert()
-        logger.info("NLP models loaded")
-    except Exception:
-        logger.warning("NLP models failed to load, falling back where possible.")
+    # Loads run in background threads so the process answers /health at
+    # once; /ready stays 503 until every eager model has settled. Workers
+    # backed by a model server load nothing themselves.
+    if get_model_client() is None:
+        model_registry.load_in_background()
+
+
+@app.on_event("shutdown")
+def stop_job_workers() -> None:
+    job_queue.stop()
 
 
 @app.get("/health")
@@ -79,6 +132,35 @@ def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    client = get_model_client()
+    if client is None:
+        report = model_registry.report()
+    else:
+        try:
+            report = {**client.call("ready"), "model_server": client.address}
+        except ModelServerError as exc:
+            report = {"ready": False, "models": {}, "model_server": client.address, "error": str(exc)}
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/cache/stats")
+def cache_stats_handler() -> Dict[str, Dict[str, int]]:
+    stats = {**cache_stats(), "rewrites": rewrite_cache_stats(), "themes": theme_cache_stats()}
+    index = get_vector_index()
+    if index is not None:
+        stats["vector_index"] = index.stats()
+    stats["jobs"] = job_queue.stats()
+    stats["cluster_reducers"] = get_reducer_cache().stats()
+    return stats
+
+
 @app.get("/")
 def root() -> Dict[str, str]:
     return {"status": "ok", "docs": "/docs"}
@@ -96,6 +178,42 @@ def _merge_entries(*entry_lists):
     return merged
 
 
+def _embedding_encoding(value: Optional[str]) -> str:
+    try:
+        return parse_embedding_encoding(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _theme_entry_dicts(entries, encoding: str) -> List[Dict]:
+    decoded = []
+    for entry in entries:
+        item = entry.model_dump(exclude={"embedding_b64"})
+        if entry.embedding_b64:
+            if encoding not in EMBEDDING_DTYPES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"embedding_b64 needs {EMBEDDING_HEADER}: {' or '.join(EMBEDDING_DTYPES)}",
+                )
+            try:
+                item["embedding"] = decode_embedding(entry.embedding_b64, encoding)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail="Invalid embedding_b64") from exc
+        if len(item["embedding"]) == 0:
+            raise HTTPException(status_code=400, detail="Missing embedding")
+        if decoded and len(item["embedding"]) != len(decoded[0]["embedding"]):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Embedding dimensions differ: {len(decoded[0]['embedding'])} and {len(item['embedding'])}",
+            )
+        decoded.append(item)
+    return decoded
+
+
+def _theme_payloads(themes) -> List[Dict]:
+    return [asdict(theme) for theme in themes]
+
+
 def _limit_entries(entries):
     return entries[:MAX_ENTRIES_PER_REQUEST]
 
@@ -133,12 +251,94 @@ def _handle_prompts_v1(payload: PromptsRequestV1) -> PromptsResponseV1:
     return PromptsResponseV1(prompts=prompts, rationale=rationale, safety=safety)
 
 
-def _handle_chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
-    request_id = uuid.uuid4().hex
+def _chat_context(payload: ChatTurnRequestV1, message: str) -> AnalysisContext:
+    context = AnalysisContext()
+    analysis = payload.message_analysis
+    # Earlier analysis only describes this message if it was not truncated.
+    if analysis is not None and payload.user_message.strip() == message:
+        context.seed(
+            message,
+            sentiment=(analysis.sentiment.label, analysis.sentiment.score)
+            if analysis.sentiment
+            else None,
+            emotion=analysis.emotion,
+            keyphrases=analysis.keyphrases,
+        )
+    return context
+
+
+def _index_entries(user_id: str, entries: Sequence[Tuple[AnalyzeEntryRequest, List[float]]]) -> None:
+    # Callers pass model vectors only: like the embedding store, the index
+    # never keeps hash fallbacks, which would outlive an outage on disk.
+    index = get_vector_index()
+    if index is None:
+        return
+    # One save per call: each save rewrites the user's whole index file.
+    try:
+        index.upsert_many(
+            user_id,
+            [
+                (entry.entry_id, embedding, {"text": entry.text, "created_at": entry.created_at, "mood": entry.mood})
+                for entry, embedding in entries
+            ],
+        )
+    except Exception:
+        logger.warning("vector_index upsert failed user_id=%s entries=%s", user_id, len(entries))
+
+
+def _should_index(entry: AnalyzeEntryRequest) -> bool:
+    return get_vector_index() is not None and entry.index is not False
+
+
+def _self_retrieved_entries(payload: ChatTurnRequestV1, message: str) -> List[ContextEntry]:
+    """The user's nearest indexed entries to ``message``, in place of caller-sent ones."""
+    index = get_vector_index()
+    if index is None or not message:
+        return []
+    # A hash fallback query would rank the index at random.
+    query = embed_texts_or_none([message])
+    if query is None:
+        return []
+    results, _, _ = index.search(
+        payload.user_id,
+        query[0],
+        payload.retrieve_k,
+        exclude=[entry.entry_id for entry in payload.recent_entries],
+    )
+    return [
+        ContextEntry(
+            entry_id=entry_id,
+            text=meta.get("text") or "",
+            created_at=meta.get("created_at"),
+            mood=meta.get("mood"),
+        )
+        for entry_id, _, meta in results
+        if meta.get("text")
+    ]
+
+
+def _render_text(rendered: RenderedMessage) -> str:
+    return " ".join(
+        [rendered.validation, rendered.reflection, rendered.pattern_connection, rendered.gentle_nudge]
+    ).strip()
+
+
+@timed("chat.prepare")
+def _prepare_chat_turn_v1(
+    payload: ChatTurnRequestV1,
+) -> Tuple[ChatTurnResponseV1, ReflectionPlan]:
     message = payload.user_message.strip()[:MAX_TEXT_LENGTH]
     safety = detect_crisis(message)
+    context = _chat_context(payload, message)
+
+    sentiment_label, sentiment_score = context.sentiment(message)
+    emotion = context.emotion(message)
+    keyphrases = context.keyphrases(message, top_n=5)
 
-    merged_entries = _merge_entries(payload.retrieved_entries, payload.recent_entries)
+    retrieved_entries = payload.retrieved_entries
+    if payload.self_retrieve and not retrieved_entries:
+        retrieved_entries = _self_retrieved_entries(payload, message)
+    merged_entries = _merge_entries(retrieved_entries, payload.recent_entries)
     merged_entries = _limit_entries(merged_entries)
 
     plan = build_reflection_plan(
@@ -150,36 +350,12 @@ def _handle_chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
         mood=payload.mood,
         safety=safety,
         history=payload.history,
+        context=context,
     )
 
     rendered = render_plan_to_message(plan)
-    mode = "deterministic"
-
-    if payload.enhanced_language and not plan.safety.crisis:
-        rewritten = rewrite_plan(plan, plan.evidence_cards, plan.constraints)
-        if rewritten:
-            rendered = rewritten
-            mode = "enhanced"
-
-    sentiment_label, sentiment_score = get_sentiment(message)
-    emotion = get_emotion(message)
-    keyphrases = extract_keyphrases(message, top_n=5)
-
-    assistant_message = " ".join(
-        [rendered.validation, rendered.reflection, rendered.pattern_connection, rendered.gentle_nudge]
-    ).strip()
-
-    logger.info(
-        "chat_turn request_id=%s user_id=%s chat_id=%s msg_len=%s mode=%s",
-        request_id,
-        payload.user_id,
-        payload.chat_id,
-        len(message),
-        mode,
-    )
-
-    return ChatTurnResponseV1(
-        assistant_message=assistant_message,
+    response = ChatTurnResponseV1(
+        assistant_message=_render_text(rendered),
         follow_up_question=rendered.follow_up_question,
         extracted=ExtractedData(
             sentiment={"label": sentiment_label, "score": sentiment_score},
@@ -189,42 +365,266 @@ def _handle_chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
         ),
         evidence=plan.evidence_cards,
         safety=plan.safety,
-        mode=mode,
+        mode="deterministic",
+        features=FeatureUsage(**context.usage()),
     )
+    return response, plan
+
+
+async def _handle_chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
+    request_id = uuid.uuid4().hex
+    # Model work stays on the threadpool; only the upstream rewrite is awaited
+    # on the event loop, bounded by OPENAI_DEADLINE_MS.
+    response, plan = await run_in_threadpool(_prepare_chat_turn_v1, payload)
+
+    if payload.enhanced_language and not plan.safety.crisis:
+        rewritten = await rewrite_plan_async(plan, plan.evidence_cards, plan.constraints)
+        if rewritten:
+            response = response.model_copy(
+                update={
+                    "assistant_message": _render_text(rewritten),
+                    "follow_up_question": rewritten.follow_up_question,
+                    "mode": "enhanced",
+                }
+            )
+
+    logger.info(
+        "chat_turn request_id=%s user_id=%s chat_id=%s msg_len=%s mode=%s computed=%s reused=%s",
+        request_id,
+        payload.user_id,
+        payload.chat_id,
+        len(payload.user_message.strip()[:MAX_TEXT_LENGTH]),
+        response.mode,
+        len(response.features.computed),
+        len(response.features.reused),
+    )
+    return response
+
+
+def _entry_chunks(text: str, options: Optional[ChunkingOptions]) -> Tuple[List[str], str]:
+    """Chunks and pooling method for a request, or ``[text]`` when chunking is off."""
+    enabled = CHUNKING_ENABLED if options is None else options.enabled
+    options = options or ChunkingOptions()
+    pooling = options.pooling or CHUNK_POOLING
+    if not enabled:
+        return [text], pooling
+    max_chars = options.max_chars or CHUNK_MAX_CHARS
+    overlap = CHUNK_OVERLAP_SENTENCES if options.overlap_sentences is None else options.overlap_sentences
+    return chunk_text(text, max_chars, overlap) or [text], pooling
+
+
+@contextmanager
+def _timed_stage(timings: Dict[str, float], name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[name] = round(elapsed * 1000, 3)
+        observe_stage(f"analyze.{name}", elapsed)
+
+
+def _warm_enrichment(text: str) -> None:
+    """Fill the keyphrase cache and embedding store for a deferred entry.
+
+    Sentiment has no cache, so it is left for whoever asks for it later.
+    """
+    try:
+        extract_keyphrases(text)
+        embed_text(text)
+    except Exception:
+        logger.warning("analyze_entry deferred enrichment failed")
 
 
 @app.post("/analyze-entry", response_model=AnalyzeEntryResponse)
-def analyze_entry(payload: AnalyzeEntryRequest) -> AnalyzeEntryResponse:
+def analyze_entry(
+    payload: AnalyzeEntryRequest,
+    background_tasks: BackgroundTasks,
+    x_embedding_encoding: Annotated[Optional[str], Header(alias=EMBEDDING_HEADER)] = None,
+) -> AnalyzeEntryResponse:
+    encoding = _embedding_encoding(x_embedding_encoding)
+    mode = payload.pipeline_mode or ANALYZE_PIPELINE_MODE
+    policy = payload.crisis_policy or CRISIS_ENRICHMENT_POLICY
     logger.info(
-        "analyze_entry user_id=%s entry_id=%s text_len=%s",
+        "analyze_entry user_id=%s entry_id=%s text_len=%s mode=%s",
         payload.user_id,
         payload.entry_id,
         len(payload.text),
+        mode,
     )
 
-    sentiment_label, sentiment_score = get_sentiment(payload.text)
-    keyphrases = extract_keyphrases(payload.text)
-    embedding = embed_text(payload.text)
-    safety = detect_crisis(payload.text)
+    timings: Dict[str, float] = {}
+    safety = None
+    if mode == "staged":
+        # The streamed lexicon scan costs far less than any model call, so a
+        # flagged entry can skip or defer enrichment under the crisis policy.
+        with _timed_stage(timings, "safety"):
+            safety = screen_crisis(payload.text)
+        if safety["crisis"] and policy != "full":
+            enrichment = "skipped"
+            if policy == "defer":
+                background_tasks.add_task(_warm_enrichment, payload.text)
+                enrichment = "deferred"
+            logger.info(
+                "analyze_entry_stages entry_id=%s enrichment=%s timings_ms=%s",
+                payload.entry_id,
+                enrichment,
+                timings,
+            )
+            return AnalyzeEntryResponse(safety=safety, enrichment=enrichment, timings_ms=timings)
+
+    chunks, pooling = _entry_chunks(payload.text, payload.chunking)
+    # Long entries are scored chunk by chunk in one batched call per model,
+    # so text past the models' token limit is no longer truncated away.
+    with _timed_stage(timings, "sentiment"):
+        if len(chunks) > 1:
+            sentiment_label, sentiment_score = sentiment_of_chunks(chunks)
+        else:
+            sentiment_label, sentiment_score = get_sentiment(payload.text)
+    with _timed_stage(timings, "keyphrases"):
+        keyphrases = extract_keyphrases(payload.text)
+    with _timed_stage(timings, "embedding"):
+        embedding, from_model = embed_entry(chunks, pooling)
+    if safety is None:
+        with _timed_stage(timings, "safety"):
+            safety = detect_crisis(payload.text)
+    if _should_index(payload) and from_model:
+        background_tasks.add_task(_index_entries, payload.user_id, [(payload, embedding)])
+    logger.info(
+        "analyze_entry_stages entry_id=%s enrichment=complete timings_ms=%s",
+        payload.entry_id,
+        timings,
+    )
 
     return AnalyzeEntryResponse(
         sentiment={"label": sentiment_label, "score": sentiment_score},
         keyphrases=keyphrases,
-        embedding=embedding,
         safety=safety,
+        timings_ms=timings,
+        chunk_count=len(chunks),
+        **embedding_fields(embedding, encoding),
     )
 
 
+def _batched_stage(
+    name: str,
+    batch_fn: Callable[[Sequence[str]], List[Any]],
+    item_fn: Callable[[str], Any],
+    texts: Sequence[str],
+) -> List[Tuple[Any, Optional[str]]]:
+    try:
+        results = batch_fn(texts)
+        if len(results) == len(texts):
+            return [(result, None) for result in results]
+    except Exception:
+        logger.warning("analyze_batch stage=%s batch_failed, retrying per item", name)
+
+    outcomes: List[Tuple[Any, Optional[str]]] = []
+    for text in texts:
+        try:
+            outcomes.append((item_fn(text), None))
+        except Exception as exc:
+            outcomes.append((None, f"{name} failed: {type(exc).__name__}"))
+    return outcomes
+
+
+@app.post("/v1/analyze-batch", response_model=AnalyzeBatchResponse)
+def analyze_batch(
+    payload: AnalyzeBatchRequest,
+    background_tasks: BackgroundTasks,
+    x_embedding_encoding: Annotated[Optional[str], Header(alias=EMBEDDING_HEADER)] = None,
+) -> AnalyzeBatchResponse:
+    logger.info("analyze_batch entries=%s", len(payload.entries))
+    encoding = _embedding_encoding(x_embedding_encoding)
+    texts = [entry.text for entry in payload.entries]
+
+    sentiments = _batched_stage("sentiment", get_sentiments, get_sentiment, texts)
+    keyphrases = _batched_stage("keyphrases", extract_keyphrases_batch, extract_keyphrases, texts)
+    embeddings = _batched_stage("embedding", embed_texts, embed_text, texts)
+
+    results: List[AnalyzeBatchItem] = []
+    to_index: Dict[str, List[Tuple[AnalyzeEntryRequest, List[float]]]] = {}
+    for index, entry in enumerate(payload.entries):
+        errors = [
+            error
+            for _, error in (sentiments[index], keyphrases[index], embeddings[index])
+            if error
+        ]
+        if errors:
+            results.append(AnalyzeBatchItem(entry_id=entry.entry_id, error="; ".join(errors)))
+            continue
+        sentiment_label, sentiment_score = sentiments[index][0]
+        if _should_index(entry) and not is_fallback_embedding(entry.text, embeddings[index][0]):
+            to_index.setdefault(entry.user_id, []).append((entry, embeddings[index][0]))
+        results.append(
+            AnalyzeBatchItem(
+                entry_id=entry.entry_id,
+                result=AnalyzeEntryResponse(
+                    sentiment={"label": sentiment_label, "score": sentiment_score},
+                    keyphrases=keyphrases[index][0],
+                    safety=detect_crisis(entry.text),
+                    **embedding_fields(embeddings[index][0], encoding),
+                ),
+            )
+        )
+    for user_id, indexed in to_index.items():
+        background_tasks.add_task(_index_entries, user_id, indexed)
+    return AnalyzeBatchResponse(results=results)
+
+
 @app.post("/recompute-themes", response_model=RecomputeThemesResponse)
-def recompute_themes_handler(payload: RecomputeThemesRequest) -> RecomputeThemesResponse:
+def recompute_themes_handler(
+    payload: RecomputeThemesRequest,
+    x_embedding_encoding: Annotated[Optional[str], Header(alias=EMBEDDING_HEADER)] = None,
+) -> RecomputeThemesResponse:
     logger.info("recompute_themes user_id=%s entries=%s", payload.user_id, len(payload.entries))
-    themes = recompute_themes([entry.model_dump() for entry in payload.entries])
-    return RecomputeThemesResponse(themes=themes)
+    entries = _theme_entry_dicts(payload.entries, _embedding_encoding(x_embedding_encoding))
+    return _recompute_themes_response(
+        payload.user_id, entries, payload.include_state, _previous_theme_dicts(payload.previous_themes)
+    )
+
+
+def _previous_theme_dicts(previous_themes: Optional[List[PreviousTheme]]) -> Optional[List[Dict]]:
+    if previous_themes is None:
+        return None
+    return [theme.model_dump() for theme in previous_themes]
+
+
+def _recompute_themes_response(
+    user_id: str, entries: List[Dict], include_state: bool, previous_themes: Optional[List[Dict]] = None
+) -> RecomputeThemesResponse:
+    themes, state, diff = recompute_themes_shared(user_id, entries, include_state, previous_themes)
+    return RecomputeThemesResponse(
+        themes=_theme_payloads(themes), state=state, diff=ThemeDiff(**asdict(diff))
+    )
+
+
+@app.post("/v1/themes/incremental", response_model=IncrementalThemesResponse)
+def incremental_themes_handler(
+    payload: IncrementalThemesRequest,
+    x_embedding_encoding: Annotated[Optional[str], Header(alias=EMBEDDING_HEADER)] = None,
+) -> IncrementalThemesResponse:
+    (entry,) = _theme_entry_dicts([payload.entry], _embedding_encoding(x_embedding_encoding))
+    themes, state, action, drift = update_themes_incremental(entry, payload.state, payload.user_id)
+    logger.info(
+        "incremental_themes user_id=%s entry_id=%s action=%s themes=%s",
+        payload.user_id,
+        payload.entry.entry_id,
+        action,
+        len(themes),
+    )
+    return IncrementalThemesResponse(
+        themes=_theme_payloads(themes), state=state, action=action, drift=drift
+    )
 
 
 @app.post("/weekly-reflection", response_model=WeeklyReflectionResponse)
 def weekly_reflection(payload: WeeklyReflectionRequest) -> WeeklyReflectionResponse:
     logger.info("weekly_reflection user_id=%s entries=%s", payload.user_id, len(payload.entries))
+    return _weekly_reflection_response(payload)
+
+
+def _weekly_reflection_response(payload: WeeklyReflectionRequest) -> WeeklyReflectionResponse:
     if not payload.entries:
         return WeeklyReflectionResponse(
             summary_blocks=[],
@@ -299,5 +699,114 @@ def prompts_v1(payload: PromptsRequestV1) -> PromptsResponseV1:
 
 
 @app.post("/v1/chat/turn", response_model=ChatTurnResponseV1)
-def chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
-    return _handle_chat_turn_v1(payload)
\ No newline at end of file
+async def chat_turn_v1(payload: ChatTurnRequestV1) -> ChatTurnResponseV1:
+    return await _handle_chat_turn_v1(payload)
+
+
+@app.post("/v1/similar", response_model=SimilarResponse)
+def similar_entries(payload: SimilarRequest) -> SimilarResponse:
+    index = get_vector_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Vector index disabled")
+    exclude = list(payload.exclude_entry_ids)
+    query = None
+    if payload.entry_id:
+        query = index.vector(payload.user_id, payload.entry_id)
+        exclude.append(payload.entry_id)
+    if query is None and payload.text:
+        # A hash fallback would rank the indexed model vectors against noise.
+        vectors = embed_texts_or_none([payload.text])
+        if vectors is None:
+            raise HTTPException(status_code=503, detail="Embedding model unavailable")
+        query = vectors[0]
+    if query is None:
+        raise HTTPException(
+            status_code=404 if payload.entry_id else 400,
+            detail="Entry not indexed" if payload.entry_id else "Provide text or entry_id",
+        )
+    results, strategy, indexed = index.search(
+        payload.user_id, query, payload.k, payload.nprobe, exclude, payload.strategy or SIMILAR_STRATEGY
+    )
+    logger.info(
+        "similar user_id=%s k=%s strategy=%s indexed=%s", payload.user_id, payload.k, strategy, indexed
+    )
+    return SimilarResponse(
+        results=[
+            SimilarEntry(entry_id=entry_id, score=round(score, 6), **meta)
+            for entry_id, score, meta in results
+        ],
+        strategy=strategy,
+        indexed=indexed,
+    )
+
+
+@app.delete("/v1/similar/{user_id}/{entry_id}")
+def remove_indexed_entry(user_id: str, entry_id: str) -> Dict[str, bool]:
+    index = get_vector_index()
+    return {"removed": bool(index is not None and index.remove(user_id, entry_id))}
+
+
+@job_queue.handler("recompute_themes", replace_payload=True)
+def _run_recompute_themes_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    response = _recompute_themes_response(
+        payload["user_id"], payload["entries"], payload["include_state"], payload.get("previous_themes")
+    )
+    return response.model_dump()
+
+
+@job_queue.handler("weekly_reflection")
+def _run_weekly_reflection_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return _weekly_reflection_response(WeeklyReflectionRequest(**payload)).model_dump()
+
+
+def _submit_job(kind: str, user_id: str, payload: Dict[str, Any], callback_url: Optional[str]) -> JSONResponse:
+    if callback_url and not callback_allowed(callback_url):
+        raise HTTPException(status_code=400, detail="callback_url host not allowed")
+    try:
+        submitted = job_queue.submit(kind, user_id, payload, callback_url)
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=429, detail="Job queue full") from exc
+    return JSONResponse(JobSubmitResponse(**submitted).model_dump(), status_code=202)
+
+
+@app.post("/v1/jobs/recompute-themes", response_model=JobSubmitResponse, status_code=202)
+def submit_recompute_themes_job(
+    payload: RecomputeThemesJobRequest,
+    x_embedding_encoding: Annotated[Optional[str], Header(alias=EMBEDDING_HEADER)] = None,
+) -> JSONResponse:
+    # Embeddings are decoded now so a malformed request fails here, not in
+    # the worker; binary ones come back as arrays, which the queue's JSON
+    # payload cannot hold.
+    entries = [
+        {**entry, "embedding": [float(value) for value in entry["embedding"]]}
+        for entry in _theme_entry_dicts(payload.entries, _embedding_encoding(x_embedding_encoding))
+    ]
+    return _submit_job(
+        "recompute_themes",
+        payload.user_id,
+        {
+            "user_id": payload.user_id,
+            "entries": entries,
+            "include_state": payload.include_state,
+            "previous_themes": _previous_theme_dicts(payload.previous_themes),
+        },
+        payload.callback_url,
+    )
+
+
+@app.post("/v1/jobs/weekly-reflection", response_model=JobSubmitResponse, status_code=202)
+def submit_weekly_reflection_job(payload: WeeklyReflectionJobRequest) -> JSONResponse:
+    return _submit_job(
+        "weekly_reflection",
+        payload.user_id,
+        payload.model_dump(exclude={"callback_url"}),
+        payload.callback_url,
+    )
+
+
+@app.get("/v1/jobs/{job_id}", response_model=JobStatusResponse)
+def job_status(job_id: str) -> JobStatusResponse:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in {"true", "1", "yes"}
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached lookup (sub-millisecond) to a cold model call.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by label values, rendered Prometheus-style.
+
+    ``observe`` is a bisect and three additions under a lock, cheap enough to
+    leave on around every model call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{float(bound)!r}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "nlp_stage_duration_seconds",
+    "Time spent in an NLP stage, by backend or fallback path.",
+    ("stage", "backend"),
+)
+HTTP_SECONDS = Histogram(
+    "nlp_http_request_duration_seconds",
+    "Time to send a complete HTTP response, by route template.",
+    ("route", "method", "status"),
+)
+_HISTOGRAMS = (STAGE_SECONDS, HTTP_SECONDS)
+
+
+class StageTimer(ContextDecorator):
+    """Records one stage's duration in ``nlp_stage_duration_seconds``.
+
+    Code inside the block can set ``backend`` once it knows which path ran
+    (for example the VADER fallback). An exception is recorded under
+    ``backend="error"`` unless a backend was already chosen.
+    """
+
+    def __init__(self, stage: str, backend: str = "") -> None:
+        self.stage = stage
+        self.backend = backend
+        self._started = 0.0
+
+    def _recreate_cm(self) -> "StageTimer":
+        # A fresh timer per decorated call keeps concurrent calls apart.
+        return StageTimer(self.stage, self.backend)
+
+    def __enter__(self) -> "StageTimer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if METRICS_ENABLED:
+            backend = self.backend or ("error" if exc_type is not None else "default")
+            STAGE_SECONDS.observe(time.perf_counter() - self._started, stage=self.stage, backend=backend)
+        return False
+
+
+def timed(stage: str, backend: str = "") -> StageTimer:
+    """Time a stage, as a decorator or a ``with`` block."""
+    return StageTimer(stage, backend)
+
+
+def observe_stage(stage: str, seconds: float, backend: str = "default") -> None:
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, stage=stage, backend=backend)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for histogram in _HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk is sent.
+
+    Stops the clock at the final body chunk rather than when the app
+    returns, so background tasks do not count towards request latency.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        state: Dict[str, Optional[object]] = {"status": 500, "done": False}
+
+        def record() -> None:
+            if state["done"]:
+                return
+            state["done"] = True
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started,
+                route=route,
+                method=scope.get("method", ""),
+                status=str(state["status"]),
+            )
+
+        async def send_and_record(message) -> None:
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            record()
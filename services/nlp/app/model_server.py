@@ -0,0 +1,204 @@
+"""Out-of-process model server for multi-worker deployments.
+
+One ``python -m app.model_server`` process loads the models once and serves
+batched inference over a Unix socket. HTTP workers started with the same
+``MODEL_SERVER_SOCKET`` load no models themselves; the pipeline's batch
+functions send their batches here instead, so ``uvicorn --workers N`` scales
+with cores while the weights stay resident in one process.
+
+Requests are pickled, so anyone who can connect could run code in the
+server: it refuses to start without ``MODEL_SERVER_AUTHKEY``, and the
+socket is created readable and writable by its owner only.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from functools import lru_cache
+from multiprocessing.connection import Client, Listener
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("nlp-service")
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")
+MODEL_SERVER_TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_MS", "30000")) / 1000.0
+
+# Set inside the server process so its own pipeline calls run locally.
+_serving = False
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+def _authkey(value: str) -> Optional[bytes]:
+    return value.encode("utf-8") if value else None
+
+
+class ModelServer:
+    """Answers ``(operation, args)`` requests, one thread per connection."""
+
+    def __init__(
+        self,
+        address: str,
+        operations: Dict[str, Callable[..., Any]],
+        authkey: Optional[bytes],
+    ) -> None:
+        if not authkey:
+            raise ValueError("ModelServer requires a non-empty authkey")
+        if os.path.exists(address):
+            os.unlink(address)
+        self.address = address
+        self._operations = operations
+        self._authkey = authkey
+        # The socket is bound under a restrictive umask so it is never
+        # reachable by other users, not even between bind and chmod.
+        previous_umask = os.umask(0o177)
+        try:
+            self._listener = Listener(address, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(address, 0o600)
+        self._closed = threading.Event()
+
+    def serve_forever(self) -> None:
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except Exception:
+                # Failed handshakes and the wake-up from close() land here.
+                continue
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def close(self) -> None:
+        self._closed.set()
+        try:
+            Client(self.address, family="AF_UNIX", authkey=self._authkey).close()
+        except Exception:
+            pass
+        self._listener.close()
+
+    def _handle(self, connection: Any) -> None:
+        with connection:
+            while True:
+                try:
+                    operation, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._operations[operation](*args))
+                except Exception as exc:
+                    reply = ("error", f"{operation} failed: {type(exc).__name__}: {exc}")
+                try:
+                    connection.send(reply)
+                except (EOFError, OSError):
+                    return
+                except Exception as exc:
+                    connection.send(("error", f"{operation} reply failed: {type(exc).__name__}"))
+
+
+class ModelServerClient:
+    """Per-thread connections to a ``ModelServer``.
+
+    A dropped connection is reopened once per call; any transport failure,
+    timeout or remote exception surfaces as ``ModelServerError`` so callers
+    can take their usual fallback.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, timeout_s: float = 30.0) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self._info: Optional[Dict[str, Any]] = None
+
+    def call(self, operation: str, *args: Any) -> Any:
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.send((operation, args))
+                if not connection.poll(self.timeout_s):
+                    self._drop()
+                    raise ModelServerError(f"model server timed out on {operation}")
+                status, value = connection.recv()
+                break
+            except (EOFError, OSError) as exc:
+                self._drop()
+                if attempt:
+                    raise ModelServerError(f"model server unreachable: {exc}") from exc
+        if status != "ok":
+            raise ModelServerError(value)
+        return value
+
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            self._info = self.call("info")
+        return self._info
+
+    def close(self) -> None:
+        self._drop()
+
+    def _connection(self) -> Any:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.connection = connection
+        return connection
+
+    def _drop(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+
+
+@lru_cache(maxsize=1)
+def get_model_client() -> Optional[ModelServerClient]:
+    if _serving or not MODEL_SERVER_SOCKET:
+        return None
+    if not MODEL_SERVER_AUTHKEY:
+        logger.error("model_server_disabled reason=MODEL_SERVER_AUTHKEY not set")
+        return None
+    return ModelServerClient(MODEL_SERVER_SOCKET, _authkey(MODEL_SERVER_AUTHKEY), MODEL_SERVER_TIMEOUT_S)
+
+
+def pipeline_operations() -> Dict[str, Callable[..., Any]]:
+    from . import pipeline
+    from .registry import model_registry
+
+    return {
+        "embed": pipeline._model_embeddings,
+        "sentiment": pipeline.sentiments_from_transformer,
+        "emotion": pipeline.get_emotions,
+        "keyphrases": pipeline._keyphrases_batch,
+        "info": lambda: {"keyphrase_backend": pipeline._keyphrase_backend()},
+        "ready": model_registry.report,
+    }
+
+
+def serve(address: str = MODEL_SERVER_SOCKET) -> None:
+    global _serving
+    if not address:
+        raise SystemExit("MODEL_SERVER_SOCKET is not set")
+    if not MODEL_SERVER_AUTHKEY:
+        raise SystemExit("MODEL_SERVER_AUTHKEY is not set")
+    _serving = True
+    get_model_client.cache_clear()
+
+    from .registry import model_registry
+
+    operations = pipeline_operations()
+    model_registry.load_in_background()
+    server = ModelServer(address, operations, _authkey(MODEL_SERVER_AUTHKEY))
+    logger.info("model_server listening socket=%s", address)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    serve()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -13,6 +13,14 @@ class SentimentResult(BaseModel):
 class SafetyResult(BaseModel):
     crisis: bool
     reason: Optional[str] = None
+    categories: List[str] = Field(default_factory=list)
+
+
+class ChunkingOptions(BaseModel):
+    enabled: bool = True
+    max_chars: Optional[int] = Field(None, ge=100, le=4000)
+    overlap_sentences: Optional[int] = Field(None, ge=0, le=5)
+    pooling: Optional[str] = Field(None, pattern="^(mean|attention)$")
 
 
 class AnalyzeEntryRequest(BaseModel):
@@ -21,13 +29,36 @@ class AnalyzeEntryRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=10000)
     mood: Optional[str] = None
     created_at: Optional[str] = None
+    pipeline_mode: Optional[str] = Field(None, pattern="^(sequential|staged)$")
+    crisis_policy: Optional[str] = Field(None, pattern="^(full|skip|defer)$")
+    chunking: Optional[ChunkingOptions] = None
+    index: Optional[bool] = None
 
 
 class AnalyzeEntryResponse(BaseModel):
-    sentiment: SentimentResult
-    keyphrases: List[str]
-    embedding: List[float]
+    sentiment: Optional[SentimentResult] = None
+    keyphrases: List[str] = Field(default_factory=list)
+    embedding: List[float] = Field(default_factory=list)
+    embedding_b64: Optional[str] = None
+    embedding_encoding: str = "json"
     safety: SafetyResult
+    enrichment: str = "complete"
+    chunk_count: int = 1
+    timings_ms: Dict[str, float] = Field(default_factory=dict)
+
+
+class AnalyzeBatchRequest(BaseModel):
+    entries: List[AnalyzeEntryRequest] = Field(..., min_length=1, max_length=256)
+
+
+class AnalyzeBatchItem(BaseModel):
+    entry_id: str
+    result: Optional[AnalyzeEntryResponse] = None
+    error: Optional[str] = None
+
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeBatchItem]
 
 
 class ThemeMember(BaseModel):
@@ -48,16 +79,54 @@ class ThemeResult(BaseModel):
 class ThemeEntry(BaseModel):
     entry_id: str
     text: str
-    embedding: List[float]
+    embedding: List[float] = Field(default_factory=list)
+    embedding_b64: Optional[str] = None
+
+
+class PreviousTheme(BaseModel):
+    theme_id: str
+    entry_ids: List[str]
+    label: Optional[str] = None
+    keywords: List[str] = Field(default_factory=list)
+    strength: Optional[float] = None
 
 
 class RecomputeThemesRequest(BaseModel):
     user_id: str
     entries: List[ThemeEntry]
+    include_state: bool = False
+    previous_themes: Optional[List[PreviousTheme]] = None
+
+
+class ThemeDiff(BaseModel):
+    baseline: str = Field(..., pattern="^(request|cache|none)$")
+    added: List[str] = Field(default_factory=list)
+    removed: List[str] = Field(default_factory=list)
+    changed: List[str] = Field(default_factory=list)
+    unchanged: List[str] = Field(default_factory=list)
 
 
 class RecomputeThemesResponse(BaseModel):
     themes: List[ThemeResult]
+    state: Optional[str] = None
+    diff: Optional[ThemeDiff] = None
+
+
+class RecomputeThemesJobRequest(RecomputeThemesRequest):
+    callback_url: Optional[str] = None
+
+
+class IncrementalThemesRequest(BaseModel):
+    user_id: str
+    entry: ThemeEntry
+    state: Optional[str] = Field(None, max_length=4_000_000)
+
+
+class IncrementalThemesResponse(BaseModel):
+    themes: List[ThemeResult]
+    state: str
+    action: str
+    drift: float
 
 
 class WeeklyEntry(BaseModel):
@@ -75,6 +144,10 @@ class WeeklyReflectionRequest(BaseModel):
     themes: Optional[List[dict]] = None
 
 
+class WeeklyReflectionJobRequest(WeeklyReflectionRequest):
+    callback_url: Optional[str] = None
+
+
 class WeeklySummaryBlock(BaseModel):
     title: str
     text: str
@@ -100,6 +173,7 @@ class ContextEntry(BaseModel):
     created_at: Optional[str] = None
     mood: Optional[str] = None
     source: Optional[str] = None
+    embedding: Optional[List[float]] = None
 
 
 class PromptEvidence(BaseModel):
@@ -219,6 +293,17 @@ class ExtractedData(BaseModel):
     keyphrases: List[str] = []
 
 
+class MessageAnalysis(BaseModel):
+    sentiment: Optional[SentimentResult] = None
+    emotion: Optional[str] = None
+    keyphrases: Optional[List[str]] = None
+
+
+class FeatureUsage(BaseModel):
+    computed: List[str] = []
+    reused: List[str] = []
+
+
 class ChatTurnRequestV1(BaseModel):
     user_id: str
     chat_id: str
@@ -230,6 +315,9 @@ class ChatTurnRequestV1(BaseModel):
     recent_entries: List[ContextEntry] = []
     retrieved_entries: List[ContextEntry] = []
     enhanced_language: bool = False
+    message_analysis: Optional[MessageAnalysis] = None
+    self_retrieve: bool = False
+    retrieve_k: int = Field(5, ge=1, le=12)
 
 
 class ChatTurnResponseV1(BaseModel):
@@ -239,3 +327,49 @@ class ChatTurnResponseV1(BaseModel):
     evidence: List[EvidenceCard] = []
     safety: SafetyResult
     mode: str = "deterministic"
+    features: Optional[FeatureUsage] = None
+
+
+class SimilarRequest(BaseModel):
+    user_id: str = Field(..., min_length=1)
+    text: Optional[str] = Field(None, min_length=1, max_length=10000)
+    entry_id: Optional[str] = None
+    k: int = Field(5, ge=1, le=50)
+    nprobe: Optional[int] = Field(None, ge=1, le=1024)
+    strategy: Optional[str] = Field(None, pattern="^(auto|exact|ivf)$")
+    exclude_entry_ids: List[str] = []
+
+
+class SimilarEntry(BaseModel):
+    entry_id: str
+    score: float
+    text: Optional[str] = None
+    created_at: Optional[str] = None
+    mood: Optional[str] = None
+
+
+class SimilarResponse(BaseModel):
+    results: List[SimilarEntry]
+    strategy: str
+    indexed: int
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    coalesced: bool = False
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    user_id: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    submissions: int = 1
+    attempts: int = 0
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    callback_status: Optional[str] = None
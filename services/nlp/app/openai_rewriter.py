@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
 import re
-from typing import List, Optional
-
-try:
-    from openai import OpenAI
-except Exception:  # pragma: no cover - optional dependency
-    OpenAI = None
+import threading
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
+from .cache import ByteLRUCache, content_key
+from .lazy import optional_import
+from .metrics import timed
 from .models import EvidenceCard, PlanConstraints, ReflectionPlan, RenderedMessage
 
 logger = logging.getLogger("nlp-service")
 
+REWRITE_CACHE_TTL_S = float(os.getenv("REWRITE_CACHE_TTL_S", "3600"))
+REWRITE_CACHE_MAX_BYTES = int(os.getenv("REWRITE_CACHE_MAX_BYTES", str(1024 * 1024)))
+
 DISALLOWED_PATTERNS = [
     re.compile(r"\bdiagnos(e|is)\b", re.IGNORECASE),
     re.compile(r"\bmedical advice\b", re.IGNORECASE),
@@ -96,14 +102,30 @@ def _passes_policy_checks(text: str) -> bool:
     return True
 
 
-def rewrite_plan(
-    plan: ReflectionPlan,
-    evidence_cards: List[EvidenceCard],
-    constraints: PlanConstraints,
-) -> Optional[RenderedMessage]:
-    if OpenAI is None:
-        return None
+@dataclass(frozen=True)
+class RewriteSettings:
+    api_key: str
+    base_url: Optional[str]
+    model: str
+    temperature: float
+    max_tokens: int
+    deadline_s: float
+
+
+SYSTEM_PROMPT = (
+    "You rewrite journaling companion responses. "
+    "Keep meaning identical, do not add new facts or advice. "
+    "Return JSON only with keys validation, reflection, pattern_connection, gentle_nudge, follow_up_question."
+)
 
+# Per event loop: the connection settings a client was built with, and the client.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Tuple, object]]" = (
+    weakref.WeakKeyDictionary()
+)
+_async_clients_lock = threading.Lock()
+
+
+def _rewrite_settings() -> Optional[RewriteSettings]:
     if not os.getenv("ENABLE_ENHANCED_LANGUAGE", "false").lower() in {"true", "1", "yes"}:
         return None
 
@@ -111,10 +133,47 @@ def rewrite_plan(
     if not api_key:
         return None
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    temperature = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
-    max_tokens = int(os.getenv("OPENAI_MAX_TOKENS", "180"))
+    return RewriteSettings(
+        api_key=api_key,
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.2")),
+        max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "180")),
+        deadline_s=float(os.getenv("OPENAI_DEADLINE_MS", "2500")) / 1000.0,
+    )
+
+
+def get_async_client(settings: RewriteSettings):
+    """Pooled async client for the running event loop.
+
+    httpx connection pools are bound to the loop that created them, so one
+    client is kept per loop and dropped with it. A change to the key, base
+    URL or timeout replaces the loop's client and closes the old one.
+    """
+    loop = asyncio.get_running_loop()
+    key = (settings.api_key, settings.base_url, settings.deadline_s)
+    with _async_clients_lock:
+        cached = _async_clients.get(loop)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        AsyncOpenAI = optional_import("openai", "AsyncOpenAI")
+        client = AsyncOpenAI(
+            api_key=settings.api_key,
+            base_url=settings.base_url,
+            timeout=settings.deadline_s,
+            max_retries=0,
+        )
+        _async_clients[loop] = (key, client)
+    if cached is not None:
+        loop.create_task(cached[1].close())
+    return client
+
 
+def _build_messages(
+    plan: ReflectionPlan,
+    evidence_cards: List[EvidenceCard],
+    constraints: PlanConstraints,
+) -> List[dict]:
     plan_payload = {
         "validation": plan.validation.text,
         "reflection": plan.reflection.text,
@@ -127,12 +186,6 @@ def rewrite_plan(
         for card in evidence_cards
     ]
 
-    system_prompt = (
-        "You rewrite journaling companion responses. "
-        "Keep meaning identical, do not add new facts or advice. "
-        "Return JSON only with keys validation, reflection, pattern_connection, gentle_nudge, follow_up_question."
-    )
-
     user_prompt = json.dumps(
         {
             "plan": plan_payload,
@@ -146,41 +199,82 @@ def rewrite_plan(
             },
         }
     )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _completion_kwargs(settings: RewriteSettings, messages: List[dict]) -> dict:
+    return {
+        "model": settings.model,
+        "temperature": settings.temperature,
+        "max_tokens": settings.max_tokens,
+        "messages": messages,
+    }
+
+
+@lru_cache(maxsize=1)
+def get_rewrite_cache() -> ByteLRUCache:
+    return ByteLRUCache(REWRITE_CACHE_MAX_BYTES, ttl_s=REWRITE_CACHE_TTL_S)
+
 
+def rewrite_cache_stats() -> Dict[str, int]:
+    return get_rewrite_cache().stats()
+
+
+def _rewrite_cache_key(settings: RewriteSettings, messages: List[dict]) -> str:
+    canonical = json.dumps(
+        [{**message, "content": _canonical_content(message["content"])} for message in messages],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    # The endpoint is part of the key: two OpenAI-compatible servers may
+    # serve the same model name with different weights.
+    return content_key(
+        canonical, settings.base_url or "", settings.model, settings.temperature, settings.max_tokens
+    )
+
+
+def _canonical_content(content: str) -> object:
     try:
-        client = OpenAI(api_key=api_key)
-        response = client.responses.create(
-            model=model,
-            temperature=temperature,
-            max_output_tokens=max_tokens,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-    except Exception:
-        logger.info("enhanced_language_rewrite_failed", extra={"reason": "openai_error"})
-        return None
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return content
+
+
+def _cached_rewrite(key: str) -> Optional[RenderedMessage]:
+    with timed("rewrite.cache") as timer:
+        cached = get_rewrite_cache().get(key)
+        timer.backend = "miss" if cached is None else "hit"
+        return RenderedMessage(**cached) if cached is not None else None
 
-    output_text = getattr(response, "output_text", None) or ""
+
+def _output_text(response) -> str:
+    try:
+        return response.choices[0].message.content or ""
+    except (AttributeError, IndexError):
+        return ""
+
+
+def _validate_rewrite(
+    output_text: str, plan: ReflectionPlan, evidence_cards: List[EvidenceCard]
+) -> Tuple[Optional[RenderedMessage], Optional[str]]:
     payload = _extract_json(output_text)
     if not payload:
-        logger.info("enhanced_language_rewrite_failed", extra={"reason": "invalid_json"})
-        return None
+        return None, "invalid_json"
 
     try:
         rendered = RenderedMessage(**payload)
     except Exception:
-        logger.info("enhanced_language_rewrite_failed", extra={"reason": "schema_validation"})
-        return None
+        return None, "schema_validation"
 
     combined_text = " ".join(
         [rendered.validation, rendered.reflection, rendered.pattern_connection, rendered.gentle_nudge, rendered.follow_up_question]
     ).strip()
 
     if not _passes_policy_checks(combined_text):
-        logger.info("enhanced_language_rewrite_failed", extra={"reason": "policy_violation"})
-        return None
+        return None, "policy_violation"
 
     plan_text = " ".join(
         [plan.validation.text, plan.reflection.text, plan.pattern_connection.text, plan.gentle_nudge.text, plan.follow_up_question.text]
@@ -188,7 +282,64 @@ def rewrite_plan(
 
     evidence_text = " ".join(card.snippet for card in evidence_cards)
     if not _passes_overlap_check(f"{plan_text} {evidence_text}", combined_text):
-        logger.info("enhanced_language_rewrite_failed", extra={"reason": "overlap_check"})
+        return None, "overlap_check"
+
+    return rendered, None
+
+
+def _finish(
+    response, plan: ReflectionPlan, evidence_cards: List[EvidenceCard], cache_key: str
+) -> Optional[RenderedMessage]:
+    with timed("rewrite.validate") as timer:
+        rendered, failure = _validate_rewrite(_output_text(response), plan, evidence_cards)
+        timer.backend = failure or "accepted"
+    if failure:
+        logger.info("enhanced_language_rewrite_failed", extra={"reason": failure})
+        return None
+    # Only rewrites that passed the policy and overlap checks are cached.
+    get_rewrite_cache().set(cache_key, rendered.model_dump())
+    return rendered
+
+
+async def rewrite_plan_async(
+    plan: ReflectionPlan,
+    evidence_cards: List[EvidenceCard],
+    constraints: PlanConstraints,
+    deadline_s: Optional[float] = None,
+) -> Optional[RenderedMessage]:
+    """Rewrite on the pooled async client, giving up once the deadline passes.
+
+    Returns ``None`` on timeout or any failure so callers fall back to the
+    deterministic rendering.
+    """
+    if optional_import("openai", "AsyncOpenAI") is None:
+        return None
+
+    settings = _rewrite_settings()
+    if settings is None:
         return None
 
-    return rendered
\ No newline at end of file
+    messages = _build_messages(plan, evidence_cards, constraints)
+    cache_key = _rewrite_cache_key(settings, messages)
+    cached = _cached_rewrite(cache_key)
+    if cached is not None:
+        return cached
+
+    timeout = settings.deadline_s if deadline_s is None else deadline_s
+    with timed("rewrite", "openai") as timer:
+        try:
+            client = get_async_client(settings)
+            response = await asyncio.wait_for(
+                client.chat.completions.create(**_completion_kwargs(settings, messages)),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            timer.backend = "deadline"
+            logger.info("enhanced_language_rewrite_failed", extra={"reason": "deadline"})
+            return None
+        except Exception:
+            timer.backend = "openai_error"
+            logger.info("enhanced_language_rewrite_failed", extra={"reason": "openai_error"})
+            return None
+
+    return _finish(response, plan, evidence_cards, cache_key)
@@ -1,43 +1,48 @@
 from __future__ import annotations
 
 import hashlib
+import logging
 import os
+import time
 from functools import lru_cache
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer
-except Exception:  # pragma: no cover - optional at runtime
-    SentenceTransformer = None
-
-try:
-    from transformers import pipeline as hf_pipeline
-except Exception:  # pragma: no cover - optional at runtime
-    hf_pipeline = None
-
-try:
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-except Exception:  # pragma: no cover - optional at runtime
-    SentimentIntensityAnalyzer = None
-
-try:
-    from keybert import KeyBERT
-except Exception:  # pragma: no cover - optional at runtime
-    KeyBERT = None
-
-try:
-    import yake
-except Exception:  # pragma: no cover - optional at runtime
-    yake = None
+from .backends import (
+    EMBEDDING_TASK,
+    EMOTION_TASK,
+    SENTIMENT_TASK,
+    backend_name,
+    keybert_backend,
+    load_classifier,
+    load_encoder,
+    onnx_enabled,
+)
+from .batching import MicroBatcher
+from .cache import ByteLRUCache, SqliteStore, content_key, normalize_text
+from .chunking import aggregate_sentiment, pool_embeddings
+from .embedding_store import EmbeddingStore
+from .lazy import optional_import
+from .metrics import timed
+from .model_server import ModelServerError, get_model_client
+from .registry import model_registry
 
+logger = logging.getLogger("nlp-service")
 
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
 SENTIMENT_MODEL_NAME = os.getenv(
     "SENTIMENT_MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english"
 )
 EMOTION_MODEL_NAME = os.getenv("EMOTION_MODEL_NAME", "j-hartmann/emotion-english-distilroberta-base")
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", "32"))
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() in {"true", "1", "yes"}
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "16"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+KEYPHRASE_CACHE_MAX_BYTES = int(os.getenv("KEYPHRASE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+KEYPHRASE_CACHE_PATH = os.getenv("KEYPHRASE_CACHE_PATH", "")
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "")
+EMBEDDING_STORE_CAPACITY = int(os.getenv("EMBEDDING_STORE_CAPACITY", "50000"))
 
 MOOD_SCALE = {
     "Sad": 1,
@@ -48,22 +53,40 @@ MOOD_SCALE = {
 }
 
 
-@lru_cache(maxsize=1)
+# With INFERENCE_BACKEND=onnx or onnx-int8 the getters return ONNX Runtime
+# wrappers that mirror the torch objects' call signatures and outputs, and
+# fall back to torch when no exported model is found.
+@model_registry.model("embedding")
 def get_embedding_model():
+    if onnx_enabled():
+        model = load_encoder()
+        if model is not None:
+            return model
+    SentenceTransformer = optional_import("sentence_transformers", "SentenceTransformer")
     if SentenceTransformer is None:
         return None
     return SentenceTransformer(EMBEDDING_MODEL_NAME)
 
 
-@lru_cache(maxsize=1)
+@model_registry.model("sentiment")
 def get_sentiment_pipeline():
+    if onnx_enabled():
+        model = load_classifier(SENTIMENT_TASK)
+        if model is not None:
+            return model
+    hf_pipeline = optional_import("transformers", "pipeline")
     if hf_pipeline is None:
         return None
     return hf_pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
 
 
-@lru_cache(maxsize=1)
+@model_registry.model("emotion")
 def get_emotion_pipeline():
+    if onnx_enabled():
+        model = load_classifier(EMOTION_TASK, top_k=3)
+        if model is not None:
+            return model
+    hf_pipeline = optional_import("transformers", "pipeline")
     if hf_pipeline is None:
         return None
     return hf_pipeline("text-classification", model=EMOTION_MODEL_NAME, top_k=3)
@@ -71,23 +94,28 @@ def get_emotion_pipeline():
 
 @lru_cache(maxsize=1)
 def get_vader():
+    SentimentIntensityAnalyzer = optional_import(
+        "vaderSentiment.vaderSentiment", "SentimentIntensityAnalyzer"
+    )
     if SentimentIntensityAnalyzer is None:
         return None
     return SentimentIntensityAnalyzer()
 
 
-@lru_cache(maxsize=1)
+@model_registry.model("keybert")
 def get_keybert():
+    KeyBERT = optional_import("keybert", "KeyBERT")
     if KeyBERT is None:
         return None
     model = get_embedding_model()
     if model is None:
         return None
-    return KeyBERT(model=model)
+    return KeyBERT(model=keybert_backend(model))
 
 
 @lru_cache(maxsize=1)
 def get_yake():
+    yake = optional_import("yake")
     if yake is None:
         return None
     return yake.KeywordExtractor(lan="en", n=2, top=8)
@@ -102,23 +130,125 @@ def _fallback_embedding(text: str, dim: int = 384) -> List[float]:
     return (vec / norm).astype(float).tolist()
 
 
+def is_fallback_embedding(text: str, vector: Sequence[float]) -> bool:
+    """Whether ``vector`` is ``text``'s hash fallback rather than a model vector."""
+    return list(vector) == _fallback_embedding(text, len(vector))
+
+
+@lru_cache(maxsize=1)
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    if not EMBEDDING_STORE_DIR:
+        return None
+    return EmbeddingStore(EMBEDDING_STORE_DIR, EMBEDDING_MODEL_NAME, EMBEDDING_STORE_CAPACITY)
+
+
+def _embedding_key(text: str) -> str:
+    return content_key(normalize_text(text))
+
+
 def embed_text(text: str) -> List[float]:
+    if MICRO_BATCH_ENABLED:
+        store = get_embedding_store()
+        if store is not None:
+            stored = store.get_many([_embedding_key(text)])
+            if stored:
+                return next(iter(stored.values())).astype(float).tolist()
+        return get_batcher("embedding").submit(text)
+    return embed_texts([text])[0]
+
+
+def embed_texts(texts: Sequence[str]) -> List[List[float]]:
+    return _embed_texts(texts, fallback=True)
+
+
+def embed_texts_or_none(texts: Sequence[str]) -> Optional[List[List[float]]]:
+    """Like ``embed_texts``, but ``None`` instead of hash fallback vectors.
+
+    For callers that rank by similarity, where fallback vectors would turn
+    the ranking into noise.
+    """
+    return _embed_texts(texts, fallback=False)
+
+
+def _embed_texts(texts: Sequence[str], fallback: bool) -> Optional[List[List[float]]]:
+    if not texts:
+        return []
+    store = get_embedding_store()
+    if store is None:
+        vectors = _model_embeddings(texts)
+        if vectors is None:
+            return [_fallback_embedding(text) for text in texts] if fallback else None
+        return vectors
+
+    keys = [_embedding_key(text) for text in texts]
+    stored = store.get_many(list(dict.fromkeys(keys)))
+    missing = [index for index, key in enumerate(keys) if key not in stored]
+    results: List[List[float]] = [
+        stored[key].astype(float).tolist() if key in stored else [] for key in keys
+    ]
+    if missing:
+        computed = _model_embeddings([texts[index] for index in missing])
+        if computed is None:
+            if not fallback:
+                return None
+            # Fallback vectors are never stored; they would outlive the outage.
+            computed = [_fallback_embedding(texts[index]) for index in missing]
+        else:
+            store.put_many({keys[index]: vector for index, vector in zip(missing, computed)})
+        for index, vector in zip(missing, computed):
+            results[index] = vector
+    return results
+
+
+def _model_embeddings(texts: Sequence[str]) -> Optional[List[List[float]]]:
+    """Model vectors for ``texts``, or ``None`` when no embedding model is available."""
+    client = get_model_client()
+    if client is not None:
+        try:
+            with timed("embedding", "model_server"):
+                return client.call("embed", list(texts))
+        except ModelServerError as exc:
+            logger.warning("model_server_failed op=embed error=%s", exc)
+            return None
     model = get_embedding_model()
     if model is None:
-        return _fallback_embedding(text)
-    embedding = model.encode([text], normalize_embeddings=True)
-    return embedding[0].astype(float).tolist()
+        return None
+    with timed("embedding", backend_name(model)):
+        return _encode_texts(model, texts)
 
 
-def sentiment_from_transformer(text: str) -> Tuple[str, float]:
-    pipeline = get_sentiment_pipeline()
-    if pipeline is None:
-        raise RuntimeError("Sentiment pipeline unavailable")
-    result = pipeline(text, truncation=True)
-    if not result:
-        raise RuntimeError("No sentiment output")
-    label = result[0]["label"].lower()
-    score = float(result[0]["score"])
+def _encode_texts(model: Any, texts: Sequence[str]) -> List[List[float]]:
+    embeddings = model.encode(
+        list(texts), batch_size=INFERENCE_BATCH_SIZE, normalize_embeddings=True
+    )
+    return [row.astype(float).tolist() for row in embeddings]
+
+
+def embed_chunks(chunks: Sequence[str], pooling: str = "mean") -> List[float]:
+    """One pooled embedding for a chunked text, encoded in a single batch."""
+    vectors = embed_texts(chunks)
+    return pool_embeddings(vectors, [len(chunk) for chunk in chunks], pooling)
+
+
+def embed_entry(chunks: Sequence[str], pooling: str = "mean") -> Tuple[List[float], bool]:
+    """An entry's embedding (pooled when chunked) and whether it came from the model.
+
+    The flag is false when any chunk fell back to its hash vector.
+    """
+    vectors = embed_texts(chunks) if len(chunks) > 1 else [embed_text(chunks[0])]
+    from_model = not any(is_fallback_embedding(chunk, vector) for chunk, vector in zip(chunks, vectors))
+    if len(chunks) == 1:
+        return vectors[0], from_model
+    return pool_embeddings(vectors, [len(chunk) for chunk in chunks], pooling), from_model
+
+
+def _parse_sentiment_output(output: Any) -> Tuple[str, float]:
+    if isinstance(output, list):
+        if not output:
+            raise RuntimeError("No sentiment output")
+        output = output[0]
+    label = output["label"].lower()
+    score = float(output["score"])
     if label == "positive":
         return "positive", score
     if label == "negative":
@@ -126,11 +256,31 @@ def sentiment_from_transformer(text: str) -> Tuple[str, float]:
     return "neutral", 0.0
 
 
+def sentiment_from_transformer(text: str) -> Tuple[str, float]:
+    return sentiments_from_transformer([text])[0]
+
+
+def sentiments_from_transformer(texts: Sequence[str]) -> List[Tuple[str, float]]:
+    client = get_model_client()
+    if client is not None:
+        with timed("sentiment", "model_server"):
+            return client.call("sentiment", list(texts))
+    pipeline = get_sentiment_pipeline()
+    if pipeline is None:
+        raise RuntimeError("Sentiment pipeline unavailable")
+    with timed("sentiment", backend_name(pipeline)):
+        results = pipeline(list(texts), truncation=True, batch_size=INFERENCE_BATCH_SIZE)
+    if not results or len(results) != len(texts):
+        raise RuntimeError("No sentiment output")
+    return [_parse_sentiment_output(result) for result in results]
+
+
 def sentiment_from_vader(text: str) -> Tuple[str, float]:
     analyzer = get_vader()
     if analyzer is None:
         return "neutral", 0.0
-    scores = analyzer.polarity_scores(text)
+    with timed("sentiment", "vader"):
+        scores = analyzer.polarity_scores(text)
     compound = float(scores.get("compound", 0.0))
     if compound >= 0.2:
         return "positive", compound
@@ -140,51 +290,267 @@ def sentiment_from_vader(text: str) -> Tuple[str, float]:
 
 
 def get_sentiment(text: str) -> Tuple[str, float]:
+    if MICRO_BATCH_ENABLED:
+        return get_batcher("sentiment").submit(text)
+    return _sentiment_single(text)
+
+
+def _sentiment_single(text: str) -> Tuple[str, float]:
     try:
         return sentiment_from_transformer(text)
     except Exception:
         return sentiment_from_vader(text)
 
 
+def get_sentiments(texts: Sequence[str]) -> List[Tuple[str, float]]:
+    if not texts:
+        return []
+    try:
+        return sentiments_from_transformer(texts)
+    except ModelServerError as exc:
+        # Retrying text by text would wait on the same server once per text.
+        logger.warning("model_server_failed op=sentiment error=%s", exc)
+        return [sentiment_from_vader(text) for text in texts]
+    except Exception:
+        return [_sentiment_single(text) for text in texts]
+
+
+def sentiment_of_chunks(chunks: Sequence[str]) -> Tuple[str, float]:
+    """Length-weighted sentiment for a chunked text, scored in a single batch."""
+    return aggregate_sentiment(get_sentiments(chunks), [len(chunk) for chunk in chunks])
+
+
+def _parse_emotion_output(output: Any) -> str:
+    if isinstance(output, list) and output and isinstance(output[0], dict):
+        best = max(output, key=lambda item: item.get("score", 0))
+        return str(best.get("label", "neutral")).lower()
+    if isinstance(output, dict):
+        return str(output.get("label", "neutral")).lower()
+    return "neutral"
+
+
 def get_emotion(text: str) -> str:
+    if MICRO_BATCH_ENABLED:
+        return get_batcher("emotion").submit(text)
+    return _emotion_single(text)
+
+
+def _emotion_single(text: str) -> str:
+    if get_model_client() is not None:
+        return get_emotions([text])[0]
     pipeline = get_emotion_pipeline()
     if pipeline is None:
         return "neutral"
     try:
-        result = pipeline(text, truncation=True)
-        if isinstance(result, list) and result and isinstance(result[0], list):
-            best = max(result[0], key=lambda item: item.get("score", 0))
-            return str(best.get("label", "neutral")).lower()
+        with timed("emotion", backend_name(pipeline)):
+            result = pipeline(text, truncation=True)
         if isinstance(result, list) and result:
-            return str(result[0].get("label", "neutral")).lower()
+            return _parse_emotion_output(result[0])
     except Exception:
         return "neutral"
     return "neutral"
 
 
+def get_emotions(texts: Sequence[str]) -> List[str]:
+    if not texts:
+        return []
+    client = get_model_client()
+    if client is not None:
+        try:
+            with timed("emotion", "model_server"):
+                return client.call("emotion", list(texts))
+        except ModelServerError as exc:
+            logger.warning("model_server_failed op=emotion error=%s", exc)
+            return ["neutral" for _ in texts]
+    pipeline = get_emotion_pipeline()
+    if pipeline is None:
+        return ["neutral" for _ in texts]
+    try:
+        with timed("emotion", backend_name(pipeline)):
+            results = pipeline(list(texts), truncation=True, batch_size=INFERENCE_BATCH_SIZE)
+    except Exception:
+        return [_emotion_single(text) for text in texts]
+    if not isinstance(results, list) or len(results) != len(texts):
+        return [_emotion_single(text) for text in texts]
+    return [_parse_emotion_output(result) for result in results]
+
+
+@lru_cache(maxsize=1)
+def get_keyphrase_cache() -> ByteLRUCache:
+    store = SqliteStore(KEYPHRASE_CACHE_PATH, table="keyphrases") if KEYPHRASE_CACHE_PATH else None
+    return ByteLRUCache(KEYPHRASE_CACHE_MAX_BYTES, store=store)
+
+
+_KEYPHRASE_BACKEND_TTL_S = 30.0
+_remote_keyphrase_backend: Optional[Tuple[float, str]] = None
+
+
+def _keyphrase_backend() -> str:
+    global _remote_keyphrase_backend
+    client = get_model_client()
+    if client is not None:
+        # Memoized, failures included, so an unreachable server costs one
+        # attempt per TTL rather than one per cache key.
+        now = time.monotonic()
+        if _remote_keyphrase_backend is None or _remote_keyphrase_backend[0] <= now:
+            try:
+                backend = client.info()["keyphrase_backend"]
+            except ModelServerError:
+                backend = "yake"
+            _remote_keyphrase_backend = (now + _KEYPHRASE_BACKEND_TTL_S, backend)
+        return _remote_keyphrase_backend[1]
+    return f"keybert:{EMBEDDING_MODEL_NAME}" if get_keybert() is not None else "yake"
+
+
+def _keyphrase_cache_key(text: str, top_n: int) -> str:
+    return content_key(normalize_text(text), top_n, _keyphrase_backend())
+
+
 def extract_keyphrases(text: str, top_n: int = 8) -> List[str]:
+    if not text.strip():
+        return []
+    cache = get_keyphrase_cache()
+    key = _keyphrase_cache_key(text, top_n)
+    cached = cache.get(key)
+    if cached is not None:
+        return list(cached)
+    if MICRO_BATCH_ENABLED:
+        phrases = get_batcher("keyphrases").submit((text, top_n))
+    else:
+        phrases = _keyphrases_single(text, top_n)
+    cache.set(key, phrases)
+    return list(phrases)
+
+
+def _keyphrases_single(text: str, top_n: int) -> List[str]:
     text = text.strip()
     if not text:
         return []
+    if get_model_client() is not None:
+        return _keyphrases_batch([text], top_n)[0]
     keybert = get_keybert()
     if keybert is not None:
         try:
-            phrases = keybert.extract_keywords(
-                text, keyphrase_ngram_range=(1, 2), stop_words="english", top_n=top_n
-            )
+            with timed("keyphrases", "keybert"):
+                phrases = keybert.extract_keywords(
+                    text, keyphrase_ngram_range=(1, 2), stop_words="english", top_n=top_n
+                )
             return [phrase for phrase, _ in phrases]
         except Exception:
             pass
+    return _keyphrases_from_yake(text, top_n)
+
+
+def extract_keyphrases_batch(texts: Sequence[str], top_n: int = 8) -> List[List[str]]:
+    cache = get_keyphrase_cache()
+    results: List[List[str]] = [[] for _ in texts]
+    missing: List[int] = []
+    keys: List[str] = []
+    for index, text in enumerate(texts):
+        key = _keyphrase_cache_key(text, top_n)
+        keys.append(key)
+        cached = cache.get(key) if text.strip() else []
+        if cached is None:
+            missing.append(index)
+        else:
+            results[index] = list(cached)
+    if missing:
+        computed = _keyphrases_batch([texts[index] for index in missing], top_n)
+        for index, phrases in zip(missing, computed):
+            cache.set(keys[index], phrases)
+            results[index] = list(phrases)
+    return results
+
+
+def _keyphrases_batch(texts: Sequence[str], top_n: int) -> List[List[str]]:
+    cleaned = [text.strip() for text in texts]
+    results: List[List[str]] = [[] for _ in cleaned]
+    pending = [index for index, text in enumerate(cleaned) if text]
+    if not pending:
+        return results
+    client = get_model_client()
+    if client is not None:
+        try:
+            with timed("keyphrases", "model_server"):
+                return client.call("keyphrases", cleaned, top_n)
+        except ModelServerError as exc:
+            logger.warning("model_server_failed op=keyphrases error=%s", exc)
+            return [_keyphrases_from_yake(text, top_n) if text else [] for text in cleaned]
+    if len(pending) == 1:
+        index = pending[0]
+        results[index] = _keyphrases_single(cleaned[index], top_n)
+        return results
+    keybert = get_keybert()
+    if keybert is not None:
+        try:
+            with timed("keyphrases", "keybert"):
+                batches = keybert.extract_keywords(
+                    [cleaned[index] for index in pending],
+                    keyphrase_ngram_range=(1, 2),
+                    stop_words="english",
+                    top_n=top_n,
+                )
+            if len(batches) == len(pending):
+                for index, phrases in zip(pending, batches):
+                    results[index] = [phrase for phrase, _ in phrases]
+                return results
+        except Exception:
+            pass
+    for index in pending:
+        results[index] = _keyphrases_from_yake(cleaned[index], top_n)
+    return results
+
+
+def _keyphrases_from_yake(text: str, top_n: int) -> List[str]:
     extractor = get_yake()
     if extractor is not None:
         try:
-            phrases = extractor.extract_keywords(text)
+            with timed("keyphrases", "yake"):
+                phrases = extractor.extract_keywords(text)
             return [phrase for phrase, _ in phrases[:top_n]]
         except Exception:
             return []
     return []
 
 
+def _keyphrases_for_requests(requests: Sequence[Tuple[str, int]]) -> List[List[str]]:
+    results: List[List[str]] = [[] for _ in requests]
+    by_top_n: Dict[int, List[int]] = {}
+    for index, (_, top_n) in enumerate(requests):
+        by_top_n.setdefault(top_n, []).append(index)
+    for top_n, indices in by_top_n.items():
+        phrases = _keyphrases_batch([requests[index][0] for index in indices], top_n)
+        for index, item in zip(indices, phrases):
+            results[index] = item
+    return results
+
+
+_BATCH_FUNCTIONS = {
+    "sentiment": get_sentiments,
+    "emotion": get_emotions,
+    "embedding": embed_texts,
+    "keyphrases": _keyphrases_for_requests,
+}
+
+
+@lru_cache(maxsize=None)
+def get_batcher(name: str) -> MicroBatcher:
+    return MicroBatcher(
+        name,
+        _BATCH_FUNCTIONS[name],
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+    )
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    stats = {"keyphrases": get_keyphrase_cache().stats()}
+    store = get_embedding_store()
+    if store is not None:
+        stats["embeddings"] = store.stats()
+    return stats
+
+
 def mood_to_numeric(mood: Optional[str]) -> Optional[int]:
     if not mood:
         return None
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("nlp-service")
+
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", "4"))
+LAZY_MODELS = {name.strip() for name in os.getenv("LAZY_MODELS", "").split(",") if name.strip()}
+READY_REQUIRE_MODELS = os.getenv("READY_REQUIRE_MODELS", "false").lower() in {"true", "1", "yes"}
+
+PENDING = "pending"
+LAZY = "lazy"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+FAILED = "failed"
+_SETTLED = (READY, UNAVAILABLE, FAILED)
+
+
+def model_footprint(model: Any) -> Optional[int]:
+    """Approximate resident bytes of a loaded model, when it can be measured.
+
+    Torch modules (and transformers pipelines wrapping one) report their
+    parameter bytes; ONNX wrappers report the size of the model file.
+    """
+    if model is None:
+        return None
+    size = getattr(model, "model_bytes", None)
+    if size:
+        return int(size)
+    module = getattr(model, "model", model)
+    parameters = getattr(module, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        return int(sum(parameter.numel() * parameter.element_size() for parameter in parameters()))
+    except Exception:
+        return None
+
+
+def _max_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return int(peak if sys.platform == "darwin" else peak * 1024)
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], lazy: bool) -> None:
+        self.name = name
+        self.loader = loader
+        self.lazy = lazy
+        self.state = LAZY if lazy else PENDING
+        self.value: Any = None
+        self.load_ms: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        if self.state in _SETTLED:
+            return self.value
+        # One loader runs per model; concurrent callers wait for it instead
+        # of loading a second copy.
+        with self._lock:
+            if self.state not in _SETTLED:
+                self._load()
+        return self.value
+
+    def _load(self) -> None:
+        self.state = LOADING
+        started = time.perf_counter()
+        try:
+            self.value = self.loader()
+        except Exception as exc:
+            self.value = None
+            self.error = f"{type(exc).__name__}: {exc}"
+            logger.warning("model_load_failed model=%s error=%s", self.name, self.error)
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.memory_bytes = model_footprint(self.value)
+        if self.error:
+            self.state = FAILED
+        else:
+            self.state = READY if self.value is not None else UNAVAILABLE
+        logger.info("model_loaded model=%s state=%s load_ms=%s", self.name, self.state, self.load_ms)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "lazy": self.lazy,
+            "load_ms": self.load_ms,
+            "memory_bytes": self.memory_bytes,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """Named model loaders with load-once semantics and load telemetry.
+
+    ``model(name)`` turns a zero-argument loader into a getter that loads on
+    first call and returns the same object afterwards. ``load_in_background``
+    loads every non-lazy model concurrently; lazy models (``LAZY_MODELS``)
+    wait for their first request and do not hold back readiness. A loader
+    returning ``None`` (optional dependency missing) is ``unavailable``, one
+    that raises is ``failed``; either way callers get ``None`` and use their
+    fallback.
+    """
+
+    def __init__(self, lazy: Optional[set] = None, require_models: bool = READY_REQUIRE_MODELS) -> None:
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lazy = LAZY_MODELS if lazy is None else lazy
+        self._require_models = require_models
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def model(self, name: str) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+        def decorator(loader: Callable[[], Any]) -> Callable[[], Any]:
+            entry = _ModelEntry(name, loader, name in self._lazy)
+            self._entries[name] = entry
+
+            @wraps(loader)
+            def getter() -> Any:
+                return entry.get()
+
+            return getter
+
+        return decorator
+
+    def load_in_background(self, max_workers: int = MODEL_LOAD_WORKERS) -> None:
+        eager: List[_ModelEntry] = [entry for entry in self._entries.values() if not entry.lazy]
+        if not eager or self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="model-load")
+        for entry in eager:
+            self._executor.submit(entry.get)
+        self._executor.shutdown(wait=False)
+
+    def ready(self) -> bool:
+        for entry in self._entries.values():
+            if entry.lazy:
+                continue
+            if entry.state not in _SETTLED:
+                return False
+            if self._require_models and entry.state != READY:
+                return False
+        return True
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "models": {name: entry.report() for name, entry in self._entries.items()},
+            "process_max_rss_bytes": _max_rss_bytes(),
+        }
+
+
+model_registry = ModelRegistry()
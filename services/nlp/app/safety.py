@@ -1,16 +1,166 @@
+import json
+import os
 import re
-from typing import Dict, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence
 
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "data", "crisis_lexicon.json")
+CRISIS_LEXICON_PATH = os.getenv("CRISIS_LEXICON_PATH") or DEFAULT_LEXICON_PATH
+CRISIS_REASON = "Detected crisis-related language."
+SAFETY_SCAN_CHUNK_CHARS = int(os.getenv("SAFETY_SCAN_CHUNK_CHARS", "2000"))
+SAFETY_SCAN_OVERLAP_CHARS = int(os.getenv("SAFETY_SCAN_OVERLAP_CHARS", "128"))
 
-CRISIS_PATTERNS: Tuple[re.Pattern[str], ...] = (
-    re.compile(r"\b(suicid(e|al)|kill myself|end my life)\b", re.IGNORECASE),
-    re.compile(r"\b(self[-\s]?harm|hurt myself)\b", re.IGNORECASE),
-    re.compile(r"\b(no reason to live|want to die|can't go on)\b", re.IGNORECASE),
-)
+# Spaces and hyphens inside a phrase match any run of separators, so
+# "self harm" also covers "self-harm", "self_harm" and "self . harm".
+_SEPARATOR = r"[\s\-_.*]+"
+_TERMINAL = ""
 
 
-def detect_crisis(text: str) -> Dict[str, str | bool | None]:
-    for pattern in CRISIS_PATTERNS:
-        if pattern.search(text):
-            return {"crisis": True, "reason": "Detected crisis-related language."}
-    return {"crisis": False, "reason": None}
+@dataclass(frozen=True)
+class CrisisMatch:
+    category: str
+    start: int
+    end: int
+    text: str
+
+
+def _char_classes(substitutions: Dict[str, str]) -> Dict[str, str]:
+    classes: Dict[str, str] = {}
+    for char, variants in substitutions.items():
+        members = "".join(dict.fromkeys(char + variants))
+        token = "[" + "".join(re.escape(member) for member in members) + "]"
+        classes[char] = token
+        # Accented letters written in the lexicon itself fold to the same class.
+        for variant in variants:
+            if variant.isalpha() and not variant.isascii():
+                classes.setdefault(variant, token)
+    return classes
+
+
+def _phrase_tokens(phrase: str, classes: Dict[str, str]) -> List[str]:
+    tokens: List[str] = []
+    for char in phrase.lower().strip():
+        if char in " -":
+            if tokens and tokens[-1] != _SEPARATOR:
+                tokens.append(_SEPARATOR)
+            continue
+        tokens.append(classes.get(char, re.escape(char)))
+    return tokens
+
+
+def _trie_regex(token_lists: Iterable[Sequence[str]]) -> str:
+    trie: Dict[str, dict] = {}
+    for tokens in token_lists:
+        node = trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_TERMINAL] = {}
+    return _node_regex(trie)
+
+
+def _node_regex(node: Dict[str, dict]) -> str:
+    branches = [token + _node_regex(child) for token, child in sorted(node.items()) if token]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if _TERMINAL in node:
+        return f"(?:{body})?"
+    return body
+
+
+class SafetyEngine:
+    """Crisis phrase matcher compiled into a single-pass pattern.
+
+    Every category's phrases are merged into a prefix trie (shared prefixes
+    are matched once) and emitted as one named group. All groups are joined
+    into one alternation, so ``scan`` walks the text a single time no matter
+    how many phrases or languages the lexicon holds. Letters expand to their
+    obfuscation classes ("k1ll mys3lf", "s*icide") and accents fold
+    ("suicídio").
+    """
+
+    def __init__(self, categories: Dict[str, Sequence[str]], substitutions: Dict[str, str]) -> None:
+        classes = _char_classes(substitutions)
+        self.categories: List[str] = list(categories)
+        self.pattern_count = sum(len(phrases) for phrases in categories.values())
+        self.max_phrase_chars = max(
+            (len(phrase) for phrases in categories.values() for phrase in phrases), default=0
+        )
+        groups = []
+        for index, name in enumerate(self.categories):
+            tokens = [_phrase_tokens(phrase, classes) for phrase in categories[name] if phrase.strip()]
+            groups.append(f"(?P<c{index}>{_trie_regex(tokens)})")
+        self._pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(groups) + r")(?!\w)", re.IGNORECASE
+        )
+
+    @classmethod
+    def from_lexicon(cls, path: str) -> "SafetyEngine":
+        with open(path, encoding="utf-8") as handle:
+            lexicon = json.load(handle)
+        categories: Dict[str, List[str]] = {}
+        for name, languages in lexicon["categories"].items():
+            phrases = [phrase for values in languages.values() for phrase in values]
+            categories[name] = list(dict.fromkeys(phrases))
+        return cls(categories, lexicon.get("substitutions", {}))
+
+    def scan(self, text: str) -> List[CrisisMatch]:
+        return [self._to_match(match) for match in self._pattern.finditer(text)]
+
+    def search(self, text: str) -> Optional[CrisisMatch]:
+        match = self._pattern.search(text)
+        return self._to_match(match) if match else None
+
+    def search_stream(self, text: str, chunk_chars: int, overlap: int) -> Optional[CrisisMatch]:
+        """First match, scanning ``text`` in overlapping windows.
+
+        Stops at the first window holding a match, so a flagged long entry is
+        decided without walking the rest of it. A match touching a window's
+        end may be a truncated word; it is left to the next window, which
+        starts ``overlap`` characters earlier and sees the trailing boundary.
+        """
+        overlap = max(overlap, self.max_phrase_chars)
+        chunk_chars = max(chunk_chars, overlap * 2)
+        length = len(text)
+        start = 0
+        while True:
+            end = min(start + chunk_chars, length)
+            match = self._pattern.search(text, start, end)
+            if match and (match.end() < end or end == length):
+                return self._to_match(match)
+            if end == length:
+                return None
+            start = end - overlap
+
+    def _to_match(self, match: "re.Match[str]") -> CrisisMatch:
+        category = self.categories[int(match.lastgroup[1:])]
+        return CrisisMatch(category=category, start=match.start(), end=match.end(), text=match.group(0))
+
+
+@lru_cache(maxsize=1)
+def get_safety_engine() -> SafetyEngine:
+    return SafetyEngine.from_lexicon(CRISIS_LEXICON_PATH)
+
+
+def scan_crisis(text: str) -> List[CrisisMatch]:
+    return get_safety_engine().scan(text)
+
+
+def screen_crisis(text: str) -> Dict[str, object]:
+    """Streamed ``detect_crisis`` that stops at the first flagged window.
+
+    Reports only the category that tripped the scan.
+    """
+    match = get_safety_engine().search_stream(text, SAFETY_SCAN_CHUNK_CHARS, SAFETY_SCAN_OVERLAP_CHARS)
+    if match:
+        return {"crisis": True, "reason": CRISIS_REASON, "categories": [match.category]}
+    return {"crisis": False, "reason": None, "categories": []}
+
+
+def detect_crisis(text: str) -> Dict[str, object]:
+    matches = scan_crisis(text)
+    if matches:
+        categories = list(dict.fromkeys(match.category for match in matches))
+        return {"crisis": True, "reason": CRISIS_REASON, "categories": categories}
+    return {"crisis": False, "reason": None, "categories": []}
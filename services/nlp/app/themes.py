@@ -1,22 +1,38 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import base64
+import hashlib
+import json
+import os
+import threading
 import uuid
-from typing import Dict, List, Optional, Sequence
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, field, replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
+from .cache import ByteLRUCache, json_sizeof
+from .clustering import choose_cluster_method, cluster_embeddings
+from .encoding import pack_array, unpack_array
+from .lazy import optional_import
+from .metrics import timed
 from .pipeline import extract_keyphrases
 
-try:
-    from sklearn.cluster import KMeans
-except Exception:  # pragma: no cover - optional at runtime
-    KMeans = None
 
-try:
-    import hdbscan
-except Exception:  # pragma: no cover - optional at runtime
-    hdbscan = None
+THEME_ASSIGN_THRESHOLD = float(os.getenv("THEME_ASSIGN_THRESHOLD", "0.4"))
+THEME_DRIFT_THRESHOLD = float(os.getenv("THEME_DRIFT_THRESHOLD", "0.25"))
+THEME_MAX_CLUSTERS = int(os.getenv("THEME_MAX_CLUSTERS", "8"))
+THEME_STATE_MAX_ENTRIES = int(os.getenv("THEME_STATE_MAX_ENTRIES", "200"))
+THEME_STATE_VERSION = 1
+THEME_STATE_MAX_BYTES = int(os.getenv("THEME_STATE_MAX_BYTES", str(8 * 1024 * 1024)))
+THEME_CACHE_TTL_S = float(os.getenv("THEME_CACHE_TTL_S", "30"))
+THEME_CACHE_MAX_BYTES = int(os.getenv("THEME_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+THEME_MATCH_MIN_SIMILARITY = float(os.getenv("THEME_MATCH_MIN_SIMILARITY", "0.5"))
+THEME_IDENTITY_CACHE_USERS = int(os.getenv("THEME_IDENTITY_CACHE_USERS", "1000"))
 
 
 @dataclass
@@ -36,10 +52,6 @@ class ThemeResult:
     members: List[ThemeMember]
 
 
-def choose_cluster_method(count: int) -> str:
-    return "kmeans" if count < 20 else "hdbscan"
-
-
 def _snippet(text: str, limit: int = 160) -> str:
     cleaned = " ".join(text.split())
     if len(cleaned) <= limit:
@@ -55,78 +67,595 @@ def _label_from_keywords(keywords: Sequence[str]) -> str:
     return f"{keywords[0].title()} & {keywords[1].title()}"
 
 
-def _cluster_kmeans(embeddings: np.ndarray) -> np.ndarray:
-    if KMeans is None:
-        raise RuntimeError("KMeans unavailable")
-    count = embeddings.shape[0]
-    k = min(5, max(2, count // 5))
-    model = KMeans(n_clusters=k, n_init=10, random_state=42)
-    return model.fit_predict(embeddings)
+def _cluster_embeddings(embeddings: np.ndarray, user_id: Optional[str] = None) -> np.ndarray:
+    with timed("themes.cluster") as timer:
+        labels, timer.backend = cluster_embeddings(embeddings, user_id)
+        return labels
 
 
-def _cluster_hdbscan(embeddings: np.ndarray) -> np.ndarray:
-    if hdbscan is None:
-        raise RuntimeError("HDBSCAN unavailable")
-    model = hdbscan.HDBSCAN(min_cluster_size=3, min_samples=2)
-    return model.fit_predict(embeddings)
+def _entry_keywords(entry: Dict) -> List[str]:
+    if entry.get("keywords") is not None:
+        return list(entry["keywords"])
+    return extract_keyphrases(entry["text"], top_n=5)
 
 
-def _cluster_embeddings(embeddings: np.ndarray) -> np.ndarray:
-    method = choose_cluster_method(len(embeddings))
-    if method == "hdbscan":
-        try:
-            return _cluster_hdbscan(embeddings)
-        except Exception:
-            return _cluster_kmeans(embeddings)
-    return _cluster_kmeans(embeddings)
+def _top_keywords(keyword_counts: Dict[str, int]) -> List[str]:
+    keywords = [item[0] for item in sorted(keyword_counts.items(), key=lambda v: v[1], reverse=True)]
+    return keywords[:5] if keywords else []
+
+
+def _build_theme(
+    theme_id: str,
+    cluster_entries: Sequence[Dict],
+    keyword_counts: Dict[str, int],
+    strength: float,
+) -> ThemeResult:
+    keywords = _top_keywords(keyword_counts)
+    members: List[ThemeMember] = []
+    for entry in cluster_entries[:3]:
+        members.append(
+            ThemeMember(
+                entry_id=entry["entry_id"],
+                score=float(entry.get("score", 0.5)),
+                snippet=entry.get("snippet") or _snippet(entry["text"]),
+                reason="Frequently linked to this theme.",
+            )
+        )
+    return ThemeResult(
+        temp_theme_id=theme_id,
+        label=_label_from_keywords(keywords),
+        keywords=keywords,
+        strength=strength,
+        members=members,
+    )
+
+
+def _count_keywords(keyword_lists: Sequence[Sequence[str]]) -> Dict[str, int]:
+    keyword_counts: Dict[str, int] = {}
+    for phrases in keyword_lists:
+        for phrase in phrases:
+            keyword_counts[phrase] = keyword_counts.get(phrase, 0) + 1
+    return keyword_counts
 
 
 def recompute_themes(entries: List[Dict]) -> List[ThemeResult]:
+    themes, _ = recompute_themes_with_state(entries, include_state=False)
+    return themes
+
+
+def recompute_themes_with_state(
+    entries: List[Dict], include_state: bool = True, user_id: Optional[str] = None
+) -> Tuple[List[ThemeResult], Optional[ThemeState]]:
+    themes, _, state = _recompute(entries, include_state, user_id)
+    return themes, state
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+@timed("themes.recompute")
+def _recompute(
+    entries: List[Dict], include_state: bool, user_id: Optional[str]
+) -> Tuple[List[ThemeResult], np.ndarray, Optional[ThemeState]]:
+    """Themes, their unit centroids (one row per theme) and the optional state."""
     if len(entries) < 2:
-        return []
+        state = ThemeState.from_entries(entries) if include_state else None
+        return [], np.zeros((0, 0), dtype=np.float32), state
 
     embeddings = np.array([entry["embedding"] for entry in entries], dtype=float)
-    labels = _cluster_embeddings(embeddings)
+    labels = _cluster_embeddings(embeddings, user_id)
+
+    if include_state:
+        state = ThemeState.from_entries(entries, embeddings)
+        state.user_id = user_id
+        state.refit(labels)
+        populated = [cluster for cluster, count in enumerate(state.counts) if count]
+        return state.themes(), state._centroids()[populated], state
 
     themes: List[ThemeResult] = []
+    centroids: List[np.ndarray] = []
     label_ids = sorted({label for label in labels if label != -1})
     if not label_ids:
-        return []
+        return [], np.zeros((0, embeddings.shape[1]), dtype=np.float32), None
 
+    unit_embeddings = _unit_rows(embeddings.astype(np.float32))
     for idx in label_ids:
         cluster_entries = [
             entry for entry, label in zip(entries, labels, strict=False) if label == idx
         ]
         if not cluster_entries:
             continue
+        keyword_counts = _count_keywords([_entry_keywords(entry) for entry in cluster_entries])
+        themes.append(
+            _build_theme(
+                str(uuid.uuid4()),
+                cluster_entries,
+                keyword_counts,
+                round(len(cluster_entries) / len(entries), 3),
+            )
+        )
+        centroids.append(_normalize(unit_embeddings[labels == idx].mean(axis=0)))
 
-        keyword_counts: Dict[str, int] = {}
-        for entry in cluster_entries:
-            for phrase in extract_keyphrases(entry["text"], top_n=5):
-                keyword_counts[phrase] = keyword_counts.get(phrase, 0) + 1
-
-        keywords = [item[0] for item in sorted(keyword_counts.items(), key=lambda v: v[1], reverse=True)]
-        keywords = keywords[:5] if keywords else []
-
-        members: List[ThemeMember] = []
-        for entry in cluster_entries[:3]:
-            members.append(
-                ThemeMember(
-                    entry_id=entry["entry_id"],
-                    score=float(entry.get("score", 0.5)),
-                    snippet=_snippet(entry["text"]),
-                    reason="Frequently linked to this theme.",
+    return themes, np.vstack(centroids), None
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+@dataclass
+class ThemeState:
+    """Per-user clustering state carried between incremental theme updates.
+
+    Holds one running centroid sum, member count and keyword histogram per
+    cluster, plus a bounded window of recent entries (embedding, snippet and
+    keywords) so a full re-cluster can run without the caller re-sending
+    history or re-extracting keyphrases.
+    """
+
+    dim: int
+    theme_ids: List[str] = field(default_factory=list)
+    centroid_sums: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.float32))
+    counts: List[int] = field(default_factory=list)
+    keyword_counts: List[Dict[str, int]] = field(default_factory=list)
+    entries: List[Dict] = field(default_factory=list)
+    embeddings: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.float32))
+    drift: float = 0.0
+    total: int = 0
+    # Not encoded; lets a re-cluster reuse the user's fitted projection.
+    user_id: Optional[str] = None
+
+    @classmethod
+    def from_entries(
+        cls, entries: Sequence[Dict], embeddings: Optional[np.ndarray] = None
+    ) -> "ThemeState":
+        if embeddings is None:
+            embeddings = np.array([entry["embedding"] for entry in entries], dtype=float)
+        dim = int(embeddings.shape[1]) if embeddings.ndim == 2 and len(embeddings) else 0
+        state = cls(dim=dim)
+        recent = list(entries)[-THEME_STATE_MAX_ENTRIES:]
+        state.entries = [
+            {
+                "entry_id": entry["entry_id"],
+                "snippet": _snippet(entry["text"]),
+                "keywords": _entry_keywords(entry),
+                "label": -1,
+            }
+            for entry in recent
+        ]
+        if dim:
+            vectors = embeddings[-len(recent):].astype(np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            state.embeddings = vectors / np.where(norms == 0, 1.0, norms)
+            state.centroid_sums = np.zeros((0, dim), dtype=np.float32)
+        state.total = len(entries)
+        return state
+
+    @property
+    def drift_ratio(self) -> float:
+        return self.drift / max(1, self.total)
+
+    def refit(self, labels: Optional[np.ndarray] = None) -> None:
+        if labels is None:
+            labels = _cluster_embeddings(self.embeddings, self.user_id) if len(self.entries) >= 2 else None
+        if labels is None:
+            labels = np.full(len(self.entries), -1)
+        offset = len(labels) - len(self.entries)
+        labels = np.asarray(labels)[offset:]
+
+        label_ids = sorted({int(label) for label in labels if label != -1})
+        remap = {label: index for index, label in enumerate(label_ids)}
+        previous_ids, previous_centroids = self.theme_ids, self._centroids()
+        self.theme_ids = [str(uuid.uuid4()) for _ in label_ids]
+        self.centroid_sums = np.zeros((len(label_ids), self.dim), dtype=np.float32)
+        self.counts = [0 for _ in label_ids]
+        self.keyword_counts = [{} for _ in label_ids]
+        for row, (entry, label) in enumerate(zip(self.entries, labels, strict=False)):
+            cluster = remap.get(int(label), -1)
+            entry["label"] = cluster
+            if cluster == -1:
+                continue
+            self._add_to_cluster(cluster, self.embeddings[row], entry["keywords"])
+        # Clusters that survive the re-cluster keep their ids.
+        for previous_row, cluster in match_centroids(previous_centroids, self._centroids()):
+            self.theme_ids[cluster] = previous_ids[previous_row]
+        self.total = len(self.entries)
+        self.drift = 0.0
+
+    def assign(self, entry: Dict, vector: np.ndarray) -> str:
+        """Place one entry into the nearest cluster (or a new one) in O(k*d)."""
+        self._forget(entry["entry_id"])
+        vector = _normalize(vector.astype(np.float32))
+        record = {
+            "entry_id": entry["entry_id"],
+            "snippet": _snippet(entry["text"]),
+            "keywords": _entry_keywords(entry),
+            "label": -1,
+        }
+        self._append(record, vector)
+        self.total += 1
+
+        if not self.theme_ids:
+            if len(self.entries) < 2:
+                return "buffered"
+            self.refit()
+            return "reclustered"
+
+        similarities = self._centroids() @ vector
+        best = int(np.argmax(similarities))
+        best_score = float(similarities[best])
+        if best_score >= THEME_ASSIGN_THRESHOLD or len(self.theme_ids) >= THEME_MAX_CLUSTERS:
+            action = "assigned"
+            cluster = best
+            self.drift += 1.0 - best_score
+        else:
+            action = "created"
+            cluster = self._open_cluster()
+            self.drift += 1.0
+        record["label"] = cluster
+        self._add_to_cluster(cluster, vector, record["keywords"])
+
+        if self.drift_ratio > THEME_DRIFT_THRESHOLD:
+            self.refit()
+            return "reclustered"
+        return action
+
+    def themes(self) -> List[ThemeResult]:
+        themes: List[ThemeResult] = []
+        for cluster, theme_id in enumerate(self.theme_ids):
+            if not self.counts[cluster]:
+                continue
+            members = [entry for entry in self.entries if entry["label"] == cluster]
+            themes.append(
+                _build_theme(
+                    theme_id,
+                    members,
+                    self.keyword_counts[cluster],
+                    round(self.counts[cluster] / max(1, self.total), 3),
                 )
             )
+        return themes
 
-        themes.append(
-            ThemeResult(
-                temp_theme_id=str(uuid.uuid4()),
-                label=_label_from_keywords(keywords),
-                keywords=keywords,
-                strength=round(len(cluster_entries) / len(entries), 3),
-                members=members,
+    def encode(self) -> str:
+        payload = {
+            "v": THEME_STATE_VERSION,
+            "dim": self.dim,
+            "theme_ids": self.theme_ids,
+            "centroid_sums": pack_array(self.centroid_sums, "<f4"),
+            "counts": self.counts,
+            "keyword_counts": self.keyword_counts,
+            "entries": self.entries,
+            "embeddings": pack_array(self.embeddings, "<f2"),
+            "drift": self.drift,
+            "total": self.total,
+        }
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(zlib.compress(raw)).decode("ascii")
+
+    @classmethod
+    def decode(cls, blob: Optional[str]) -> Optional["ThemeState"]:
+        if not blob:
+            return None
+        try:
+            # Bounded, so a small blob cannot inflate into an unbounded buffer.
+            inflater = zlib.decompressobj()
+            raw = inflater.decompress(base64.urlsafe_b64decode(blob.encode("ascii")), THEME_STATE_MAX_BYTES)
+            if inflater.unconsumed_tail:
+                return None
+            payload = json.loads(raw)
+            if payload.get("v") != THEME_STATE_VERSION:
+                return None
+            dim = int(payload["dim"])
+            return cls(
+                dim=dim,
+                theme_ids=list(payload["theme_ids"]),
+                centroid_sums=unpack_array(payload["centroid_sums"], "<f4", dim),
+                counts=[int(count) for count in payload["counts"]],
+                keyword_counts=[dict(counts) for counts in payload["keyword_counts"]],
+                entries=list(payload["entries"]),
+                embeddings=unpack_array(payload["embeddings"], "<f2", dim),
+                drift=float(payload["drift"]),
+                total=int(payload["total"]),
             )
+        except Exception:
+            return None
+
+    def _centroids(self) -> np.ndarray:
+        norms = np.linalg.norm(self.centroid_sums, axis=1, keepdims=True)
+        return self.centroid_sums / np.where(norms == 0, 1.0, norms)
+
+    def _open_cluster(self) -> int:
+        self.theme_ids.append(str(uuid.uuid4()))
+        self.centroid_sums = np.vstack(
+            [self.centroid_sums, np.zeros((1, self.dim), dtype=np.float32)]
         )
+        self.counts.append(0)
+        self.keyword_counts.append({})
+        return len(self.theme_ids) - 1
 
-    return themes
+    def _add_to_cluster(self, cluster: int, vector: np.ndarray, keywords: Sequence[str]) -> None:
+        self.centroid_sums[cluster] += vector
+        self.counts[cluster] += 1
+        counts = self.keyword_counts[cluster]
+        for phrase in keywords:
+            counts[phrase] = counts.get(phrase, 0) + 1
+
+    def _append(self, record: Dict, vector: np.ndarray) -> None:
+        if not self.dim:
+            self.dim = int(vector.shape[0])
+            self.centroid_sums = np.zeros((0, self.dim), dtype=np.float32)
+            self.embeddings = np.zeros((0, self.dim), dtype=np.float32)
+        self.entries.append(record)
+        self.embeddings = np.vstack([self.embeddings, vector[None, :]])
+        if len(self.entries) > THEME_STATE_MAX_ENTRIES:
+            self.entries = self.entries[-THEME_STATE_MAX_ENTRIES:]
+            self.embeddings = self.embeddings[-THEME_STATE_MAX_ENTRIES:]
+
+    def _forget(self, entry_id: str) -> None:
+        for row, entry in enumerate(self.entries):
+            if entry["entry_id"] != entry_id:
+                continue
+            cluster = entry["label"]
+            if 0 <= cluster < len(self.theme_ids):
+                self.centroid_sums[cluster] -= self.embeddings[row]
+                self.counts[cluster] = max(0, self.counts[cluster] - 1)
+                counts = self.keyword_counts[cluster]
+                for phrase in entry["keywords"]:
+                    if counts.get(phrase, 0) > 1:
+                        counts[phrase] -= 1
+                    else:
+                        counts.pop(phrase, None)
+            del self.entries[row]
+            self.embeddings = np.delete(self.embeddings, row, axis=0)
+            self.total = max(0, self.total - 1)
+            return
+
+
+def update_themes_incremental(
+    entry: Dict, state_blob: Optional[str], user_id: Optional[str] = None
+) -> Tuple[List[ThemeResult], str, str, float]:
+    with timed("themes.incremental") as timer:
+        vector = np.asarray(entry["embedding"], dtype=np.float32)
+        state = ThemeState.decode(state_blob)
+        if state is None or (state.dim and state.dim != vector.shape[0]):
+            state = ThemeState(dim=0)
+        state.user_id = user_id
+        action = state.assign(entry, vector)
+        timer.backend = action
+        return state.themes(), state.encode(), action, round(state.drift_ratio, 4)
+
+
+_in_flight: Dict[str, Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_theme_cache() -> ByteLRUCache:
+    return ByteLRUCache(THEME_CACHE_MAX_BYTES, sizeof=_themes_sizeof, ttl_s=THEME_CACHE_TTL_S)
+
+
+def theme_cache_stats() -> Dict[str, int]:
+    return get_theme_cache().stats()
+
+
+def _themes_sizeof(value: Tuple[List[ThemeResult], np.ndarray, Optional[ThemeState]]) -> int:
+    themes, centroids, state = value
+    size = json_sizeof([asdict(theme) for theme in themes]) + centroids.nbytes
+    if state is not None:
+        size += state.embeddings.nbytes + state.centroid_sums.nbytes + json_sizeof(state.entries)
+    return size
+
+
+def themes_fingerprint(user_id: str, entries: Sequence[Dict], include_state: bool) -> str:
+    """Digest of everything the recompute result depends on."""
+    digest = hashlib.sha256(f"{user_id}\x1f{int(include_state)}".encode("utf-8"))
+    for entry in entries:
+        digest.update(b"\x1e")
+        digest.update(str(entry["entry_id"]).encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(entry["text"].encode("utf-8"))
+        digest.update(b"\x1f")
+        digest.update(np.asarray(entry["embedding"], dtype=np.float32).tobytes())
+        if entry.get("keywords") is not None:
+            digest.update(json.dumps(list(entry["keywords"])).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _recompute_shared(
+    user_id: str, entries: List[Dict], include_state: bool
+) -> Tuple[List[ThemeResult], np.ndarray, Optional[ThemeState]]:
+    """``_recompute`` deduplicated per user.
+
+    Concurrent calls with the same fingerprint wait on one computation, and
+    its result answers repeats for ``THEME_CACHE_TTL_S`` seconds. Callers
+    share the returned objects and must not modify them.
+    """
+    key = themes_fingerprint(user_id, entries, include_state)
+    with timed("themes.cache") as timer:
+        cached = get_theme_cache().get(key) if THEME_CACHE_TTL_S > 0 else None
+        if cached is not None:
+            timer.backend = "hit"
+            return cached
+        with _in_flight_lock:
+            future = _in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = _in_flight[key] = Future()
+        timer.backend = "miss" if leader else "shared"
+    if not leader:
+        return future.result()
+    try:
+        result = _recompute(entries, include_state, user_id)
+        if THEME_CACHE_TTL_S > 0:
+            get_theme_cache().set(key, result)
+        future.set_result(result)
+        return result
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+@dataclass
+class ThemeDiff:
+    """How a recompute's themes relate to the previous run's.
+
+    ``baseline`` names what they were matched against: ``request`` (the
+    caller's ``previous_themes``), ``cache`` (this process's last run for the
+    user) or ``none``, in which case every theme is ``added`` and the caller
+    should replace what it stored.
+    """
+
+    baseline: str
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _ThemeSnapshot:
+    theme_ids: List[str]
+    centroids: np.ndarray
+    signatures: List[tuple]
+
+
+_snapshots: "OrderedDict[str, _ThemeSnapshot]" = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def _theme_signature(
+    label: Optional[str], keywords: Sequence[str], strength: Optional[float], entry_ids: Sequence[str]
+) -> tuple:
+    return (label, tuple(keywords), None if strength is None else round(float(strength), 3), tuple(sorted(entry_ids)))
+
+
+def _snapshot_from_request(previous_themes: Sequence[Dict], entries: Sequence[Dict]) -> _ThemeSnapshot:
+    """Previous centroids rebuilt from the current embeddings of each theme's members."""
+    theme_ids: List[str] = []
+    centroids: List[np.ndarray] = []
+    signatures: List[tuple] = []
+    if not entries:
+        # Nothing to rebuild centroids from: every previous theme is removed.
+        theme_ids = [theme["theme_id"] for theme in previous_themes]
+        signatures = [
+            _theme_signature(theme.get("label"), theme.get("keywords") or [], theme.get("strength"), theme["entry_ids"])
+            for theme in previous_themes
+        ]
+        return _ThemeSnapshot(theme_ids, np.zeros((len(theme_ids), 0), dtype=np.float32), signatures)
+    rows = {entry["entry_id"]: row for row, entry in enumerate(entries)}
+    embeddings = _unit_rows(np.array([entry["embedding"] for entry in entries], dtype=np.float32))
+    for theme in previous_themes:
+        members = [rows[entry_id] for entry_id in theme["entry_ids"] if entry_id in rows]
+        if not members:
+            centroid = np.zeros(embeddings.shape[1], dtype=np.float32)
+        else:
+            centroid = _normalize(embeddings[members].mean(axis=0))
+        theme_ids.append(theme["theme_id"])
+        centroids.append(centroid)
+        signatures.append(
+            _theme_signature(theme.get("label"), theme.get("keywords") or [], theme.get("strength"), theme["entry_ids"])
+        )
+    width = embeddings.shape[1]
+    return _ThemeSnapshot(theme_ids, np.vstack(centroids) if centroids else np.zeros((0, width)), signatures)
+
+
+def match_centroids(
+    previous: np.ndarray, current: np.ndarray, min_similarity: float = THEME_MATCH_MIN_SIMILARITY
+) -> List[Tuple[int, int]]:
+    """``(previous_row, current_row)`` pairs maximising total cosine similarity.
+
+    Uses the Hungarian algorithm; pairs below ``min_similarity`` are dropped,
+    so a theme that moved too far counts as removed plus added.
+    """
+    if not len(previous) or not len(current) or previous.shape[1] != current.shape[1]:
+        return []
+    similarity = _unit_rows(np.asarray(previous, dtype=np.float32)) @ _unit_rows(
+        np.asarray(current, dtype=np.float32)
+    ).T
+    linear_sum_assignment = optional_import("scipy.optimize", "linear_sum_assignment")
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-similarity)
+        pairs = zip(rows.tolist(), cols.tolist())
+    else:
+        # Greedy on the best remaining pair; equal to Hungarian whenever the
+        # best matches do not compete.
+        pairs, used_rows, used_cols = [], set(), set()
+        for flat in np.argsort(-similarity, axis=None).tolist():
+            row, col = divmod(flat, similarity.shape[1])
+            if row not in used_rows and col not in used_cols:
+                pairs.append((row, col))
+                used_rows.add(row)
+                used_cols.add(col)
+    return [(row, col) for row, col in pairs if similarity[row, col] >= min_similarity]
+
+
+def _stabilize(
+    user_id: str,
+    themes: List[ThemeResult],
+    centroids: np.ndarray,
+    state: Optional[ThemeState],
+    previous_themes: Optional[Sequence[Dict]],
+    entries: Sequence[Dict],
+) -> Tuple[List[ThemeResult], Optional[ThemeState], ThemeDiff]:
+    """Give matched themes their previous ids and describe the change."""
+    if previous_themes is not None:
+        previous, baseline = _snapshot_from_request(previous_themes, entries), "request"
+    else:
+        with _snapshots_lock:
+            previous = _snapshots.get(user_id)
+        baseline = "cache" if previous is not None else "none"
+
+    signatures = [
+        _theme_signature(theme.label, theme.keywords, theme.strength, [member.entry_id for member in theme.members])
+        for theme in themes
+    ]
+    diff = ThemeDiff(baseline=baseline)
+    renamed: Dict[str, str] = {}
+    matched_previous = set()
+    if previous is not None:
+        for previous_row, row in match_centroids(previous.centroids, centroids):
+            renamed[themes[row].temp_theme_id] = previous.theme_ids[previous_row]
+            matched_previous.add(previous_row)
+            same = previous.signatures[previous_row] == signatures[row]
+            (diff.unchanged if same else diff.changed).append(previous.theme_ids[previous_row])
+        diff.removed = [theme_id for row, theme_id in enumerate(previous.theme_ids) if row not in matched_previous]
+    diff.added = [theme.temp_theme_id for theme in themes if theme.temp_theme_id not in renamed]
+
+    if renamed:
+        themes = [replace(theme, temp_theme_id=renamed.get(theme.temp_theme_id, theme.temp_theme_id)) for theme in themes]
+        if state is not None:
+            state = replace(state, theme_ids=[renamed.get(theme_id, theme_id) for theme_id in state.theme_ids])
+
+    snapshot = _ThemeSnapshot([theme.temp_theme_id for theme in themes], centroids, signatures)
+    with _snapshots_lock:
+        _snapshots[user_id] = snapshot
+        _snapshots.move_to_end(user_id)
+        while len(_snapshots) > THEME_IDENTITY_CACHE_USERS:
+            _snapshots.popitem(last=False)
+    return themes, state, diff
+
+
+def recompute_themes_shared(
+    user_id: str,
+    entries: List[Dict],
+    include_state: bool = False,
+    previous_themes: Optional[Sequence[Dict]] = None,
+) -> Tuple[List[ThemeResult], Optional[str], ThemeDiff]:
+    """Themes with ids stable across runs, the encoded state and the diff.
+
+    Clustering is shared and cached as in ``_recompute_shared``. Each theme
+    is then matched to the previous run's, ``previous_themes`` (``theme_id``
+    and member ``entry_ids``, optionally ``label``, ``keywords`` and
+    ``strength``) or else this process's last result for ``user_id``, and
+    keeps its id when matched.
+    """
+    themes, centroids, state = _recompute_shared(user_id, entries, include_state)
+    with timed("themes.match"):
+        themes, state, diff = _stabilize(user_id, themes, centroids, state, previous_themes, entries)
+    return themes, state.encode() if state else None, diff
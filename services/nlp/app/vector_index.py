@@ -0,0 +1,380 @@
+"""Per-user nearest-neighbour index over entry embeddings.
+
+Each user's vectors sit in one ``similarity.FlatMatrix`` of unit rows
+(float32, float16 or int8 per ``SIMILARITY_STORAGE``), so an exact search
+is a single matrix-vector product. Once a user has
+``VECTOR_INDEX_IVF_MIN_ROWS`` entries the index trains an inverted file
+(IVF): spherical k-means centroids partition the rows, and a query only
+scores the rows of its ``nprobe`` nearest lists. Retraining happens when
+the row count doubles; rows added in between join their nearest list.
+
+With ``VECTOR_INDEX_DIR`` set, every write is saved to
+``<dir>/<user hash>.npz`` under a file lock, and readers reload a user's
+file when its mtime moves, so uvicorn workers sharing the directory see
+each other's writes. A save rewrites the user's whole file, so it costs
+O(rows) however few rows changed; ``upsert_many`` saves once per batch.
+"""
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .pipeline import EMBEDDING_MODEL_NAME
+from .similarity import SIMILARITY_STORAGE, FlatMatrix, top_k, unit
+
+logger = logging.getLogger("nlp-service")
+
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "true").lower() in {"true", "1", "yes"}
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "")
+VECTOR_INDEX_MAX_USERS = int(os.getenv("VECTOR_INDEX_MAX_USERS", "1000"))
+VECTOR_INDEX_IVF_MIN_ROWS = int(os.getenv("VECTOR_INDEX_IVF_MIN_ROWS", "2048"))
+VECTOR_INDEX_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+VECTOR_INDEX_TEXT_CHARS = int(os.getenv("VECTOR_INDEX_TEXT_CHARS", "2000"))
+SIMILAR_STRATEGY = os.getenv("SIMILAR_STRATEGY", "auto").lower()
+
+AUTO = "auto"
+EXACT = "exact"
+IVF = "ivf"
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLES_PER_LIST = 64
+_META_FIELDS = ("text", "created_at", "mood")
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, n_lists: int, iterations: int = _KMEANS_ITERATIONS, seed: int = 0
+) -> np.ndarray:
+    """Unit-norm centroids for ``vectors`` (unit rows) by Lloyd's algorithm on cosine."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(vectors.shape[0], n_lists * _KMEANS_SAMPLES_PER_LIST)
+    sample = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # An emptied list keeps its previous centroid.
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32)
+
+
+class UserIndex:
+    """One user's vectors, entry ids and entry metadata, searchable by cosine."""
+
+    def __init__(
+        self,
+        dim: int,
+        ivf_min_rows: int = VECTOR_INDEX_IVF_MIN_ROWS,
+        storage: str = SIMILARITY_STORAGE,
+    ) -> None:
+        self.dim = dim
+        self.ivf_min_rows = ivf_min_rows
+        self._matrix = FlatMatrix(dim, storage)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._meta: List[Dict[str, Any]] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_rows = 0
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes
+
+    @property
+    def strategy(self) -> str:
+        return IVF if self._centroids is not None else EXACT
+
+    def upsert(self, entry_id: str, vector: Sequence[float], meta: Optional[Dict[str, Any]] = None) -> None:
+        row = self._rows.get(entry_id)
+        if row is None:
+            row = self._matrix.append(vector)
+            self._rows[entry_id] = row
+            self._ids.append(entry_id)
+            self._meta.append({})
+            if row == self._assignments.shape[0]:
+                self._assignments = np.concatenate([self._assignments, np.zeros(max(16, row), np.int32)])
+        else:
+            self._matrix.set(row, vector)
+        self._meta[row] = dict(meta or {})
+        if self._centroids is not None:
+            self._assignments[row] = int(np.argmax(self._centroids @ unit(vector)))
+            self._lists = None
+        self._maybe_train()
+
+    def remove(self, entry_id: str) -> bool:
+        row = self._rows.pop(entry_id, None)
+        if row is None:
+            return False
+        last = len(self) - 1
+        if row != last:
+            # Swap-remove keeps the live rows contiguous.
+            self._matrix.move(last, row)
+            self._ids[row] = self._ids[last]
+            self._meta[row] = self._meta[last]
+            self._assignments[row] = self._assignments[last]
+            self._rows[self._ids[row]] = row
+        self._matrix.pop()
+        self._ids.pop()
+        self._meta.pop()
+        self._lists = None
+        return True
+
+    def vector(self, entry_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(entry_id)
+        return None if row is None else self._matrix.decode(np.array([row]))[0]
+
+    def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        exclude: Iterable[str] = (),
+        exact: bool = False,
+    ) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], str]:
+        """``([(entry_id, score, meta), ...], strategy)``, best first."""
+        strategy = EXACT if exact else self.strategy
+        if len(self) == 0 or k <= 0:
+            return [], strategy
+        candidates = None
+        if strategy == IVF:
+            candidates = self._probe(unit(query), nprobe or VECTOR_INDEX_NPROBE)
+        exclude_rows = [self._rows[entry_id] for entry_id in exclude if entry_id in self._rows]
+        rows, scores = self._matrix.search(query, k, candidates, exclude_rows)
+        results = [
+            (self._ids[row], float(score), self._meta[row]) for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+        return results, strategy
+
+    def _probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._lists is None:
+            assignments = self._assignments[: len(self)]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[i] : bounds[i + 1]] for i in range(len(self._centroids))]
+        nearest = top_k(self._centroids @ query, min(nprobe, len(self._centroids)))
+        return np.concatenate([self._lists[index] for index in nearest.tolist()])
+
+    def _maybe_train(self) -> None:
+        if len(self) < self.ivf_min_rows:
+            return
+        if self._centroids is not None and len(self) < 2 * self._trained_rows:
+            return
+        self.train()
+
+    def train(self) -> None:
+        vectors = self._matrix.decode()
+        n_lists = max(1, int(round(np.sqrt(len(vectors)))))
+        self._centroids = spherical_kmeans(vectors, n_lists)
+        self._assignments[: len(vectors)] = np.argmax(vectors @ self._centroids.T, axis=1)
+        self._trained_rows = len(vectors)
+        self._lists = None
+
+    def to_arrays(self, model_name: str) -> Dict[str, np.ndarray]:
+        header = {
+            "model_name": model_name,
+            "ids": self._ids,
+            "meta": self._meta,
+            "trained_rows": self._trained_rows,
+        }
+        arrays = {"header": np.array(json.dumps(header)), **self._matrix.to_arrays()}
+        if self._centroids is not None:
+            arrays["centroids"] = self._centroids
+            arrays["assignments"] = self._assignments[: len(self)]
+        return arrays
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Any,
+        model_name: str,
+        ivf_min_rows: int = VECTOR_INDEX_IVF_MIN_ROWS,
+        storage: str = SIMILARITY_STORAGE,
+    ) -> Optional["UserIndex"]:
+        header = json.loads(str(arrays["header"]))
+        if header.get("model_name") != model_name:
+            return None
+        matrix = FlatMatrix.from_arrays(arrays, storage)
+        index = cls(matrix.dim, ivf_min_rows, storage)
+        index._matrix = matrix
+        index._ids = list(header["ids"])
+        index._rows = {entry_id: row for row, entry_id in enumerate(index._ids)}
+        index._meta = list(header["meta"])
+        index._assignments = np.zeros(len(matrix), dtype=np.int32)
+        if "centroids" in arrays:
+            index._centroids = np.asarray(arrays["centroids"], dtype=np.float32)
+            index._assignments = np.asarray(arrays["assignments"], dtype=np.int32).copy()
+            index._trained_rows = int(header.get("trained_rows", len(matrix)))
+        return index
+
+
+class VectorIndex:
+    """``UserIndex`` per user, kept in an LRU of ``max_users`` and optionally on disk."""
+
+    def __init__(
+        self,
+        directory: str = "",
+        model_name: str = "",
+        max_users: int = VECTOR_INDEX_MAX_USERS,
+        ivf_min_rows: int = VECTOR_INDEX_IVF_MIN_ROWS,
+        storage: str = SIMILARITY_STORAGE,
+    ) -> None:
+        self.directory = directory
+        self.model_name = model_name
+        self.max_users = max(max_users, 1)
+        self.ivf_min_rows = ivf_min_rows
+        self.storage = storage
+        self._users: "OrderedDict[str, Tuple[UserIndex, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def upsert(
+        self, user_id: str, entry_id: str, vector: Sequence[float], meta: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.upsert_many(user_id, [(entry_id, vector, meta)])
+
+    def upsert_many(
+        self,
+        user_id: str,
+        entries: Iterable[Tuple[str, Sequence[float], Optional[Dict[str, Any]]]],
+    ) -> None:
+        """Add or replace ``(entry_id, vector, meta)`` rows, then save the user's index once."""
+        with self._lock, self._file_lock(user_id):
+            index = self._index(user_id)
+            changed = False
+            for entry_id, vector, meta in entries:
+                meta = {key: value for key, value in (meta or {}).items() if key in _META_FIELDS}
+                if isinstance(meta.get("text"), str):
+                    meta["text"] = meta["text"][:VECTOR_INDEX_TEXT_CHARS]
+                dim = len(vector)
+                if index is None or index.dim != dim:
+                    if index is not None and len(index):
+                        logger.info("vector_index reset user_id=%s dim=%s->%s", user_id, index.dim, dim)
+                    index = UserIndex(dim, self.ivf_min_rows, self.storage)
+                index.upsert(entry_id, vector, meta)
+                changed = True
+            if changed:
+                self._store(user_id, index)
+
+    def remove(self, user_id: str, entry_id: str) -> bool:
+        with self._lock, self._file_lock(user_id):
+            index = self._index(user_id)
+            if index is None or not index.remove(entry_id):
+                return False
+            self._store(user_id, index)
+            return True
+
+    def vector(self, user_id: str, entry_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            index = self._index(user_id)
+            return None if index is None else index.vector(entry_id)
+
+    def search(
+        self,
+        user_id: str,
+        query: Sequence[float],
+        k: int,
+        nprobe: Optional[int] = None,
+        exclude: Iterable[str] = (),
+        strategy: str = AUTO,
+    ) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], str, int]:
+        """``(results, strategy, indexed_rows)`` for one user's entries.
+
+        ``strategy`` is ``auto`` (IVF once trained, else exact), ``exact``
+        (always the flat scan) or ``ivf`` (IVF when trained).
+        """
+        with self._lock:
+            index = self._index(user_id)
+            if index is None or index.dim != len(query):
+                return [], EXACT, 0 if index is None else len(index)
+            results, strategy = index.search(query, k, nprobe, exclude, exact=strategy == EXACT)
+            return results, strategy, len(index)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users_in_memory": len(self._users),
+                "rows_in_memory": sum(len(index) for index, _ in self._users.values()),
+                "bytes_in_memory": sum(index.nbytes for index, _ in self._users.values()),
+                "max_users": self.max_users,
+            }
+
+    def _path(self, user_id: str) -> str:
+        digest = hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.npz")
+
+    @contextmanager
+    def _file_lock(self, user_id: str):
+        if not self.directory:
+            yield
+            return
+        with open(self._path(user_id) + ".lock", "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _mtime(self, user_id: str) -> float:
+        try:
+            return os.stat(self._path(user_id)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _index(self, user_id: str) -> Optional[UserIndex]:
+        cached = self._users.get(user_id)
+        mtime = self._mtime(user_id) if self.directory else 0
+        if cached is not None and cached[1] == mtime:
+            self._users.move_to_end(user_id)
+            return cached[0]
+        index = self._load(user_id) if mtime else None
+        if index is not None:
+            self._remember(user_id, index, mtime)
+        return index
+
+    def _load(self, user_id: str) -> Optional[UserIndex]:
+        try:
+            with np.load(self._path(user_id), allow_pickle=False) as arrays:
+                return UserIndex.from_arrays(arrays, self.model_name, self.ivf_min_rows, self.storage)
+        except (OSError, ValueError, KeyError):
+            logger.warning("vector_index unreadable user_id=%s, starting empty", user_id)
+            return None
+
+    def _store(self, user_id: str, index: UserIndex) -> None:
+        mtime = 0
+        if self.directory:
+            path = self._path(user_id)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as handle:
+                np.savez(handle, **index.to_arrays(self.model_name))
+            os.replace(temporary, path)
+            mtime = self._mtime(user_id)
+        self._remember(user_id, index, mtime)
+
+    def _remember(self, user_id: str, index: UserIndex, mtime: float) -> None:
+        self._users[user_id] = (index, mtime)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+
+@lru_cache(maxsize=1)
+def get_vector_index() -> Optional[VectorIndex]:
+    if not VECTOR_INDEX_ENABLED:
+        return None
+    return VectorIndex(VECTOR_INDEX_DIR, EMBEDDING_MODEL_NAME)
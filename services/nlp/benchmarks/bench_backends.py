@@ -0,0 +1,106 @@
+"""Latency benchmark for the torch and ONNX Runtime inference backends.
+
+Run from ``services/nlp`` after ``python -m scripts.export_onnx``::
+
+    python -m benchmarks.bench_backends [--repeat 20] [--batch 32]
+
+For every backend that can be loaded here, reports the load time (cold
+start) and the median latency of a single text and of one batch, for each of
+embedding, sentiment and emotion. Backends whose dependencies or exported
+models are missing are listed as skipped.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app import pipeline
+from app.backends import BACKENDS, EMBEDDING_TASK, EMOTION_TASK, SENTIMENT_TASK, load_classifier, load_encoder
+from app.lazy import optional_import
+
+TEXTS = [
+    "I walked by the river after work and felt my shoulders drop.",
+    "The deadline moved again and I could not sleep properly.",
+    "Dinner with my sister was loud, warm and exactly what I needed.",
+    "Mornings are heavy lately; coffee helps less than it used to.",
+]
+
+
+def _torch_loaders() -> Dict[str, Callable[[], Optional[Any]]]:
+    def encoder():
+        SentenceTransformer = optional_import("sentence_transformers", "SentenceTransformer")
+        if SentenceTransformer is None:
+            return None
+        return SentenceTransformer(pipeline.EMBEDDING_MODEL_NAME)
+
+    def classifier(model_name: str, top_k: Optional[int]):
+        def load():
+            hf_pipeline = optional_import("transformers", "pipeline")
+            if hf_pipeline is None:
+                return None
+            return hf_pipeline("text-classification", model=model_name, top_k=top_k)
+
+        return load
+
+    return {
+        EMBEDDING_TASK: encoder,
+        SENTIMENT_TASK: classifier(pipeline.SENTIMENT_MODEL_NAME, None),
+        EMOTION_TASK: classifier(pipeline.EMOTION_MODEL_NAME, 3),
+    }
+
+
+def _onnx_loaders(backend: str) -> Dict[str, Callable[[], Optional[Any]]]:
+    return {
+        EMBEDDING_TASK: lambda: load_encoder(backend=backend),
+        SENTIMENT_TASK: lambda: load_classifier(SENTIMENT_TASK, backend=backend),
+        EMOTION_TASK: lambda: load_classifier(EMOTION_TASK, top_k=3, backend=backend),
+    }
+
+
+def _call(task: str, model: Any, texts: List[str]) -> Any:
+    if task == EMBEDDING_TASK:
+        return model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+    return model(texts, truncation=True, batch_size=len(texts))
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+
+    batch = [TEXTS[index % len(TEXTS)] for index in range(args.batch)]
+    print(f"{'backend':>10} {'task':>10} {'load ms':>10} {'single ms':>10} {'batch ms':>10}")
+    for backend in BACKENDS:
+        loaders = _torch_loaders() if backend == "torch" else _onnx_loaders(backend)
+        for task, load in loaders.items():
+            started = time.perf_counter()
+            try:
+                model = load()
+            except Exception as exc:
+                model = None
+                print(f"{backend:>10} {task:>10} load failed: {type(exc).__name__}")
+                continue
+            load_ms = (time.perf_counter() - started) * 1e3
+            if model is None:
+                print(f"{backend:>10} {task:>10} {'skipped':>10}")
+                continue
+            single = _median_ms(lambda: _call(task, model, TEXTS[:1]), args.repeat)
+            batched = _median_ms(lambda: _call(task, model, batch), args.repeat)
+            print(f"{backend:>10} {task:>10} {load_ms:>10.1f} {single:>10.2f} {batched:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Time and quality of each clustering path, and the HDBSCAN cost coefficient.
+
+Run from ``services/nlp``::
+
+    python -m benchmarks.bench_clustering [--sizes 20 200 2000 20000] [--dim 384]
+
+Points are drawn around ``--clusters`` random centres, so each size has
+known true labels. For every size the script times the previous fixed-k
+KMeans (``n_init=10``), KMeans and MiniBatchKMeans with ``k`` chosen by
+silhouette, and HDBSCAN up to ``--hdbscan-max`` rows (its cost is
+quadratic). It reports the chosen ``k``, the adjusted Rand index against
+the true labels, the silhouette on a subsample, and the share of points
+left as noise. It finishes by fitting ``ms = c * rows**2 * dim`` to the
+HDBSCAN timings and printing ``c`` in nanoseconds as a value for
+``CLUSTER_HDBSCAN_NS_PER_PAIR_DIM``.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+from app.clustering import choose_cluster_method, cluster_hdbscan, cluster_kmeans, select_k
+from benchmarks.bench_vector_index import clustered_vectors
+
+
+def _timed(fit: Callable[[], np.ndarray]) -> Tuple[np.ndarray, float]:
+    started = time.perf_counter()
+    labels = fit()
+    return labels, (time.perf_counter() - started) * 1000
+
+
+def _silhouette(vectors: np.ndarray, labels: np.ndarray) -> float:
+    kept = labels != -1
+    if len(set(labels[kept].tolist())) < 2:
+        return float("nan")
+    sample = min(int(kept.sum()), 2000)
+    return float(silhouette_score(vectors[kept], labels[kept], metric="cosine", sample_size=sample, random_state=0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000, 20000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=6)
+    parser.add_argument("--hdbscan-max", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    hdbscan_costs: List[Tuple[int, float]] = []
+    header = f"{'rows':>6} {'path':>17} {'ms':>9} {'k':>4} {'ARI':>6} {'silh':>6} {'noise':>6}"
+    print(header)
+    for size in args.sizes:
+        centres = rng.standard_normal((args.clusters, args.dim))
+        truth = rng.integers(0, args.clusters, size)
+        vectors = (centres[truth] + 1.2 * rng.standard_normal((size, args.dim))).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        paths = [
+            ("kmeans_fixed_k", lambda: KMeans(min(5, max(2, size // 5)), n_init=10, random_state=42).fit_predict(vectors)),
+            ("kmeans_auto", lambda: cluster_kmeans(vectors, minibatch=False)),
+            ("minibatch_auto", lambda: cluster_kmeans(vectors, minibatch=True)),
+        ]
+        if size <= args.hdbscan_max:
+            paths.append(("hdbscan", lambda: cluster_hdbscan(vectors)))
+        for name, fit in paths:
+            labels, ms = _timed(fit)
+            if name == "hdbscan" and size >= 200:
+                hdbscan_costs.append((size, ms))
+            found = len(set(labels.tolist()) - {-1})
+            ari = adjusted_rand_score(truth, labels)
+            noise = float(np.mean(labels == -1))
+            print(f"{size:>6} {name:>17} {ms:>9.1f} {found:>4} {ari:>6.3f} {_silhouette(vectors, labels):>6.3f} {noise:>6.2f}")
+        _, select_ms = _timed(lambda: np.array([select_k(vectors)]))
+        print(f"{size:>6} {'(k selection)':>17} {select_ms:>9.1f}   chosen method: {choose_cluster_method(size, args.dim)}")
+
+    if hdbscan_costs:
+        coefficients = [ms * 1e6 / (rows * rows * args.dim) for rows, ms in hdbscan_costs]
+        print(f"\nCLUSTER_HDBSCAN_NS_PER_PAIR_DIM ~= {float(np.median(coefficients)):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Import-time benchmark for the service modules.
+
+Run from ``services/nlp``::
+
+    python -m benchmarks.bench_import [--repeat 5] [--top 10]
+
+Each measurement imports a module in a fresh interpreter under
+``python -X importtime`` and reads the cumulative time of the module itself,
+so numbers are comparable across runs and do not depend on what the parent
+process already imported. Also reports peak RSS after the import, which of
+``app.lazy.HEAVY_MODULES`` got pulled in (should be none), the slowest
+modules under ``app.main``, and what each heavy backend costs when it is
+finally needed.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from app.lazy import HEAVY_MODULES
+
+MODULES = ("app.main", "app.pipeline", "app.themes", "app.openai_rewriter", "app.prompts")
+
+_PROBE = (
+    "import json, resource, sys\n"
+    "import {module}\n"
+    "heavy = [name for name in {heavy!r} if name in sys.modules]\n"
+    "print(json.dumps({{'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'heavy': heavy}}))\n"
+)
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """``{module: (self_us, cumulative_us)}`` from ``-X importtime`` output."""
+    timings: Dict[str, Tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module: str) -> Dict[str, object]:
+    """Import ``module`` in a fresh interpreter and report its cost."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = _parse_importtime(result.stderr)
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "cumulative_ms": timings.get(module, (0, 0))[1] / 1000,
+        "rss_kb": probe["rss_kb"],
+        "heavy": probe["heavy"],
+        "timings": timings,
+    }
+
+
+def median_import_ms(module: str, repeat: int) -> Tuple[float, Dict[str, object]]:
+    runs = [measure_import(module) for _ in range(repeat)]
+    return statistics.median(run["cumulative_ms"] for run in runs), runs[-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'module':>22} {'median ms':>10} {'rss MB':>8}  heavy modules")
+    last = None
+    for module in MODULES:
+        median, run = median_import_ms(module, args.repeat)
+        heavy = ", ".join(run["heavy"]) or "-"
+        print(f"{module:>22} {median:>10.1f} {run['rss_kb'] / 1024:>8.1f}  {heavy}")
+        if module == "app.main":
+            last = run
+
+    if last is not None:
+        print(f"\nslowest self times under app.main (top {args.top}):")
+        slowest: List[Tuple[str, Tuple[int, int]]] = sorted(
+            last["timings"].items(), key=lambda item: item[1][0], reverse=True
+        )[: args.top]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"{name:>40} {self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>8.1f} ms total")
+
+    print("\ndeferred backends (cost paid on first use):")
+    for name in HEAVY_MODULES:
+        try:
+            median, _ = median_import_ms(name, 1)
+        except subprocess.CalledProcessError:
+            print(f"{name:>22} {'not installed':>10}")
+            continue
+        print(f"{name:>22} {median:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Microbenchmark for the crisis safety engine.
+
+Run from ``services/nlp``::
+
+    python -m benchmarks.bench_safety
+
+Reports scan time for growing text sizes against the shipped lexicon and
+against synthetic lexicons with more phrases, next to the previous
+three-regex loop. Time per character should stay roughly flat as the text
+grows (linear scan) and grow slowly with the phrase count (trie-merged
+alternation).
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+from app.safety import SafetyEngine, get_safety_engine
+
+LEGACY_PATTERNS = (
+    re.compile(r"\b(suicid(e|al)|kill myself|end my life)\b", re.IGNORECASE),
+    re.compile(r"\b(self[-\s]?harm|hurt myself)\b", re.IGNORECASE),
+    re.compile(r"\b(no reason to live|want to die|can't go on)\b", re.IGNORECASE),
+)
+
+WORDS = (
+    "today work walk friend tired calm coffee rain meeting deadline family sleep "
+    "morning evening park music dinner phone message weekend train book quiet"
+).split()
+
+
+def _legacy_scan(text: str) -> List[str]:
+    return [match.group(0) for pattern in LEGACY_PATTERNS for match in pattern.finditer(text)]
+
+
+def _journal_text(chars: int, rng: random.Random) -> str:
+    words: List[str] = []
+    size = 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def _synthetic_engine(phrase_count: int, rng: random.Random) -> SafetyEngine:
+    # Phrases share prefixes with the journal vocabulary but never fully match,
+    # which is the expensive case for an alternation.
+    phrases: Dict[str, List[str]] = {"synthetic": []}
+    while len(phrases["synthetic"]) < phrase_count:
+        phrases["synthetic"].append(" ".join(rng.choice(WORDS) + "x" for _ in range(rng.randint(2, 4))))
+    return SafetyEngine(phrases, {"e": "3", "i": "1!", "o": "0", "s": "$5"})
+
+
+def _time(fn: Callable[[str], object], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    sizes = [1_000, 10_000, 100_000, 1_000_000]
+    texts = {size: _journal_text(size, rng) for size in sizes}
+    engine = get_safety_engine()
+
+    print(f"shipped lexicon: {engine.pattern_count} phrases, {len(engine.categories)} categories")
+    print(f"{'chars':>10} {'legacy ms':>10} {'engine ms':>10} {'engine ns/char':>15}")
+    for size in sizes:
+        legacy = _time(_legacy_scan, texts[size], args.repeat)
+        scanned = _time(engine.scan, texts[size], args.repeat)
+        print(f"{size:>10} {legacy * 1e3:>10.3f} {scanned * 1e3:>10.3f} {scanned / size * 1e9:>15.1f}")
+
+    print()
+    print(f"{'phrases':>10} {'chars':>10} {'engine ms':>10} {'engine ns/char':>15}")
+    text = texts[100_000]
+    for phrase_count in (10, 100, 1_000, 5_000):
+        synthetic = _synthetic_engine(phrase_count, rng)
+        scanned = _time(synthetic.scan, text, args.repeat)
+        print(f"{phrase_count:>10} {len(text):>10} {scanned * 1e3:>10.3f} {scanned / len(text) * 1e9:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Flat top-k by storage type, and where an IVF index starts to pay off.
+
+Run from ``services/nlp``::
+
+    python -m benchmarks.bench_similarity [--sizes 500 2000 10000 50000] [--dim 384]
+
+For each corpus size the script times the flat scan in float32, float16
+and int8 storage (memory and recall@k against float32 alongside), then the
+IVF path at ``--nprobe`` on float32 rows, and prints the first size at
+which IVF is faster. That size is a starting point for
+``VECTOR_INDEX_IVF_MIN_ROWS``; below it the flat scan is both exact and
+quicker.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from app.similarity import STORAGE_TYPES, FlatMatrix
+from app.vector_index import UserIndex
+from benchmarks.bench_vector_index import clustered_vectors
+
+
+def _ms_per_query(search, queries: np.ndarray) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    crossover: Optional[int] = None
+    print(f"{'rows':>7} {'path':>9} {'ms/query':>9} {'memory MB':>10} {'recall@' + str(args.k):>10}")
+    for size in args.sizes:
+        vectors = clustered_vectors(size + args.queries, args.dim, rng)
+        data, queries = vectors[:size], vectors[size:]
+        truth: List[set] = []
+        flat_ms = 0.0
+        for storage in STORAGE_TYPES:
+            matrix = FlatMatrix(args.dim, storage)
+            for vector in data:
+                matrix.append(vector)
+            found = [set(matrix.search(query, args.k)[0].tolist()) for query in queries]
+            if storage == "float32":
+                truth = found
+            recall = sum(len(hit & want) for hit, want in zip(found, truth)) / (args.k * len(queries))
+            ms = _ms_per_query(lambda query: matrix.search(query, args.k), queries)
+            flat_ms = ms if storage == "float32" else flat_ms
+            print(f"{size:>7} {storage:>9} {ms:>9.3f} {matrix.nbytes / 2**20:>10.2f} {recall:>10.3f}")
+
+        index = UserIndex(args.dim, ivf_min_rows=size + 1, storage="float32")
+        for row, vector in enumerate(data):
+            index.upsert(str(row), vector)
+        index.train()
+        found = [{int(entry_id) for entry_id, _, _ in index.search(query, args.k, args.nprobe)[0]} for query in queries]
+        recall = sum(len(hit & want) for hit, want in zip(found, truth)) / (args.k * len(queries))
+        ivf_ms = _ms_per_query(lambda query: index.search(query, args.k, args.nprobe), queries)
+        print(f"{size:>7} {'ivf/' + str(args.nprobe):>9} {ivf_ms:>9.3f} {index.nbytes / 2**20:>10.2f} {recall:>10.3f}")
+        if crossover is None and ivf_ms < flat_ms:
+            crossover = size
+
+    if crossover is None:
+        print("\nflat float32 was faster than IVF at every size tried")
+    else:
+        print(f"\nIVF first beat flat float32 at {crossover} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Recall and latency of the per-user IVF index against brute force.
+
+Run from ``services/nlp``::
+
+    python -m benchmarks.bench_vector_index [--sizes 1000 10000 100000] [--dim 384]
+
+Vectors are drawn around random cluster centres so neighbourhoods look like
+sentence embeddings of one person's journal (topics, not uniform noise).
+For each index size the script reports the exact search time, then recall@k
+and query time of the IVF path for a sweep of ``nprobe`` values, plus the
+one-off training time. ``VECTOR_INDEX_IVF_MIN_ROWS`` and
+``VECTOR_INDEX_NPROBE`` should sit where IVF starts beating exact search at
+a recall you accept.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from app.vector_index import UserIndex
+
+
+def clustered_vectors(rows: int, dim: int, rng: np.random.Generator, clusters: int = 64) -> np.ndarray:
+    centres = rng.standard_normal((clusters, dim))
+    noise = 1.2 * rng.standard_normal((rows, dim))
+    return (centres[rng.integers(0, clusters, rows)] + noise).astype(np.float32)
+
+
+def _query_ms(index: UserIndex, queries: np.ndarray, k: int, **options) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query, k, **options)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        vectors = clustered_vectors(size + args.queries, args.dim, rng)
+        data, queries = vectors[:size], vectors[size:]
+        # Fill without training, then train once so the timing is isolated.
+        index = UserIndex(args.dim, ivf_min_rows=size + 1)
+        for row, vector in enumerate(data):
+            index.upsert(str(row), vector)
+        started = time.perf_counter()
+        index.train()
+        train_ms = (time.perf_counter() - started) * 1000
+
+        truth: List[set] = [
+            {entry_id for entry_id, _, _ in index.search(query, args.k, exact=True)[0]} for query in queries
+        ]
+        exact_ms = _query_ms(index, queries, args.k, exact=True)
+        print(f"\nrows={size} dim={args.dim} lists={int(round(np.sqrt(size)))} train={train_ms:.0f} ms")
+        print(f"{'path':>12} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+        print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>10.3f} {1.0:>8.2f}")
+        for nprobe in args.nprobe:
+            found = [
+                {entry_id for entry_id, _, _ in index.search(query, args.k, nprobe=nprobe)[0]} for query in queries
+            ]
+            recall = sum(len(hit & want) for hit, want in zip(found, truth)) / (args.k * len(queries))
+            ivf_ms = _query_ms(index, queries, args.k, nprobe=nprobe)
+            print(f"{'ivf/' + str(nprobe):>12} {recall:>10.3f} {ivf_ms:>10.3f} {exact_ms / ivf_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
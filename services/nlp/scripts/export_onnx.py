@@ -0,0 +1,78 @@
+"""Export the service's models to ONNX for ``INFERENCE_BACKEND=onnx``.
+
+Run from ``services/nlp`` with the torch requirements and ``onnxruntime``
+installed::
+
+    python -m scripts.export_onnx [--output models/onnx] [--opset 17]
+
+Writes one directory per task (``embedding``, ``sentiment``, ``emotion``)
+holding ``model.onnx``, a dynamically quantized ``model.int8.onnx``, the
+tokenizer, the model config (for ``id2label``) and ``backend.json`` with the
+sequence length the runtime should truncate to.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+from app.backends import EMBEDDING_TASK, EMOTION_TASK, ONNX_FILES, ONNX_MODEL_DIR, SENTIMENT_TASK
+from app.pipeline import EMBEDDING_MODEL_NAME, EMOTION_MODEL_NAME, SENTIMENT_MODEL_NAME
+
+
+def _hub_name(name: str) -> str:
+    # sentence-transformers accepts bare names for its own organisation.
+    return name if "/" in name else f"sentence-transformers/{name}"
+
+
+def _export(task: str, model_name: str, classifier: bool, max_length: int, output: str, opset: int) -> None:
+    directory = os.path.join(output, task)
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model_class = AutoModelForSequenceClassification if classifier else AutoModel
+    model = model_class.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["An example journal entry."], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    output_name = "logits" if classifier else "last_hidden_state"
+    axes[output_name] = {0: "batch"} if classifier else {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(directory, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            fp32_path,
+            input_names=names,
+            output_names=[output_name],
+            dynamic_axes=axes,
+            opset_version=opset,
+        )
+    quantize_dynamic(fp32_path, os.path.join(directory, ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(directory)
+    model.config.save_pretrained(directory)
+    with open(os.path.join(directory, "backend.json"), "w", encoding="utf-8") as handle:
+        json.dump({"model_name": model_name, "max_length": max_length}, handle)
+    print(f"exported {task} -> {directory}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    # MiniLM was trained on 256-token windows; the classifiers accept 512.
+    _export(EMBEDDING_TASK, _hub_name(EMBEDDING_MODEL_NAME), False, 256, args.output, args.opset)
+    _export(SENTIMENT_TASK, SENTIMENT_MODEL_NAME, True, 512, args.output, args.opset)
+    _export(EMOTION_TASK, EMOTION_MODEL_NAME, True, 512, args.output, args.opset)
+
+
+if __name__ == "__main__":
+    main()
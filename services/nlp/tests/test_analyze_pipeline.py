@@ -0,0 +1,58 @@
+from fastapi import BackgroundTasks
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models import AnalyzeEntryRequest
+
+CRISIS_TEXT = "Work was long. " * 400 + "I want to kill myself."
+
+
+def _request(text: str, **options) -> AnalyzeEntryRequest:
+    return AnalyzeEntryRequest(user_id="user-1", entry_id="entry-1", text=text, **options)
+
+
+def _fail(text):
+    raise AssertionError("enrichment should not run")
+
+
+def test_staged_skip_avoids_model_work(monkeypatch) -> None:
+    for name in ("get_sentiment", "extract_keyphrases", "embed_text"):
+        monkeypatch.setattr(main, name, _fail)
+    tasks = BackgroundTasks()
+    response = main.analyze_entry(
+        _request(CRISIS_TEXT, pipeline_mode="staged", crisis_policy="skip"), tasks
+    )
+    assert response.safety.crisis is True
+    assert response.enrichment == "skipped"
+    assert response.sentiment is None
+    assert list(response.timings_ms) == ["safety"]
+    assert not tasks.tasks
+
+
+def test_staged_defer_warms_caches_after_response(monkeypatch) -> None:
+    warmed = []
+    monkeypatch.setattr(main, "get_sentiment", _fail)
+    monkeypatch.setattr(main, "extract_keyphrases", lambda text: warmed.append("keyphrases"))
+    monkeypatch.setattr(main, "embed_text", lambda text: warmed.append("embedding"))
+    body = {
+        "user_id": "user-1",
+        "entry_id": "entry-1",
+        "text": CRISIS_TEXT,
+        "pipeline_mode": "staged",
+        "crisis_policy": "defer",
+    }
+    response = TestClient(main.app).post("/analyze-entry", json=body).json()
+    assert response["enrichment"] == "deferred"
+    assert response["safety"]["categories"] == ["suicidal_ideation"]
+    assert warmed == ["keyphrases", "embedding"]
+
+
+def test_staged_mode_enriches_safe_entries() -> None:
+    response = main.analyze_entry(
+        _request("A calm walk by the river.", pipeline_mode="staged", crisis_policy="skip"),
+        BackgroundTasks(),
+    )
+    assert response.safety.crisis is False
+    assert response.enrichment == "complete"
+    assert response.sentiment is not None
+    assert set(response.timings_ms) == {"safety", "sentiment", "keyphrases", "embedding"}
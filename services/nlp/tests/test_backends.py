@@ -0,0 +1,96 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import backends, pipeline
+from app.backends import OnnxSentenceEncoder, OnnxTextClassifier
+from app.lazy import optional_import
+
+TEXTS = [
+    "A long walk after work helped me feel calm.",
+    "I am exhausted and everything went wrong today.",
+]
+
+
+class _FakeTokenizer:
+    def encode_batch(self, texts):
+        return [SimpleNamespace(ids=list(range(1, len(text.split()) + 1))) for text in texts]
+
+
+class _FakeSession:
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.feeds = None
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, _, feeds):
+        self.feeds = feeds
+        return [self.outputs(feeds)]
+
+
+def test_classifier_matches_pipeline_contract() -> None:
+    logits = lambda feeds: np.tile([[-1.0, 2.0]], (len(feeds["input_ids"]), 1))
+    classifier = OnnxTextClassifier(_FakeSession(logits), _FakeTokenizer(), {0: "NEGATIVE", 1: "POSITIVE"})
+    results = classifier(TEXTS, truncation=True, batch_size=1)
+    assert [result["label"] for result in results] == ["POSITIVE", "POSITIVE"]
+    assert results[0]["score"] == pytest.approx(np.exp(2) / (np.exp(2) + np.exp(-1)))
+    assert pipeline._parse_sentiment_output(classifier(TEXTS[0])) == ("positive", results[0]["score"])
+
+
+def test_classifier_top_k_is_best_first() -> None:
+    logits = lambda feeds: np.tile([[0.1, 3.0, 1.0, -2.0]], (len(feeds["input_ids"]), 1))
+    labels = {0: "sadness", 1: "joy", 2: "anger", 3: "fear"}
+    classifier = OnnxTextClassifier(_FakeSession(logits), _FakeTokenizer(), labels, top_k=3)
+    ranked = classifier(TEXTS[0])[0]
+    assert [item["label"] for item in ranked] == ["joy", "anger", "sadness"]
+    assert pipeline._parse_emotion_output(ranked) == "joy"
+
+
+def test_encoder_mean_pools_over_attention_mask() -> None:
+    def states(feeds):
+        # Token i carries value i, so a pooled row is the mean of its ids.
+        return feeds["input_ids"][..., None].astype(np.float32) * np.ones((1, 1, 4))
+
+    session = _FakeSession(states)
+    encoder = OnnxSentenceEncoder(session, _FakeTokenizer(), max_length=16)
+    embeddings = encoder.encode(["one two three", "one"], batch_size=8)
+    assert session.feeds["attention_mask"].tolist() == [[1, 1, 1], [1, 0, 0]]
+    assert embeddings[:, 0].tolist() == [2.0, 1.0]
+    normalized = encoder.encode("one two three", normalize_embeddings=True)
+    assert np.linalg.norm(normalized) == pytest.approx(1.0)
+
+
+def _exported(task: str) -> bool:
+    return os.path.exists(os.path.join(backends.ONNX_MODEL_DIR, task, backends.ONNX_FILES["onnx"]))
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_parity_with_torch(backend) -> None:
+    SentenceTransformer = optional_import("sentence_transformers", "SentenceTransformer")
+    hf_pipeline = optional_import("transformers", "pipeline")
+    if optional_import("onnxruntime") is None or hf_pipeline is None or SentenceTransformer is None:
+        pytest.skip("onnxruntime and torch models are both required")
+    if not all(_exported(task) for task in ("embedding", "sentiment", "emotion")):
+        pytest.skip("run python -m scripts.export_onnx first")
+    tolerance = 0.02 if backend == "onnx" else 0.1
+
+    torch_encoder = SentenceTransformer(pipeline.EMBEDDING_MODEL_NAME)
+    onnx_encoder = backends.load_encoder(backend=backend)
+    expected = torch_encoder.encode(TEXTS, normalize_embeddings=True)
+    actual = onnx_encoder.encode(TEXTS, normalize_embeddings=True)
+    assert np.min(np.sum(expected * actual, axis=1)) > 1 - tolerance
+
+    torch_sentiment = hf_pipeline("sentiment-analysis", model=pipeline.SENTIMENT_MODEL_NAME)
+    onnx_sentiment = backends.load_classifier("sentiment", backend=backend)
+    for expected, actual in zip(torch_sentiment(TEXTS), onnx_sentiment(TEXTS)):
+        assert actual["label"] == expected["label"]
+        assert actual["score"] == pytest.approx(expected["score"], abs=tolerance)
+
+    torch_emotion = hf_pipeline("text-classification", model=pipeline.EMOTION_MODEL_NAME, top_k=3)
+    onnx_emotion = backends.load_classifier("emotion", top_k=3, backend=backend)
+    for expected, actual in zip(torch_emotion(TEXTS), onnx_emotion(TEXTS)):
+        assert pipeline._parse_emotion_output(actual) == pipeline._parse_emotion_output(expected)
@@ -0,0 +1,47 @@
+from fastapi import BackgroundTasks
+
+from app import main, pipeline
+from app.models import AnalyzeBatchRequest, AnalyzeEntryRequest
+
+
+def _request(*texts: str) -> AnalyzeBatchRequest:
+    return AnalyzeBatchRequest(
+        entries=[
+            AnalyzeEntryRequest(user_id="user-1", entry_id=f"entry-{index}", text=text)
+            for index, text in enumerate(texts)
+        ]
+    )
+
+
+def test_embed_texts_matches_single(monkeypatch) -> None:
+    monkeypatch.setattr(pipeline, "get_embedding_model", lambda: None)
+    texts = ["I walked by the river.", "Work felt heavy today."]
+    assert pipeline.embed_texts(texts) == [pipeline.embed_text(text) for text in texts]
+
+
+def test_analyze_batch_keeps_order() -> None:
+    response = main.analyze_batch(
+        _request("First entry.", "I want to kill myself.", "Third entry."), BackgroundTasks()
+    )
+    assert [item.entry_id for item in response.results] == ["entry-0", "entry-1", "entry-2"]
+    assert all(item.result is not None for item in response.results)
+    assert response.results[1].result.safety.crisis is True
+    assert response.results[0].result.safety.crisis is False
+
+
+def test_analyze_batch_reports_per_item_errors(monkeypatch) -> None:
+    def failing_batch(texts):
+        raise RuntimeError("batch failed")
+
+    def failing_item(text):
+        if "broken" in text:
+            raise ValueError("bad input")
+        return [0.0, 1.0]
+
+    monkeypatch.setattr(main, "embed_texts", failing_batch)
+    monkeypatch.setattr(main, "embed_text", failing_item)
+    response = main.analyze_batch(_request("Fine entry.", "A broken entry."), BackgroundTasks())
+    assert response.results[0].result is not None
+    assert response.results[0].result.embedding == [0.0, 1.0]
+    assert response.results[1].result is None
+    assert "embedding" in response.results[1].error
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from app import pipeline
+from app.batching import MicroBatcher
+
+
+def test_micro_batcher_coalesces_concurrent_calls() -> None:
+    batch_sizes = []
+
+    def double(items):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher("double", double, max_batch_size=8, max_wait_ms=50)
+    results = {}
+    start = threading.Barrier(8)
+
+    def call(value: int) -> None:
+        start.wait()
+        results[value] = batcher.submit(value)
+
+    threads = [threading.Thread(target=call, args=(value,)) for value in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {value: value * 2 for value in range(8)}
+    assert sum(batch_sizes) == 8
+    assert len(batch_sizes) < 8
+    assert batcher.stats()["items"] == 8
+
+
+def test_micro_batcher_propagates_errors() -> None:
+    def broken(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher("broken", broken, max_wait_ms=0)
+    with pytest.raises(ValueError):
+        batcher.submit("text")
+
+
+def test_pipeline_routes_through_batcher(monkeypatch) -> None:
+    monkeypatch.setattr(pipeline, "MICRO_BATCH_ENABLED", True)
+    monkeypatch.setattr(pipeline, "get_emotion_pipeline", lambda: None)
+    assert pipeline.get_emotion("I feel okay.") == "neutral"
+    assert pipeline.get_batcher("emotion").stats()["items"] >= 1
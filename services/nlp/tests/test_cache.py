@@ -0,0 +1,51 @@
+from app import cache as cache_module
+from app import pipeline
+from app.cache import ByteLRUCache, SqliteStore
+
+
+def test_byte_lru_evicts_least_recently_used() -> None:
+    cache = ByteLRUCache(max_bytes=40)
+    cache.set("a", ["x" * 10])
+    cache.set("b", ["y" * 10])
+    assert cache.get("a") == ["x" * 10]
+    cache.set("c", ["z" * 10])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expires_entries(monkeypatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = ByteLRUCache(max_bytes=1024, ttl_s=10)
+    cache.set("key", {"validation": "ok"})
+    now[0] += 5
+    assert cache.get("key") == {"validation": "ok"}
+    now[0] += 6
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_store_survives_new_cache(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    ByteLRUCache(1024, store=SqliteStore(path)).set("key", ["calm", "walk"])
+    cache = ByteLRUCache(1024, store=SqliteStore(path))
+    assert cache.get("key") == ["calm", "walk"]
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_extract_keyphrases_hits_cache(monkeypatch) -> None:
+    calls = []
+
+    def fake_extract(text, top_n):
+        calls.append(text)
+        return ["long walk", "calm"][:top_n]
+
+    monkeypatch.setattr(pipeline, "_keyphrases_single", fake_extract)
+    monkeypatch.setattr(pipeline, "get_keyphrase_cache", lambda cache=ByteLRUCache(4096): cache)
+    assert pipeline.extract_keyphrases("I felt calm after a  long walk.", top_n=2) == ["long walk", "calm"]
+    assert pipeline.extract_keyphrases("I felt calm after a long walk. ", top_n=2) == ["long walk", "calm"]
+    assert len(calls) == 1
+    stats = pipeline.get_keyphrase_cache().stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
@@ -0,0 +1,66 @@
+import numpy as np
+from fastapi import BackgroundTasks
+
+from app import main, pipeline
+from app.chunking import aggregate_sentiment, chunk_text, pool_embeddings
+from app.models import AnalyzeEntryRequest, ChunkingOptions
+
+LONG_TEXT = " ".join(f"Sentence number {index} is about a quiet walk." for index in range(60))
+
+
+def test_chunks_keep_sentences_whole_and_overlap() -> None:
+    chunks = chunk_text(LONG_TEXT, max_chars=200, overlap_sentences=1)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert chunks[1].startswith(chunks[0].split(". ")[-1])
+    assert chunk_text("Short entry.", max_chars=200) == ["Short entry."]
+
+
+def test_oversized_sentence_is_split_on_whitespace() -> None:
+    chunks = chunk_text("word " * 100, max_chars=120, overlap_sentences=0)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert " ".join(chunks).split() == ["word"] * 100
+
+
+def test_attention_pooling_favours_consensus() -> None:
+    main_thread = np.array([1.0, 0.0, 0.0])
+    tangent = np.array([0.0, 1.0, 0.0])
+    vectors = [main_thread, main_thread, tangent]
+    mean = np.array(pool_embeddings(vectors, [1, 1, 1], "mean"))
+    attention = np.array(pool_embeddings(vectors, [1, 1, 1], "attention"))
+    assert attention @ main_thread > mean @ main_thread
+    assert np.isclose(np.linalg.norm(attention), 1.0)
+
+
+def test_sentiment_is_length_weighted() -> None:
+    results = [("positive", 0.9), ("negative", -0.8)]
+    assert aggregate_sentiment(results, [900, 100])[0] == "positive"
+    assert aggregate_sentiment(results, [100, 900])[0] == "negative"
+    assert aggregate_sentiment(results, [1, 1])[0] == "neutral"
+
+
+def test_chunked_entry_uses_one_batch_per_model(monkeypatch) -> None:
+    batches = []
+
+    def fake_embed_texts(texts):
+        batches.append(("embedding", len(texts)))
+        return [pipeline._fallback_embedding(text) for text in texts]
+
+    def fake_sentiments(texts):
+        batches.append(("sentiment", len(texts)))
+        return [("positive", 0.5) for _ in texts]
+
+    monkeypatch.setattr(pipeline, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(pipeline, "get_sentiments", fake_sentiments)
+    payload = AnalyzeEntryRequest(
+        user_id="user-1",
+        entry_id="entry-1",
+        text=LONG_TEXT,
+        chunking=ChunkingOptions(max_chars=300, pooling="attention"),
+    )
+    response = main.analyze_entry(payload, BackgroundTasks())
+    assert response.chunk_count > 1
+    assert batches == [("sentiment", response.chunk_count), ("embedding", response.chunk_count)]
+    assert response.sentiment.label == "positive"
+    assert len(response.embedding) == 384
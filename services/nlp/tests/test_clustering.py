@@ -1,3 +1,6 @@
+import numpy as np
+
+from app.clustering import ReducerCache, cluster_kmeans, fit_reducer, k_candidates, select_k
 from app.themes import choose_cluster_method
 
 
@@ -7,3 +10,40 @@ def test_choose_cluster_method_kmeans() -> None:
 
 def test_choose_cluster_method_hdbscan() -> None:
     assert choose_cluster_method(25) == "hdbscan"
+
+
+def test_large_sets_leave_hdbscan_by_estimated_cost() -> None:
+    assert choose_cluster_method(500) == "hdbscan"
+    assert choose_cluster_method(2000) == "kmeans"
+    assert choose_cluster_method(20000) == "minibatch_kmeans"
+    assert choose_cluster_method(2000, dim=16) == "hdbscan"
+
+
+def test_select_k_finds_separated_clusters() -> None:
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((4, 32)) * 5
+    vectors = centres[np.arange(200) % 4] + 0.3 * rng.standard_normal((200, 32))
+    assert select_k(vectors, sample_size=120) == 4
+    labels = cluster_kmeans(vectors, minibatch=True)
+    assert len(set(labels.tolist())) == 4
+    assert list(k_candidates(12)) == [2]
+
+
+def test_pca_reducer_is_fitted_once_per_user() -> None:
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((100, 64)).astype(np.float32)
+    reducer = fit_reducer(vectors, "pca", 8)
+    projected = reducer.transform(vectors)
+    assert projected.shape == (100, 8)
+    # Components come out by explained variance, largest first.
+    variances = projected.var(axis=0)
+    assert np.all(np.diff(variances) <= 1e-4)
+    assert fit_reducer(vectors, "none", 8) is None
+    assert fit_reducer(vectors[:, :8], "pca", 8) is None
+
+    cache = ReducerCache(max_users=1, method="pca")
+    first = cache.get("user-1", vectors)
+    assert cache.get("user-1", vectors[:60]) is first
+    assert cache.get("user-1", np.vstack([vectors, vectors])) is not first
+    cache.get("user-2", vectors)
+    assert cache.stats() == {"users": 1, "fits": 3, "reuses": 1}
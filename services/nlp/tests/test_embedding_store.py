@@ -0,0 +1,47 @@
+import numpy as np
+
+from app import pipeline
+from app.embedding_store import EmbeddingStore
+
+
+def test_store_round_trip_and_shared_open(tmp_path) -> None:
+    store = EmbeddingStore(str(tmp_path), "mini", capacity=4)
+    store.put_many({"a": [1.0, 0.0, 0.0], "b": [0.0, 1.0, 0.0]})
+    other = EmbeddingStore(str(tmp_path), "mini", capacity=4)
+    found = other.get_many(["a", "b", "c"])
+    assert set(found) == {"a", "b"}
+    assert np.allclose(found["b"], [0.0, 1.0, 0.0])
+    assert other.stats()["misses"] == 1
+
+
+def test_store_evicts_least_recently_used(tmp_path) -> None:
+    store = EmbeddingStore(str(tmp_path), "mini", capacity=2)
+    store.put_many({"a": [1.0, 0.0]})
+    store.put_many({"b": [0.0, 1.0]})
+    store.get_many(["a"])
+    store.put_many({"c": [1.0, 1.0]})
+    assert set(store.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert store.stats()["evictions"] == 1
+
+
+def test_store_invalidates_on_model_change(tmp_path) -> None:
+    EmbeddingStore(str(tmp_path), "mini", capacity=4).put_many({"a": [1.0, 0.0]})
+    assert EmbeddingStore(str(tmp_path), "mpnet", capacity=4).get_many(["a"]) == {}
+
+
+def test_embed_texts_reuses_stored_vectors(monkeypatch, tmp_path) -> None:
+    calls = []
+
+    class FakeModel:
+        def encode(self, texts, batch_size, normalize_embeddings):
+            calls.append(list(texts))
+            return np.array([[float(len(text)), 1.0] for text in texts])
+
+    store = EmbeddingStore(str(tmp_path), "fake", capacity=8)
+    monkeypatch.setattr(pipeline, "get_embedding_model", lambda: FakeModel())
+    monkeypatch.setattr(pipeline, "get_embedding_store", lambda: store)
+    first = pipeline.embed_texts(["one", "three"])
+    second = pipeline.embed_texts(["three", "five!", "one"])
+    assert calls == [["one", "three"], ["five!"]]
+    assert second[0] == first[1]
+    assert second[2] == first[0]
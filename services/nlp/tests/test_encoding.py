@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+from fastapi.testclient import TestClient
+
+from app import main
+from app.encoding import decode_embedding, encode_embedding
+from app.models import AnalyzeEntryRequest, RecomputeThemesRequest, ThemeEntry
+
+
+def test_round_trip_float16_and_float32() -> None:
+    vector = np.linspace(-1, 1, 384)
+    assert np.allclose(decode_embedding(encode_embedding(vector, "b64-f32"), "b64-f32"), vector, atol=1e-6)
+    assert np.allclose(decode_embedding(encode_embedding(vector, "b64-f16"), "b64-f16"), vector, atol=1e-3)
+    assert len(encode_embedding(vector, "b64-f16")) == 1024
+
+
+def test_analyze_entry_negotiates_encoding() -> None:
+    client = TestClient(main.app)
+    body = {"user_id": "user-1", "entry_id": "entry-1", "text": "I felt calm after a walk."}
+    default = client.post("/analyze-entry", json=body).json()
+    compact = client.post("/analyze-entry", json=body, headers={"X-Embedding-Encoding": "b64-f16"}).json()
+    assert default["embedding_encoding"] == "json"
+    assert compact["embedding"] == []
+    assert np.allclose(decode_embedding(compact["embedding_b64"], "b64-f16"), default["embedding"], atol=1e-3)
+
+
+def test_recompute_themes_accepts_compact_embeddings() -> None:
+    rng = np.random.default_rng(0)
+    entries = [
+        ThemeEntry(
+            entry_id=str(index),
+            text="Work deadlines kept me up late.",
+            embedding_b64=encode_embedding(rng.standard_normal(16), "b64-f32"),
+        )
+        for index in range(6)
+    ]
+    response = main.recompute_themes_handler(
+        RecomputeThemesRequest(user_id="user-1", entries=entries), x_embedding_encoding="b64-f32"
+    )
+    assert response.themes
+
+
+def test_rejects_unknown_encoding() -> None:
+    payload = AnalyzeEntryRequest(user_id="user-1", entry_id="entry-1", text="Hello.")
+    with pytest.raises(HTTPException):
+        main.analyze_entry(payload, BackgroundTasks(), x_embedding_encoding="msgpack")
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Embedding-Encoding": "json"}])
+def test_binary_embeddings_need_a_binary_encoding_header(headers) -> None:
+    rng = np.random.default_rng(0)
+    entries = [
+        {"entry_id": str(index), "text": "Work.", "embedding_b64": encode_embedding(rng.standard_normal(16), "b64-f16")}
+        for index in range(6)
+    ]
+    response = TestClient(main.app).post(
+        "/recompute-themes", json={"user_id": "user-1", "entries": entries}, headers=headers
+    )
+    assert response.status_code == 400
+    assert "X-Embedding-Encoding" in response.json()["detail"]
+
+
+def test_rejects_mixed_embedding_dimensions() -> None:
+    rng = np.random.default_rng(0)
+    entries = [
+        ThemeEntry(
+            entry_id=str(index),
+            text="Work deadlines kept me up late.",
+            embedding_b64=encode_embedding(rng.standard_normal(16 if index else 8), "b64-f32"),
+        )
+        for index in range(6)
+    ]
+    with pytest.raises(HTTPException) as raised:
+        main.recompute_themes_handler(
+            RecomputeThemesRequest(user_id="user-1", entries=entries), x_embedding_encoding="b64-f32"
+        )
+    assert raised.value.status_code == 400
@@ -0,0 +1,63 @@
+import numpy as np
+
+from app import evidence
+from app.companion import build_prompts
+from app.evidence import mmr_select, select_evidence
+from app.models import ContextEntry
+
+WORDS = ("work", "sleep", "friend")
+
+
+def _fake_embed(texts):
+    return [[float(word in text.lower()) + 0.01 for word in WORDS] for text in texts]
+
+
+ENTRIES = [
+    ContextEntry(entry_id="a", text="A long day at work."),
+    ContextEntry(entry_id="b", text="Work again, another deadline at work."),
+    ContextEntry(entry_id="c", text="Slept badly, sleep is off."),
+    ContextEntry(entry_id="d", text="Coffee with a friend."),
+]
+
+
+def test_mmr_trades_relevance_for_diversity() -> None:
+    candidates = np.array([[1.0, 0.0], [0.99, 0.01], [0.7, 0.7]])
+    query = np.array([[1.0, -0.1]])
+    assert mmr_select(query, candidates, 2, diversity_lambda=1.0).tolist() == [[0, 1]]
+    assert mmr_select(query, candidates, 2, diversity_lambda=0.3).tolist() == [[0, 2]]
+
+
+def test_each_query_gets_its_own_evidence(monkeypatch) -> None:
+    monkeypatch.setattr(evidence, "embed_texts_or_none", _fake_embed)
+    picks = select_evidence("user-1", ["sleep", "friend"], ENTRIES, k=1)
+    assert [[entry.entry_id for entry in row] for row in picks] == [["c"], ["d"]]
+
+
+def test_passed_in_embeddings_are_used_and_order_kept_without_a_model(monkeypatch) -> None:
+    monkeypatch.setattr(evidence, "embed_texts_or_none", lambda texts: None)
+    assert [entry.entry_id for entry in select_evidence("user-1", ["sleep"], ENTRIES, k=2)[0]] == ["a", "b"]
+
+    calls = []
+
+    def embed_queries_only(texts):
+        calls.append(list(texts))
+        return _fake_embed(texts)
+
+    monkeypatch.setattr(evidence, "embed_texts_or_none", embed_queries_only)
+    with_vectors = [entry.model_copy(update={"embedding": _fake_embed([entry.text])[0]}) for entry in ENTRIES]
+    assert select_evidence("user-1", ["friend"], with_vectors, k=1)[0][0].entry_id == "d"
+    assert calls == [["friend"]]
+
+
+def test_build_prompts_picks_evidence_per_topic(monkeypatch) -> None:
+    monkeypatch.setattr(evidence, "embed_texts_or_none", _fake_embed)
+    prompts = build_prompts(
+        user_id="user-1",
+        recent_entries=ENTRIES,
+        similar_entries=[],
+        themes=["sleep", "friend"],
+        mood=None,
+        time_budget=5,
+    )
+    assert prompts[0].evidence[0].entry_id == "c"
+    assert prompts[1].evidence[0].entry_id == "d"
@@ -0,0 +1,56 @@
+import asyncio
+
+from app import features, main
+from app.models import ChatTurnRequestV1, MessageAnalysis, SentimentResult
+
+
+def _count_calls(monkeypatch):
+    calls = {"sentiment": 0, "emotion": 0, "keyphrases": 0}
+
+    def sentiment(text):
+        calls["sentiment"] += 1
+        return "neutral", 0.0
+
+    def emotion(text):
+        calls["emotion"] += 1
+        return "joy"
+
+    def keyphrases(text, top_n=8):
+        calls["keyphrases"] += 1
+        return ["evening walk", "friend", "relief", "work", "sleep"][:top_n]
+
+    monkeypatch.setattr(features, "get_sentiment", sentiment)
+    monkeypatch.setattr(features, "get_emotion", emotion)
+    monkeypatch.setattr(features, "extract_keyphrases", keyphrases)
+    return calls
+
+
+def test_chat_turn_runs_each_model_once(monkeypatch) -> None:
+    calls = _count_calls(monkeypatch)
+    payload = ChatTurnRequestV1(
+        user_id="user-1", chat_id="chat-1", user_message="A walk with a friend helped."
+    )
+    response = asyncio.run(main.chat_turn_v1(payload))
+    assert calls == {"sentiment": 1, "emotion": 1, "keyphrases": 1}
+    assert response.extracted.keyphrases == ["evening walk", "friend", "relief", "work", "sleep"]
+    assert "emotion" in response.features.reused
+    assert "keyphrases" in response.features.reused
+
+
+def test_chat_turn_reuses_seeded_analysis(monkeypatch) -> None:
+    calls = _count_calls(monkeypatch)
+    payload = ChatTurnRequestV1(
+        user_id="user-1",
+        chat_id="chat-1",
+        user_message="A walk with a friend helped.",
+        message_analysis=MessageAnalysis(
+            sentiment=SentimentResult(label="positive", score=0.8),
+            keyphrases=["walk", "friend", "helped", "evening", "calm", "park", "air", "talk"],
+        ),
+    )
+    response = asyncio.run(main.chat_turn_v1(payload))
+    assert calls["sentiment"] == 0
+    assert calls["keyphrases"] == 0
+    assert response.extracted.sentiment.label == "positive"
+    assert "sentiment" in response.features.reused
+    assert "sentiment" not in response.features.computed
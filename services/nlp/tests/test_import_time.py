@@ -0,0 +1,13 @@
+import os
+
+from benchmarks.bench_import import median_import_ms
+
+# Generous enough for a loaded CI box; eagerly importing sklearn, hdbscan
+# and openai again would add well over a second.
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+
+
+def test_app_import_skips_heavy_backends() -> None:
+    median_ms, run = median_import_ms("app.main", 3)
+    assert run["heavy"] == []
+    assert median_ms < IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,64 @@
+import base64
+import zlib
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app import themes
+from app.models import IncrementalThemesRequest
+from app.themes import ThemeState, recompute_themes_with_state, update_themes_incremental
+
+
+def _entry(entry_id: str, vector) -> dict:
+    return {"entry_id": entry_id, "text": f"Entry {entry_id} about work.", "embedding": list(vector)}
+
+
+def _vector(axis: int, noise: float = 0.0, dim: int = 8) -> np.ndarray:
+    vector = np.zeros(dim)
+    vector[axis] = 1.0
+    vector[(axis + 1) % dim] = noise
+    return vector
+
+
+def test_incremental_assigns_to_nearest_cluster() -> None:
+    entries = [_entry(f"a{i}", _vector(0, 0.1 * i)) for i in range(3)]
+    entries += [_entry(f"b{i}", _vector(4, 0.1 * i)) for i in range(3)]
+    themes, state = recompute_themes_with_state(entries)
+    assert len(themes) == 2
+
+    theme_ids = set(state.theme_ids)
+    themes, blob, action, _ = update_themes_incremental(_entry("a9", _vector(0, 0.05)), state.encode())
+    assert action == "assigned"
+    assert {theme.temp_theme_id for theme in themes} == theme_ids
+    assert sum(ThemeState.decode(blob).counts) == 7
+
+
+def test_incremental_opens_new_cluster_for_unrelated_entry() -> None:
+    entries = [_entry(f"a{i}", _vector(0, 0.1 * i)) for i in range(4)]
+    entries += [_entry(f"b{i}", _vector(4, 0.1 * i)) for i in range(4)]
+    _, state = recompute_themes_with_state(entries)
+    themes, _, action, drift = update_themes_incremental(_entry("c0", _vector(6)), state.encode())
+    assert action == "created"
+    assert len(themes) == 3
+    assert drift > 0
+
+
+def test_incremental_starts_from_empty_state() -> None:
+    _, blob, action, _ = update_themes_incremental(_entry("a0", _vector(0)), None)
+    assert action == "buffered"
+    themes, _, action, _ = update_themes_incremental(_entry("b0", _vector(4)), blob)
+    assert action == "reclustered"
+    assert themes
+
+
+def test_state_that_inflates_past_the_cap_is_rejected(monkeypatch) -> None:
+    monkeypatch.setattr(themes, "THEME_STATE_MAX_BYTES", 1024)
+    _, state = recompute_themes_with_state([_entry(f"a{i}", _vector(0, 0.1 * i)) for i in range(3)])
+    assert ThemeState.decode(state.encode()) is not None
+    bomb = base64.urlsafe_b64encode(zlib.compress(b" " * 1_000_000)).decode("ascii")
+    assert len(bomb) < 2048
+    assert ThemeState.decode(bomb) is None
+
+    with pytest.raises(ValidationError):
+        IncrementalThemesRequest(user_id="u", entry=_entry("a9", _vector(0)), state="A" * 4_000_001)
@@ -0,0 +1,125 @@
+import json
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import jobs, main
+from app.encoding import encode_embedding
+from app.jobs import JobQueue, JobQueueFull, sign_callback
+
+
+def _queue(**options) -> JobQueue:
+    queue = JobQueue(":memory:", workers=0, coalesce_window_ms=0, **options)
+    queue.handler("sum", replace_payload=True)(lambda payload: {"total": sum(payload["values"])})
+    return queue
+
+
+def test_burst_of_submissions_coalesces_into_one_run() -> None:
+    queue = _queue()
+    first = queue.submit("sum", "user-1", {"values": [1]})
+    second = queue.submit("sum", "user-1", {"values": [1, 2]})
+    other = queue.submit("sum", "user-2", {"values": [5]})
+    assert second == {"job_id": first["job_id"], "status": "queued", "coalesced": True}
+    assert other["job_id"] != first["job_id"]
+
+    assert queue.run_pending() == 2
+    job = queue.get(first["job_id"])
+    assert (job["status"], job["result"], job["submissions"]) == ("succeeded", {"total": 3}, 2)
+    assert queue.stats() == {"queued": 0, "running": 0, "succeeded": 2, "failed": 0}
+
+
+def test_weekly_reflection_coalesces_only_identical_payloads() -> None:
+    queue = JobQueue(":memory:", workers=0, coalesce_window_ms=0)
+    queue._handlers = main.job_queue._handlers
+    queue._replacing_kinds = main.job_queue._replacing_kinds
+    week = {"entries": [{"entry_id": "e1", "text": "Long week."}], "week_start": "2026-10-05"}
+    first = queue.submit("weekly_reflection", "user-1", week)
+    repeat = queue.submit("weekly_reflection", "user-1", dict(reversed(list(week.items()))))
+    other_week = queue.submit("weekly_reflection", "user-1", {**week, "week_start": "2026-10-12"})
+    assert repeat == {"job_id": first["job_id"], "status": "queued", "coalesced": True}
+    assert other_week["job_id"] != first["job_id"] and not other_week["coalesced"]
+
+
+def test_failures_are_recorded_and_the_queue_is_bounded() -> None:
+    queue = _queue(max_pending=1)
+    queue.handler("boom")(lambda payload: 1 / 0)
+    job_id = queue.submit("boom", "user-1", {})["job_id"]
+    try:
+        queue.submit("sum", "user-1", {"values": []})
+    except JobQueueFull:
+        pass
+    else:
+        raise AssertionError("expected JobQueueFull")
+
+    queue.run_pending()
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("ZeroDivisionError")
+    assert queue.get("missing") is None
+
+
+def test_callback_receives_signed_result(monkeypatch) -> None:
+    monkeypatch.setattr(jobs, "JOBS_CALLBACK_SECRET", "s3cret")
+    delivered = []
+    queue = _queue(deliver=lambda url, body: delivered.append((url, body)))
+    job_id = queue.submit("sum", "user-1", {"values": [2, 2]}, "http://localhost:3000/api/jobs")["job_id"]
+    queue.run_pending()
+
+    ((url, body),) = delivered
+    assert url == "http://localhost:3000/api/jobs"
+    assert json.loads(body)["result"] == {"total": 4}
+    assert len(sign_callback(body, "s3cret")) == 64
+    assert queue.get(job_id)["callback_status"] == "delivered"
+    assert not jobs.callback_allowed("http://169.254.169.254/latest")
+
+
+def test_job_endpoints_run_weekly_reflection(monkeypatch) -> None:
+    queue = JobQueue(":memory:", workers=1, coalesce_window_ms=0)
+    queue._handlers = main.job_queue._handlers
+    monkeypatch.setattr(main, "job_queue", queue)
+    client = TestClient(main.app)
+    try:
+        response = client.post("/v1/jobs/weekly-reflection", json={"user_id": "user-1", "entries": []})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(200):
+            job = client.get(f"/v1/jobs/{job_id}").json()
+            if job["status"] == "succeeded":
+                break
+            time.sleep(0.01)
+        assert job["kind"] == "weekly_reflection"
+        assert job["result"]["evidence_cards"] == []
+
+        rejected = client.post(
+            "/v1/jobs/recompute-themes",
+            json={"user_id": "user-1", "entries": [], "callback_url": "http://example.com/hook"},
+        )
+        assert rejected.status_code == 400
+        assert client.get("/v1/jobs/unknown").status_code == 404
+    finally:
+        queue.stop()
+
+
+def test_recompute_job_accepts_binary_embeddings(monkeypatch) -> None:
+    queue = JobQueue(":memory:", workers=0, coalesce_window_ms=0)
+    queue._handlers = main.job_queue._handlers
+    monkeypatch.setattr(main, "job_queue", queue)
+    rng = np.random.default_rng(0)
+    entries = [
+        {
+            "entry_id": str(index),
+            "text": "Work deadlines.",
+            "embedding_b64": encode_embedding(rng.standard_normal(8), "b64-f32"),
+        }
+        for index in range(6)
+    ]
+    response = TestClient(main.app).post(
+        "/v1/jobs/recompute-themes",
+        json={"user_id": "user-1", "entries": entries},
+        headers={"X-Embedding-Encoding": "b64-f32"},
+    )
+    assert response.status_code == 202
+    queue.run_pending()
+    assert queue.get(response.json()["job_id"])["status"] == "succeeded"
@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+
+from app import main, pipeline
+from app.metrics import STAGE_SECONDS, Histogram, timed
+
+
+def _count(histogram: Histogram, *labels: str) -> int:
+    series = histogram.snapshot().get(labels)
+    return series[2] if series else 0
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_timer_labels_errors_and_chosen_backend() -> None:
+    before = _count(STAGE_SECONDS, "test.stage", "error")
+    try:
+        with timed("test.stage"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    with timed("test.stage") as timer:
+        timer.backend = "fallback"
+    assert _count(STAGE_SECONDS, "test.stage", "error") == before + 1
+    assert _count(STAGE_SECONDS, "test.stage", "fallback") >= 1
+
+
+def test_vader_fallback_is_recorded_under_its_own_backend(monkeypatch) -> None:
+    monkeypatch.setattr(pipeline, "get_sentiment_pipeline", lambda: None)
+    before = _count(STAGE_SECONDS, "sentiment", "vader")
+    pipeline._sentiment_single("What a lovely calm morning.")
+    assert _count(STAGE_SECONDS, "sentiment", "vader") == before + 1
+
+
+def test_metrics_endpoint_exposes_route_templates() -> None:
+    client = TestClient(main.app)
+    assert client.get("/health").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE nlp_stage_duration_seconds histogram" in body
+    assert 'nlp_http_request_duration_seconds_count{route="/health",method="GET",status="200"}' in body
@@ -0,0 +1,133 @@
+import os
+import threading
+
+import pytest
+
+from app import model_server, pipeline
+from app.model_server import ModelServer, ModelServerClient, ModelServerError
+
+
+@pytest.fixture
+def server(tmp_path):
+    calls = []
+
+    def embed(texts):
+        calls.append(("embed", len(texts)))
+        return [[float(len(text)), 0.0] for text in texts]
+
+    def sentiment(texts):
+        calls.append(("sentiment", len(texts)))
+        return [("positive", 0.9) for _ in texts]
+
+    def emotion(texts):
+        calls.append(("emotion", len(texts)))
+        return ["joy" for _ in texts]
+
+    def fail():
+        raise ValueError("boom")
+
+    operations = {
+        "embed": embed,
+        "sentiment": sentiment,
+        "emotion": emotion,
+        "keyphrases": lambda texts, top_n: [["remote"] for _ in texts],
+        "info": lambda: {"keyphrase_backend": "keybert:remote"},
+        "ready": lambda: {"ready": True, "models": {}},
+        "fail": fail,
+    }
+    address = str(tmp_path / "models.sock")
+    instance = ModelServer(address, operations, authkey=b"secret")
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    yield address, calls
+    instance.close()
+
+
+def test_client_round_trip_and_remote_errors(server) -> None:
+    address, _ = server
+    client = ModelServerClient(address, authkey=b"secret", timeout_s=2)
+    assert client.call("embed", ["ab", "abcd"]) == [[2.0, 0.0], [4.0, 0.0]]
+    with pytest.raises(ModelServerError, match="ValueError: boom"):
+        client.call("fail")
+    assert client.call("sentiment", ["still connected"]) == [("positive", 0.9)]
+
+
+def test_concurrent_workers_share_one_server(server) -> None:
+    address, calls = server
+    client = ModelServerClient(address, authkey=b"secret", timeout_s=2)
+    results = []
+
+    def worker(index):
+        results.append(client.call("embed", ["x" * index]))
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(result[0][0] for result in results) == [float(index) for index in range(1, 9)]
+    assert len(calls) == 8
+
+
+def test_pipeline_delegates_batches_to_server(server, monkeypatch) -> None:
+    address, calls = server
+    client = ModelServerClient(address, authkey=b"secret", timeout_s=2)
+    monkeypatch.setattr(pipeline, "get_model_client", lambda: client)
+    monkeypatch.setattr(pipeline, "get_embedding_model", lambda: pytest.fail("loaded locally"))
+    monkeypatch.setattr(pipeline, "get_keyphrase_cache", lambda: pipeline.ByteLRUCache(1024))
+    monkeypatch.setattr(pipeline, "_remote_keyphrase_backend", None)
+
+    assert pipeline.embed_texts(["one", "three"]) == [[3.0, 0.0], [5.0, 0.0]]
+    assert pipeline.get_sentiments(["a", "b"]) == [("positive", 0.9), ("positive", 0.9)]
+    assert pipeline.get_emotion("a") == "joy"
+    assert pipeline.extract_keyphrases_batch(["a", "b"], top_n=3) == [["remote"], ["remote"]]
+    assert calls == [("embed", 2), ("sentiment", 2), ("emotion", 1)]
+
+
+def test_pipeline_falls_back_when_server_is_down(tmp_path, monkeypatch) -> None:
+    client = ModelServerClient(str(tmp_path / "missing.sock"), timeout_s=0.5)
+    monkeypatch.setattr(pipeline, "get_model_client", lambda: client)
+    assert pipeline.get_emotions(["a"]) == ["neutral"]
+    assert pipeline.get_sentiment("What a lovely calm day.")[0] == "positive"
+    assert pipeline.embed_texts(["a"]) == [pipeline._fallback_embedding("a")]
+
+
+def test_dead_server_is_not_retried_per_text(monkeypatch) -> None:
+    calls = []
+
+    class DeadClient:
+        def call(self, operation, *args):
+            calls.append(operation)
+            raise ModelServerError("model server timed out")
+
+        def info(self):
+            return self.call("info")
+
+    monkeypatch.setattr(pipeline, "get_model_client", lambda: DeadClient())
+    monkeypatch.setattr(pipeline, "_remote_keyphrase_backend", None)
+    sentiments = pipeline.get_sentiments(["A lovely calm day.", "Awful.", "The bus came."])
+    assert [label for label, _ in sentiments] == ["positive", "negative", "neutral"]
+    assert calls == ["sentiment"]
+
+    assert pipeline._keyphrase_backend() == pipeline._keyphrase_backend() == "yake"
+    assert calls == ["sentiment", "info"]
+
+
+def test_server_process_skips_its_own_client(monkeypatch) -> None:
+    monkeypatch.setattr(model_server, "MODEL_SERVER_SOCKET", "/tmp/unused.sock")
+    monkeypatch.setattr(model_server, "_serving", True)
+    model_server.get_model_client.cache_clear()
+    assert model_server.get_model_client() is None
+    model_server.get_model_client.cache_clear()
+
+
+def test_server_requires_authkey_and_private_socket(tmp_path) -> None:
+    address = str(tmp_path / "open.sock")
+    with pytest.raises(ValueError):
+        ModelServer(address, {}, authkey=b"")
+    instance = ModelServer(address, {}, authkey=b"secret")
+    threading.Thread(target=instance.serve_forever, daemon=True).start()
+    try:
+        assert os.stat(address).st_mode & 0o777 == 0o600
+    finally:
+        instance.close()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import main, openai_rewriter
+from app.companion import build_reflection_plan
+from app.models import ChatTurnRequestV1
+from app.openai_rewriter import get_rewrite_cache, rewrite_plan_async
+
+
+class _StubOpenAI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay_s = 0.0
+    content = ""
+    client_ports: list = []
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        type(self).client_ports.append(self.client_address[1])
+        time.sleep(type(self).delay_s)
+        body = json.dumps(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": type(self).content},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        return
+
+
+def _plan():
+    return build_reflection_plan(
+        user_id="user-1",
+        selected_prompt="What felt steady today?",
+        latest_user_message="A long walk after work helped me feel calm.",
+        retrieved_entries=[],
+        time_budget=5,
+        mood="Calm",
+        safety={"crisis": False, "reason": None},
+    )
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    plan = _plan()
+    _StubOpenAI.delay_s = 0.0
+    _StubOpenAI.client_ports = []
+    _StubOpenAI.content = json.dumps(
+        {
+            "validation": plan.validation.text,
+            "reflection": plan.reflection.text,
+            "pattern_connection": plan.pattern_connection.text,
+            "gentle_nudge": plan.gentle_nudge.text,
+            "follow_up_question": plan.follow_up_question.text,
+        }
+    )
+    get_rewrite_cache.cache_clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOpenAI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("ENABLE_ENHANCED_LANGUAGE", "true")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_DEADLINE_MS", "2000")
+    yield _StubOpenAI
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uncached_rewrites(monkeypatch):
+    """Expire rewrites as soon as they are stored, so every call reaches the stub."""
+    monkeypatch.setattr(openai_rewriter, "REWRITE_CACHE_TTL_S", 0.0)
+    get_rewrite_cache.cache_clear()
+    yield
+    get_rewrite_cache.cache_clear()
+
+
+def test_rewrite_reuses_pooled_connection(stub_server, uncached_rewrites) -> None:
+    plan = _plan()
+
+    async def run_twice():
+        first = await rewrite_plan_async(plan, plan.evidence_cards, plan.constraints)
+        second = await rewrite_plan_async(plan, plan.evidence_cards, plan.constraints)
+        return first, second
+
+    first, second = asyncio.run(run_twice())
+    assert first is not None and second is not None
+    assert first.validation == plan.validation.text
+    assert len(stub_server.client_ports) == 2
+    assert len(set(stub_server.client_ports)) == 1
+
+
+def test_async_client_follows_connection_settings(stub_server, monkeypatch) -> None:
+    async def clients():
+        first = openai_rewriter.get_async_client(openai_rewriter._rewrite_settings())
+        same = openai_rewriter.get_async_client(openai_rewriter._rewrite_settings())
+        monkeypatch.setenv("OPENAI_API_KEY", "rotated-key")
+        rotated = openai_rewriter.get_async_client(openai_rewriter._rewrite_settings())
+        await asyncio.sleep(0)
+        return first, same, rotated
+
+    first, same, rotated = asyncio.run(clients())
+    assert first is same
+    assert rotated is not first
+    assert rotated.api_key == "rotated-key"
+
+
+def test_repeated_plan_is_served_from_cache(stub_server) -> None:
+    plan = _plan()
+    first = asyncio.run(rewrite_plan_async(plan, plan.evidence_cards, plan.constraints))
+    second = asyncio.run(rewrite_plan_async(plan, plan.evidence_cards, plan.constraints))
+    assert first == second
+    assert len(stub_server.client_ports) == 1
+    assert get_rewrite_cache().stats()["hits"] == 1
+
+
+def test_cache_is_keyed_on_the_endpoint(stub_server, monkeypatch) -> None:
+    plan = _plan()
+    asyncio.run(rewrite_plan_async(plan, plan.evidence_cards, plan.constraints))
+    monkeypatch.setenv("OPENAI_BASE_URL", os.environ["OPENAI_BASE_URL"].replace("127.0.0.1", "localhost"))
+    asyncio.run(rewrite_plan_async(plan, plan.evidence_cards, plan.constraints))
+    assert len(stub_server.client_ports) == 2
+    assert get_rewrite_cache().stats()["hits"] == 0
+
+
+def test_rejected_rewrite_is_not_cached(stub_server) -> None:
+    stub_server.content = json.dumps(
+        {
+            "validation": "You should see a psychiatrist.",
+            "reflection": "x",
+            "pattern_connection": "x",
+            "gentle_nudge": "x",
+            "follow_up_question": "x",
+        }
+    )
+    plan = _plan()
+    for _ in range(2):
+        assert asyncio.run(rewrite_plan_async(plan, plan.evidence_cards, plan.constraints)) is None
+    assert len(stub_server.client_ports) == 2
+    assert get_rewrite_cache().stats()["entries"] == 0
+
+
+def test_rewrite_gives_up_at_deadline(stub_server) -> None:
+    stub_server.delay_s = 1.0
+    plan = _plan()
+    started = time.monotonic()
+    result = asyncio.run(
+        rewrite_plan_async(plan, plan.evidence_cards, plan.constraints, deadline_s=0.2)
+    )
+    assert result is None
+    assert time.monotonic() - started < 0.9
+
+
+def test_chat_turn_falls_back_to_deterministic(stub_server, monkeypatch) -> None:
+    stub_server.delay_s = 1.0
+    monkeypatch.setenv("OPENAI_DEADLINE_MS", "150")
+    payload = ChatTurnRequestV1(
+        user_id="user-1",
+        chat_id="chat-1",
+        user_message="A long walk after work helped me feel calm.",
+        enhanced_language=True,
+    )
+    response = asyncio.run(main.chat_turn_v1(payload))
+    assert response.mode == "deterministic"
+    assert response.assistant_message
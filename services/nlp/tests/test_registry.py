@@ -0,0 +1,100 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.registry import ModelRegistry
+
+
+def _wait_until_ready(registry: ModelRegistry, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not registry.ready() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_eager_models_load_concurrently() -> None:
+    registry = ModelRegistry(lazy=set())
+
+    @registry.model("first")
+    def first():
+        time.sleep(0.2)
+        return object()
+
+    @registry.model("second")
+    def second():
+        time.sleep(0.2)
+        return object()
+
+    started = time.monotonic()
+    registry.load_in_background(max_workers=2)
+    assert registry.ready() is False
+    _wait_until_ready(registry)
+    assert time.monotonic() - started < 0.35
+    report = registry.report()["models"]
+    assert report["first"]["state"] == "ready"
+    assert report["second"]["load_ms"] >= 200
+
+
+def test_lazy_model_loads_once_on_first_use() -> None:
+    registry = ModelRegistry(lazy={"emotion"})
+    calls = []
+
+    @registry.model("emotion")
+    def emotion():
+        calls.append(1)
+        time.sleep(0.05)
+        return "model"
+
+    registry.load_in_background()
+    assert registry.ready() is True
+    assert registry.report()["models"]["emotion"]["state"] == "lazy"
+
+    threads = [threading.Thread(target=emotion) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert registry.report()["models"]["emotion"]["state"] == "ready"
+
+
+def test_failures_are_reported_and_fall_back() -> None:
+    registry = ModelRegistry(lazy=set(), require_models=True)
+
+    @registry.model("broken")
+    def broken():
+        raise OSError("weights missing")
+
+    @registry.model("optional")
+    def optional():
+        return None
+
+    assert broken() is None
+    assert optional() is None
+    models = registry.report()["models"]
+    assert models["broken"]["state"] == "failed"
+    assert "weights missing" in models["broken"]["error"]
+    assert models["optional"]["state"] == "unavailable"
+    assert registry.ready() is False
+
+
+def test_ready_endpoint_is_separate_from_health(monkeypatch) -> None:
+    registry = ModelRegistry(lazy=set())
+    release = threading.Event()
+
+    @registry.model("slow")
+    def slow():
+        release.wait(2)
+        return object()
+
+    monkeypatch.setattr(main, "model_registry", registry)
+    client = TestClient(main.app)
+    registry.load_in_background()
+    assert client.get("/health").status_code == 200
+    pending = client.get("/ready")
+    assert pending.status_code == 503
+    assert pending.json()["models"]["slow"]["state"] in ("pending", "loading")
+    release.set()
+    _wait_until_ready(registry)
+    assert client.get("/ready").status_code == 200
@@ -1,4 +1,4 @@
-from app.safety import detect_crisis
+from app.safety import SafetyEngine, detect_crisis, scan_crisis
 
 
 def test_detects_crisis_language() -> None:
@@ -9,3 +9,32 @@ def test_detects_crisis_language() -> None:
 def test_ignores_non_crisis_language() -> None:
     result = detect_crisis("I felt tired today but I'm okay.")
     assert result["crisis"] is False
+
+
+def test_reports_every_match_with_category() -> None:
+    matches = scan_crisis("Some nights I think about self-harm. I can't go on like this.")
+    assert [match.category for match in matches] == ["self_harm", "hopelessness"]
+    assert matches[0].text == "self-harm"
+
+
+def test_detects_obfuscated_and_multilingual_phrases() -> None:
+    assert detect_crisis("sometimes I want to k1ll mys3lf")["crisis"] is True
+    assert detect_crisis("pensando em suicídio")["categories"] == ["suicidal_ideation"]
+    assert detect_crisis("That skill myself is hard to learn.")["crisis"] is False
+
+
+def test_engine_builds_from_custom_phrases() -> None:
+    engine = SafetyEngine({"custom": ["feel unsafe", "feel hopeless"]}, {"e": "3"})
+    assert [match.text for match in engine.scan("I f33l hopeless and feel unsafe")] == [
+        "f33l hopeless",
+        "feel unsafe",
+    ]
+
+
+def test_streamed_search_handles_window_edges() -> None:
+    engine = SafetyEngine({"custom": ["kill myself"]}, {})
+    text = "x " * 30 + "I want to kill myself today"
+    match = engine.search_stream(text, chunk_chars=70, overlap=12)
+    assert match is not None and text[match.start:match.end] == "kill myself"
+    # The first window ends inside "myselfish"; only the full word is judged.
+    assert engine.search_stream("x " * 27 + "kill myselfish", chunk_chars=65, overlap=12) is None
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from app.similarity import FlatMatrix
+from app.vector_index import UserIndex
+
+
+def _vectors(rows: int = 500, dim: int = 64) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((rows, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("storage,ratio", [("float16", 0.5), ("int8", 0.27)])
+def test_compact_storage_keeps_the_ranking(storage: str, ratio: float) -> None:
+    vectors = _vectors()
+    exact = FlatMatrix(64, "float32")
+    compact = FlatMatrix(64, storage)
+    for vector in vectors:
+        exact.append(vector)
+        compact.append(vector)
+    assert compact.nbytes <= exact.nbytes * ratio
+
+    hits = 0
+    for query in _vectors(20, 64) + 0.5:
+        want, want_scores = exact.search(query, 10)
+        got, got_scores = compact.search(query, 10)
+        hits += len(set(want.tolist()) & set(got.tolist()))
+        assert np.allclose(got_scores[0], want_scores[0], atol=0.02)
+    assert hits / 200 >= 0.9
+
+
+def test_search_excludes_rows_and_round_trips_storage() -> None:
+    matrix = FlatMatrix(2, "int8")
+    for vector in ([1.0, 0.0], [0.8, 0.2], [0.0, 1.0]):
+        matrix.append(vector)
+    rows, scores = matrix.search([1.0, 0.0], k=2, exclude_rows=[0])
+    assert rows.tolist() == [1, 2]
+    assert scores[0] > scores[1]
+
+    restored = FlatMatrix.from_arrays(matrix.to_arrays(), storage="float32")
+    assert restored.storage == "float32"
+    assert np.allclose(restored.decode(), matrix.decode(), atol=1e-2)
+
+
+def test_exact_strategy_bypasses_a_trained_ivf() -> None:
+    index = UserIndex(dim=64, ivf_min_rows=100, storage="float16")
+    for row, vector in enumerate(_vectors()):
+        index.upsert(f"e{row}", vector)
+    assert index.strategy == "ivf"
+    results, strategy = index.search(_vectors(1, 64)[0], 5, exact=True)
+    assert strategy == "exact"
+    assert len(results) == 5
@@ -0,0 +1,69 @@
+import numpy as np
+
+from app import themes
+from app.themes import match_centroids, recompute_themes_shared
+
+
+def _entries(rows: int = 30, seed: int = 0, clusters: int = 3):
+    rng = np.random.default_rng(seed)
+    centres = np.eye(clusters, 8) * 5
+    return [
+        {
+            "entry_id": f"e{index}",
+            "text": f"entry {index}",
+            "keywords": [f"topic{index % clusters}"],
+            "embedding": (centres[index % clusters] + 0.1 * rng.standard_normal(8)).tolist(),
+        }
+        for index in range(rows)
+    ]
+
+
+def test_hungarian_matching_prefers_the_best_overall_assignment() -> None:
+    previous = np.array([[1.0, 0.0], [0.7, 0.7]])
+    current = np.array([[0.8, 0.6], [0.0, 1.0], [-1.0, 0.0]])
+    # Greedy would give current 0 to row 1 and leave row 0 unmatched.
+    assert sorted(match_centroids(previous, current, min_similarity=0.5)) == [(0, 0), (1, 1)]
+    assert match_centroids(previous, np.array([[-1.0, 0.0]])) == []
+
+
+def test_theme_ids_survive_recomputes_and_diff_reports_changes() -> None:
+    themes._snapshots.clear()
+    entries = _entries()
+    first, _, diff = recompute_themes_shared("user-1", entries)
+    assert diff.baseline == "none"
+    assert sorted(diff.added) == sorted(theme.temp_theme_id for theme in first)
+
+    # One more entry: every theme persists under its id, one of them changed.
+    grown = entries + [dict(_entries(31)[30], entry_id="e-new")]
+    second, _, diff = recompute_themes_shared("user-1", grown)
+    assert diff.baseline == "cache"
+    assert {theme.temp_theme_id for theme in second} == {theme.temp_theme_id for theme in first}
+    assert diff.added == [] and diff.removed == []
+    assert len(diff.changed) + len(diff.unchanged) == len(first)
+    assert diff.changed
+
+    # The caller's stored themes take precedence; unknown ones are removed.
+    previous = [
+        {
+            "theme_id": theme.temp_theme_id,
+            "entry_ids": [member.entry_id for member in theme.members],
+            "label": theme.label,
+            "keywords": theme.keywords,
+            "strength": theme.strength,
+        }
+        for theme in second
+    ] + [{"theme_id": "gone", "entry_ids": ["missing"]}]
+    third, state, diff = recompute_themes_shared("user-2", grown, include_state=True, previous_themes=previous)
+    assert diff.baseline == "request"
+    assert diff.removed == ["gone"]
+    assert sorted(diff.unchanged) == sorted(theme.temp_theme_id for theme in second)
+    assert themes.ThemeState.decode(state).theme_ids == [theme.temp_theme_id for theme in third]
+
+
+def test_empty_entries_remove_every_previous_theme() -> None:
+    previous = [{"theme_id": "t1", "entry_ids": ["e1"]}, {"theme_id": "t2", "entry_ids": ["e2", "e3"]}]
+    current, _, diff = recompute_themes_shared("user-3", [], previous_themes=previous)
+    assert current == []
+    assert diff.baseline == "request"
+    assert diff.removed == ["t1", "t2"]
+    assert diff.added == [] and diff.changed == [] and diff.unchanged == []
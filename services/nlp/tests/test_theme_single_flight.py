@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app import themes
+
+
+def _entries(shift: float = 0.0):
+    return [
+        {"entry_id": f"e{index}", "text": f"entry {index}", "embedding": [1.0, index + shift], "keywords": ["work"]}
+        for index in range(4)
+    ]
+
+
+def test_concurrent_identical_recomputes_share_one_run(monkeypatch) -> None:
+    themes.get_theme_cache.cache_clear()
+    calls = []
+    started = threading.Event()
+
+    def slow_recompute(entries, include_state, user_id):
+        calls.append(len(entries))
+        started.set()
+        time.sleep(0.2)
+        return [], np.zeros((0, 2), dtype=np.float32), None
+
+    monkeypatch.setattr(themes, "_recompute", slow_recompute)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(themes.recompute_themes_shared, "user-1", _entries())
+        started.wait(1)
+        others = [pool.submit(themes.recompute_themes_shared, "user-1", _entries()) for _ in range(3)]
+        results = [first.result()] + [future.result() for future in others]
+    assert calls == [4]
+    assert all(result[:2] == ([], None) for result in results)
+
+    # Repeats within the TTL come from the cache; different input recomputes.
+    themes.recompute_themes_shared("user-1", _entries())
+    assert calls == [4]
+    themes.recompute_themes_shared("user-1", _entries(shift=0.5))
+    themes.recompute_themes_shared("user-2", _entries())
+    assert calls == [4, 4, 4]
+    assert themes.theme_cache_stats()["hits"] == 1
+
+
+def test_failures_are_not_cached(monkeypatch) -> None:
+    themes.get_theme_cache.cache_clear()
+    calls = []
+
+    def failing(entries, include_state, user_id):
+        calls.append(1)
+        raise RuntimeError("cluster failed")
+
+    monkeypatch.setattr(themes, "_recompute", failing)
+    for _ in range(2):
+        try:
+            themes.recompute_themes_shared("user-1", _entries())
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected RuntimeError")
+    assert len(calls) == 2
+    assert themes._in_flight == {}
@@ -0,0 +1,107 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import main, pipeline
+from app.models import ChatTurnRequestV1
+from app.vector_index import UserIndex, VectorIndex
+
+
+def _clustered(rows: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    return (centers[rng.integers(0, clusters, rows)] + 0.3 * rng.standard_normal((rows, dim))).astype(np.float32)
+
+
+def test_ivf_search_recalls_exact_neighbours() -> None:
+    vectors = _clustered(3000)
+    index = UserIndex(dim=32, ivf_min_rows=1000)
+    for row, vector in enumerate(vectors):
+        index.upsert(f"e{row}", vector)
+    assert index.strategy == "ivf"
+
+    queries = _clustered(50, seed=1)
+    hits = 0
+    for query in queries:
+        approximate, strategy = index.search(query, 10, nprobe=8)
+        exact, _ = index.search(query, 10, exact=True)
+        assert strategy == "ivf"
+        hits += len({entry_id for entry_id, _, _ in approximate} & {entry_id for entry_id, _, _ in exact})
+    assert hits / (10 * len(queries)) >= 0.9
+
+
+def test_remove_and_reload_from_disk(tmp_path) -> None:
+    index = VectorIndex(str(tmp_path), model_name="model-a")
+    index.upsert("user-1", "a", [1.0, 0.0, 0.0], {"text": "alpha", "mood": "Calm"})
+    index.upsert("user-1", "b", [0.9, 0.1, 0.0], {"text": "beta"})
+    index.upsert("user-1", "c", [0.0, 1.0, 0.0], {"text": "gamma"})
+    assert index.remove("user-1", "b") is True
+    assert index.remove("user-1", "b") is False
+
+    reopened = VectorIndex(str(tmp_path), model_name="model-a")
+    results, strategy, indexed = reopened.search("user-1", [1.0, 0.0, 0.0], k=2)
+    assert (strategy, indexed) == ("exact", 2)
+    assert [entry_id for entry_id, _, _ in results] == ["a", "c"]
+    assert results[0][2] == {"text": "alpha", "mood": "Calm"}
+    assert reopened.search("user-2", [1.0, 0.0, 0.0], k=2)[0] == []
+
+    # Vectors from another embedding model are not comparable.
+    assert VectorIndex(str(tmp_path), model_name="model-b").search("user-1", [1.0, 0.0, 0.0], k=2)[2] == 0
+
+
+def test_upsert_many_saves_once(tmp_path, monkeypatch) -> None:
+    index = VectorIndex(str(tmp_path), model_name="model-a")
+    saves = []
+    store = index._store
+    monkeypatch.setattr(index, "_store", lambda user_id, user_index: saves.append(user_id) or store(user_id, user_index))
+    index.upsert_many("user-1", [(f"e{row}", [float(row), 1.0], {"text": str(row)}) for row in range(5)])
+    assert saves == ["user-1"]
+    assert VectorIndex(str(tmp_path), model_name="model-a").search("user-1", [1.0, 1.0], k=10)[2] == 5
+
+
+def test_workers_see_each_others_writes(tmp_path) -> None:
+    first = VectorIndex(str(tmp_path), model_name="model-a")
+    second = VectorIndex(str(tmp_path), model_name="model-a")
+    first.upsert("user-1", "a", [1.0, 0.0])
+    second.upsert("user-1", "b", [0.0, 1.0])
+    assert first.search("user-1", [0.0, 1.0], k=5)[2] == 2
+
+
+def test_analyze_entry_indexes_and_similar_endpoint_queries(monkeypatch) -> None:
+    index = VectorIndex()
+    monkeypatch.setattr(main, "get_vector_index", lambda: index)
+    client = TestClient(main.app)
+    # Without a model the entry gets its hash fallback vector, which is not indexed.
+    response = client.post("/analyze-entry", json={"user_id": "u1", "entry_id": "e0", "text": "No model yet."})
+    assert response.status_code == 200
+    monkeypatch.setattr(
+        pipeline, "_model_embeddings", lambda texts: [pipeline._fallback_embedding(text.upper()) for text in texts]
+    )
+    for entry_id, text in [("e1", "A quiet walk by the river."), ("e2", "Work was stressful today.")]:
+        response = client.post("/analyze-entry", json={"user_id": "u1", "entry_id": entry_id, "text": text})
+        assert response.status_code == 200
+    client.post("/analyze-entry", json={"user_id": "u1", "entry_id": "chat", "text": "Hi", "index": False})
+
+    response = client.post("/v1/similar", json={"user_id": "u1", "entry_id": "e1", "k": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["indexed"] == 2
+    assert [result["entry_id"] for result in body["results"]] == ["e2"]
+    assert body["results"][0]["text"] == "Work was stressful today."
+
+    assert client.post("/v1/similar", json={"user_id": "u1", "entry_id": "missing"}).status_code == 404
+    assert client.delete("/v1/similar/u1/e2").json() == {"removed": True}
+
+    payload = ChatTurnRequestV1(
+        user_id="u1", chat_id="c1", user_message="Walking helps.", self_retrieve=True, retrieve_k=3
+    )
+    retrieved = main._self_retrieved_entries(payload, payload.user_message)
+    assert [entry.entry_id for entry in retrieved] == ["e1"]
+
+
+def test_similar_by_text_needs_the_embedding_model(monkeypatch) -> None:
+    index = VectorIndex()
+    index.upsert("u1", "e1", [1.0, 0.0, 0.0], {"text": "alpha"})
+    monkeypatch.setattr(main, "get_vector_index", lambda: index)
+    monkeypatch.setattr(pipeline, "_model_embeddings", lambda texts: None)
+    response = TestClient(main.app).post("/v1/similar", json={"user_id": "u1", "text": "alpha"})
+    assert response.status_code == 503